@@ -1,9 +1,24 @@
+from sqlalchemy.engine import URL
 from src.settings_env import (
     POSTGRES_USER as postg_user,
     POSTGRES_PASSWORD as postg_password,
     POSTGRES_HOST as postg_host,
     POSTGRES_PORT as postg_port,
-    POSTGRES_DB as postg_db
+    POSTGRES_DB as postg_db,
+    POSTGRES_REPLICA_HOSTS as postg_replica_hosts
 )
 
-_URL_DATABASE = f'postgresql+asyncpg://{postg_user}:{postg_password}@{postg_host}:{postg_port}/{postg_db}'
+
+
+def database_url(host: str, port: str = None) -> URL:
+    """
+    URL подключения asyncpg. Собирается без разбора строки: без переменных окружения модуль
+    импортируется (например, при сборе тестов), а подключение не создаётся до первого запроса
+    """
+    return URL.create("postgresql+asyncpg", username=postg_user, password=postg_password, host=host,
+                      port=int(port) if port else None, database=postg_db)
+
+
+_URL_DATABASE = database_url(postg_host, postg_port)
+# Реплики - host:port
+_URL_REPLICAS = [database_url(*host.partition(":")[::2]) for host in postg_replica_hosts]
@@ -1,9 +1,41 @@
-from fastapi import HTTPException, status
-from api_databases.address_db import _URL_DATABASE
+import asyncio
+import time
+from uuid import uuid4
+from fastapi import Depends, HTTPException, Request, status
+from api_databases.address_db import _URL_DATABASE, _URL_REPLICAS
+from api_databases.pool_stats import InstrumentedQueuePool
+from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from src.cache_tags import on_invalidate
+from src.settings_env import (
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_STATEMENT_CACHE_SIZE,
+    DB_PGBOUNCER, READ_STICKY_SECONDS, REPLICA_RETRY_SECONDS
+)
+
+
+def engine_options() -> dict:
+    """Настройки пула и драйвера asyncpg из переменных окружения"""
+    statement_cache_size = 0 if DB_PGBOUNCER else DB_STATEMENT_CACHE_SIZE
+    connect_args = {
+        "statement_cache_size": statement_cache_size,  # Кэш asyncpg
+        "prepared_statement_cache_size": statement_cache_size  # Кэш SQLAlchemy
+    }
+    if DB_PGBOUNCER:
+        # PgBouncer может отдать другое серверное подключение - имена подготовленных запросов не должны совпадать
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "connect_args": connect_args
+    }
+
 
-engine = create_async_engine(_URL_DATABASE, future=True)
+engine = create_async_engine(_URL_DATABASE, future=True, **engine_options())
 async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 
@@ -13,6 +45,64 @@ async def get_async_session():
         yield session
 
 
+# Реплики для чтения (необязательные)
+replica_engines = [create_async_engine(url, future=True, **engine_options()) for url in _URL_REPLICAS]
+replica_sessions = [sessionmaker(item, expire_on_commit=False, class_=AsyncSession) for item in replica_engines]
+_replicas = {"next": 0, "down_until": [0.0] * len(replica_engines), "primary_until": 0.0}
+
+
+@on_invalidate
+def read_primary_after_invalidation(tags):
+    """
+    Сразу после сброса кэша его заполняют из основной БД: реплика с задержкой репликации
+    сохранила бы в кэше устаревшие данные на весь TTL
+    """
+    _replicas["primary_until"] = time.monotonic() + READ_STICKY_SECONDS
+
+
+def stick_to_primary(request: Request):
+    """После записи пользователь READ_STICKY_SECONDS секунд читает из основной БД (видит свои изменения)"""
+    # Метка хранится в подписанной сессии (cookie), поэтому действует во всех воркерах
+    if "session" in request.scope:
+        request.session["read_primary_until"] = time.time() + READ_STICKY_SECONDS
+
+
+async def _open_replica_session():
+    """Сессия следующей по кругу доступной реплики; недоступная реплика пропускается REPLICA_RETRY_SECONDS"""
+    count = len(replica_sessions)
+    for _ in range(count):
+        index = _replicas["next"] % count
+        _replicas["next"] += 1
+        if _replicas["down_until"][index] > time.monotonic():
+            continue
+        session = replica_sessions[index]()
+        try:
+            # Подключение берётся сразу, чтобы при недоступности реплики перейти к следующей
+            await session.connection()
+            return session
+        except (OSError, asyncio.TimeoutError, exc.DBAPIError, exc.TimeoutError):
+            await session.close()
+            _replicas["down_until"][index] = time.monotonic() + REPLICA_RETRY_SECONDS
+    return None
+
+
+async def get_read_session(request: Request, primary: AsyncSession = Depends(get_async_session)):
+    """
+    Асинхронное получение сессии только для чтения: реплика, а если их нет или они недоступны -
+    та же сессия основной БД, что и у остальных зависимостей запроса
+    """
+    sticky = "session" in request.scope and request.session.get("read_primary_until", 0) > time.time()
+    if not replica_sessions or sticky or _replicas["primary_until"] > time.monotonic():
+        yield primary
+        return
+    session = await _open_replica_session()
+    if session is None:
+        yield primary
+        return
+    async with session:
+        yield session
+
+
 # исключение, которое возникает при неверном запросе
 data_is_not_valid = HTTPException(
     status_code=status.HTTP_400_BAD_REQUEST,
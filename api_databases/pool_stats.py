@@ -0,0 +1,64 @@
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Границы интервалов гистограммы ожидания подключения (секунды)
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class PoolWaitStats:
+    """Гистограмма времени ожидания подключения из пула (в пределах процесса)"""
+
+    def __init__(self, buckets=WAIT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последний интервал - больше максимальной границы
+        self.count = 0
+        self.total = 0.0
+        self.timeouts = 0
+
+    def observe(self, seconds: float):
+        index = next((idx for idx, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self) -> dict:
+        """Накопительные значения интервалов в формате le (как у Prometheus)"""
+        cumulative, histogram = 0, {}
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            cumulative += count
+            histogram[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "timeouts": self.timeouts,
+            "buckets": histogram
+        }
+
+
+pool_wait = PoolWaitStats()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Пул подключений, замеряющий ожидание свободного подключения и таймауты"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_wait.timeouts += 1
+            raise
+        finally:
+            pool_wait.observe(time.perf_counter() - started)
+
+
+def pool_status(pool) -> dict:
+    """Текущее состояние пула"""
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "timeout": pool.timeout()
+    }
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, status
+from api_databases.connect_db import engine, replica_engines
+from api_databases.pool_stats import pool_status, pool_wait
+
+router = APIRouter(
+    prefix="/db", tags=["Database"]
+)
+
+
+@router.get("/pool_stats", status_code=status.HTTP_200_OK)
+async def get_pool_stats():
+    """Состояние пула подключений этого процесса: занятые, сверх пула, гистограмма ожидания"""
+    response = {
+        **pool_status(engine.pool),
+        "replicas": [pool_status(item.pool) for item in replica_engines],
+        "wait_seconds": pool_wait.snapshot()  # Общая для всех пулов процесса
+    }
+    return response
@@ -0,0 +1,86 @@
+"""
+Пропускная способность массового импорта (post.bulk_import), записей в секунду.
+
+Файл NDJSON или CSV с --rows записями создаётся в памяти и импортируется так же, как из файла:
+parse - только разбор и проверка строк (без БД), import - полный импорт с загрузкой пачками COPY.
+Импорт выполняется в транзакции, которая в конце откатывается (нужна PostgreSQL из настроек POSTGRES_*).
+Записи не публикуются: счётчики и кэш не затрагиваются, Redis не нужен.
+
+    python -m benchmarks.bulk_import --rows 100000
+    python -m benchmarks.bulk_import --rows 100000 --format csv --batch-size 1000 5000 20000
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import time
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from benchmarks.explain_check import seeded_connection
+from post.bulk_import import BATCH_SIZE, FORMATS, import_posts, iter_lines, parse_rows, validate_row
+from src.api_models import Category, User
+
+CHUNK_SIZE = 1 << 16  # Как при чтении файла (post.bulk_import.file_chunks)
+CATEGORIES = 10
+
+
+def make_file(rows: int, import_format: str, category_ids: list) -> bytes:
+    records = [{"title": f"Imported post {idx}",
+                "content": f"Imported content {idx}, long enough to pass validation.\nSecond line.",
+                "category_id": category_ids[idx % len(category_ids)]} for idx in range(rows)]
+    if import_format == "ndjson":
+        return "\n".join(map(json.dumps, records)).encode()
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=list(records[0]))
+    writer.writeheader()
+    writer.writerows(records)
+    return output.getvalue().encode()
+
+
+async def chunks(data: bytes):
+    for start in range(0, len(data), CHUNK_SIZE):
+        yield data[start:start + CHUNK_SIZE]
+
+
+async def parse_only(data: bytes, import_format: str) -> int:
+    """Разбор и проверка без загрузки, возвращает количество принятых записей"""
+    accepted = 0
+    async for _, row, error in parse_rows(iter_lines(chunks(data)), import_format):
+        if not error and (await validate_row(row, user_id=1))[1] is None:
+            accepted += 1
+    return accepted
+
+
+async def main(rows: int, import_format: str, batch_sizes: list) -> dict:
+    async with seeded_connection(users=1, categories=CATEGORIES, posts=0) as connection:
+        session = AsyncSession(bind=connection, expire_on_commit=False, join_transaction_mode="create_savepoint")
+        user_id = await session.scalar(select(func.min(User.id)).filter(User.username.like("explain\\_%")))
+        category_ids = list(await session.scalars(select(Category.id).filter(Category.title.like("explain\\_%"))))
+        data = make_file(rows, import_format, category_ids)
+        result = {"rows": rows, "format": import_format, "megabytes": round(len(data) / 2 ** 20, 1)}
+
+        started = time.perf_counter()
+        assert await parse_only(data, import_format) == rows
+        result["parse_rows_per_s"] = round(rows / (time.perf_counter() - started))
+
+        result["import"] = []
+        for batch_size in batch_sizes:
+            started = time.perf_counter()
+            report = await import_posts(session, parse_rows(iter_lines(chunks(data)), import_format),
+                                        user_id, batch_size)
+            elapsed = time.perf_counter() - started
+            assert report["imported"] == rows, report
+            result["import"].append({"batch_size": batch_size, "batches": report["batches"],
+                                     "seconds": round(elapsed, 2), "rows_per_s": round(rows / elapsed)})
+        await session.close()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="записей в файле")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson", help="формат файла")
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[BATCH_SIZE], help="размеры пачек COPY")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.rows, args.format, args.batch_size)), indent=2))
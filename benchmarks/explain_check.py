@@ -0,0 +1,148 @@
+"""
+Проверка планов запросов к таблице post: ни один запрос обработчиков не должен читать её целиком.
+
+В одной транзакции (в конце откатывается) таблицы заполняются тестовыми данными, затем вызываются
+те же функции, что и в обработчиках. Все выполненные ими SQL-запросы перехватываются и прогоняются
+через EXPLAIN. Если в плане есть Seq Scan по post, скрипт завершается с кодом 1
+(та же проверка - тест tests/test_explain.py).
+Сверка счётчиков (post.counters.reconcile_counters) читает всю таблицу намеренно и не проверяется.
+
+    python -m benchmarks.explain_check --posts 100000
+"""
+import argparse
+import asyncio
+import json
+import sys
+from contextlib import asynccontextmanager
+from sqlalchemy import event, select, func
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+from api_databases.address_db import _URL_DATABASE
+from post.counters import get_published_count, drop_category_counter, drop_user_posts_counters
+from post.routers import get_all_posts, get_one_post, category_post_all, encode_cursor
+from post.search import search_posts
+from src.api_models import Category, Post, User
+
+SEED = [
+    "INSERT INTO \"user\" (username, password, email, is_active, \"group\") "
+    "SELECT 'explain_' || g, 'x', 'explain_' || g || '@example.com', true, 'CLIENT' "
+    "FROM generate_series(1, {users}) g",
+    "INSERT INTO category (title) SELECT 'explain_' || g FROM generate_series(1, {categories}) g",
+    # Слова содержимого - фрагменты md5, поэтому каждое встречается редко (как реальные поисковые термины)
+    "INSERT INTO post (title, content, excerpt, created, published, user_id, category_id) "
+    "SELECT 'title ' || md5(g::text), md5(g::text) || ' ' || md5((g + 1)::text) || ' ' || repeat('text ', 50), "
+    "md5(g::text) || ' ' || md5((g + 1)::text), "
+    "now() - g * interval '1 minute', g % 10 <> 0, "
+    "(SELECT min(id) FROM \"user\" WHERE username LIKE 'explain\\_%') + g % {users}, "
+    "(SELECT min(id) FROM category WHERE title LIKE 'explain\\_%') + g % {categories} "
+    "FROM generate_series(1, {posts}) g",
+    "ANALYZE \"user\"",
+    "ANALYZE category",
+    "ANALYZE post",
+]
+
+
+def seq_scans(plan: dict, relation: str = "post"):
+    """Узлы Seq Scan по таблице в плане (рекурсивно)"""
+    found = [plan] if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") == relation else []
+    for child in plan.get("Plans", ()):
+        found += seq_scans(child, relation)
+    return found
+
+
+async def run_checks(session: AsyncSession) -> dict:
+    """Вызывает функции обработчиков, возвращает {название проверки: [выполненные запросы]}"""
+    # Первые пользователь и категория тестовых данных, самая новая опубликованная запись
+    user_id = await session.scalar(select(func.min(User.id)).filter(User.username.like("explain\\_%")))
+    category_id = await session.scalar(select(func.min(Category.id)).filter(Category.title.like("explain\\_%")))
+    post_id = await session.scalar(select(func.max(Post.id)).filter(Post.published))
+    checks = {
+        "get_all_posts (page=50)": lambda: get_all_posts.__wrapped__(page=50, limit=10, session=session),
+        "get_all_posts (after)": lambda: get_all_posts.__wrapped__(
+            limit=10, after=encode_cursor(id=10 ** 9), session=session),
+        "category_post_all (page=5)": lambda: category_post_all.__wrapped__(
+            category_id=category_id, page=5, limit=10, session=session),
+        "category_post_all (after)": lambda: category_post_all.__wrapped__(
+            category_id=category_id, limit=10, after="", session=session),
+        "search_posts": lambda: search_posts(session, "c4ca4238a0b923820dcc509a6f75849b", 10),
+        "get_published_count (category, fallback)": lambda: get_published_count(session, -1),
+        "drop_user_posts_counters": lambda: drop_user_posts_counters(session, user_id),
+        "drop_category_counter": lambda: drop_category_counter(session, category_id),
+        "get_one_post": lambda: get_one_post.__wrapped__(post_id=post_id, session=session),
+    }
+
+    async def delete_cascade(model, object_id):
+        # Каскад ORM: выборка записей по внешнему ключу и их удаление
+        await session.delete(await session.get(model, object_id))
+        await session.flush()
+
+    checks["delete_user (cascade)"] = lambda: delete_cascade(User, user_id)
+    checks["delete_category (cascade)"] = lambda: delete_cascade(Category, category_id)
+
+    executed, current = {}, None
+    connection = await session.connection()
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if current is not None:
+            executed[current].append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(connection.sync_connection, "before_cursor_execute", capture)
+    try:
+        for current, check in checks.items():
+            executed[current] = []
+            await check()
+    finally:
+        current = None
+        event.remove(connection.sync_connection, "before_cursor_execute", capture)
+    return executed
+
+
+@asynccontextmanager
+async def seeded_connection(users: int, categories: int, posts: int):
+    """Соединение с открытой транзакцией и тестовыми данными; при выходе транзакция откатывается"""
+    engine = create_async_engine(_URL_DATABASE, poolclass=NullPool)
+    try:
+        async with engine.connect() as connection:
+            transaction = await connection.begin()
+            try:
+                for statement in SEED:
+                    await connection.exec_driver_sql(statement.format(users=users, categories=categories, posts=posts))
+                yield connection
+            finally:
+                await transaction.rollback()
+    finally:
+        await engine.dispose()
+
+
+async def explain_checks(connection: AsyncConnection) -> list:
+    """[(название проверки, SQL, узлы Seq Scan по post)] для всех запросов проверок"""
+    session = AsyncSession(bind=connection, expire_on_commit=False)
+    executed = await run_checks(session)
+    results = []
+    for name, statements in executed.items():
+        for statement, parameters in statements:
+            result = await connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, tuple(parameters or ()))
+            plan = result.scalar()
+            plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+            results.append((name, statement, seq_scans(plan)))
+    return results
+
+
+async def main(users: int, categories: int, posts: int) -> int:
+    async with seeded_connection(users, categories, posts) as connection:
+        results = await explain_checks(connection)
+    failed = 0
+    for name, statement, scans in results:
+        failed += bool(scans)
+        print(f"{'SEQ SCAN' if scans else 'ok':8} {name}: {' '.join(statement.split())[:110]}")
+    print(f"{failed} query(s) with Seq Scan on post" if failed else "No Seq Scan on post")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="количество пользователей")
+    parser.add_argument("--categories", type=int, default=50, help="количество категорий")
+    parser.add_argument("--posts", type=int, default=100000, help="количество записей")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.users, args.categories, args.posts)))
@@ -0,0 +1,71 @@
+"""
+Задержка event loop для посторонних запросов во время одновременных логинов.
+
+Зонд каждые PROBE_INTERVAL секунд засыпает и измеряет, насколько позже запланированного
+он проснулся - столько же ждал бы любой другой запрос этого воркера.
+Сравниваются pbkdf2 прямо в event loop (как было) и через user.hashing (пул процессов).
+
+    python -m benchmarks.hashing_event_loop --logins 50
+"""
+import argparse
+import asyncio
+import json
+import time
+from passlib.hash import pbkdf2_sha256
+from user.hashing import verify_password, shutdown_hash_pool
+
+PROBE_INTERVAL = 0.005
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+
+async def probe(lags: list, stop: asyncio.Event):
+    """Имитация посторонних запросов: фиксирует опоздание пробуждения"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+async def inline_login(password, hashed):
+    """Поведение до изменений: проверка пароля блокирует event loop"""
+    return pbkdf2_sha256.verify(password, hashed)
+
+
+async def run(mode: str, logins: int, password: str, hashed: str) -> dict:
+    lags, stop = [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    login = inline_login if mode == "inline" else verify_password
+    started = time.perf_counter()
+    await asyncio.gather(*[login(password, hashed) for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    return {
+        "mode": mode,
+        "logins": logins,
+        "logins_seconds": round(elapsed, 3),
+        "probe_lag_ms": {
+            "p50": round(percentile(lags, 50) * 1000, 2),
+            "p99": round(percentile(lags, 99) * 1000, 2),
+            "max": round(max(lags, default=0) * 1000, 2),
+        },
+    }
+
+
+async def main(logins: int):
+    password = "password123"
+    hashed = pbkdf2_sha256.hash(password)
+    await verify_password(password, hashed)  # Прогрев пула процессов
+    results = [await run(mode, logins, password, hashed) for mode in ("inline", "pool")]
+    shutdown_hash_pool()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=50, help="количество одновременных логинов")
+    asyncio.run(main(parser.parse_args().logins))
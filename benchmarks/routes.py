@@ -0,0 +1,345 @@
+"""
+Замер задержки маршрутов API (post, category, user) и HTML-страниц в одном процессе:
+запросы отправляются приложению напрямую через httpx.ASGITransport, без сети и сервера.
+
+Маршруты замеряются по очереди: каждый получает --requests запросов, не более --concurrency
+одновременно. Для маршрута выводятся p50/p95/p99, среднее и максимум (мс), пропускная способность
+(запросов/с), коды ответов и SQL-запросов на один запрос (по метрике db_queries_total).
+Результат - JSON с постоянным порядком ключей: два прогона сравниваются обычным diff.
+
+Нужны БД, заполненная benchmarks.seed, и Redis, как для самого приложения.
+Изменяющие маршруты получают объекты, заранее созданные с префиксами benchmarks.seed
+(удаляются вместе с остальными: python -m benchmarks.seed --clean).
+--no-cache отправляет Cache-Control: no-store - fastapi-cache не используется (кэш страниц - да).
+Все запросы идут с одного адреса, поэтому ограничение частоты (src.rate_limit) по умолчанию выключено;
+--rate-limit unlimited выполняет проверки с недостижимым лимитом (замер их накладных расходов),
+on - с настроенными лимитами (доля ответов 429).
+
+    python -m benchmarks.routes
+    python -m benchmarks.routes --requests 500 --concurrency 50 --routes /post/ --output before.json
+    python -m benchmarks.routes --routes search login --rate-limit unlimited
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
+from http.cookiejar import DefaultCookiePolicy
+from datetime import datetime, timedelta
+# pip install httpx
+import httpx
+from passlib.hash import pbkdf2_sha256
+from prometheus_client import REGISTRY
+from sqlalchemy import func, insert, select
+from api_databases.connect_db import async_session
+from benchmarks.seed import CATEGORY_PREFIX, SEED_ADMIN, SEED_PASSWORD, USER_PREFIX, bench_categories, bench_users
+from main import app
+from src import rate_limit
+from post.listing import make_excerpt
+from src.api_models import Category, Post, User
+from user.my_token import NAME_COOKIES, create_access_token
+
+SAMPLE = 1000  # Сколько опубликованных записей выбирается для маршрутов чтения
+IMPORT_ROWS = 100  # Записей в одном запросе импорта
+RATE_LIMIT_MODES = ("off", "unlimited", "on")
+
+
+class Route:
+    """
+    Маршрут замера: метод и шаблон пути (он же метка метрик), кто отправляет запрос (admin, client
+    или аноним), какие заранее созданные объекты нужны (posts, categories, users - по одному на запрос).
+    make(data, i, target) -> аргументы httpx и path - значения для шаблона пути
+    """
+
+    def __init__(self, method: str, path: str, make=None, auth: str = None, targets: str = None,
+                 label: str = None):
+        self.method, self.path, self.auth, self.targets = method, path, auth, targets
+        self.make = make or (lambda data, i, target: {})
+        self.name = f"{method} {path}" + (f" ({label})" if label else "")
+
+
+def post_form(data, i):
+    return {"title": f"Benchmark post {data.run} {i}", "content": data.content(i), "category_id": data.category(i)}
+
+
+def user_form(data, i, name: str):
+    return {"username": f"{USER_PREFIX}{data.run}{name}{i}".title(), "password": SEED_PASSWORD,
+            "email": f"bench.{data.run}.{name}{i}@example.org".lower()}
+
+
+def import_body(data, i) -> bytes:
+    rows = ({"title": f"Imported {data.run} {i} {row}", "content": data.content(row),
+             "category_id": data.category(row)} for row in range(IMPORT_ROWS))
+    return "\n".join(json.dumps(row) for row in rows).encode()
+
+
+ROUTES = [
+    # post/routers.py
+    Route("POST", "/post/create_post", lambda d, i, t: {"data": post_form(d, i)}, auth="admin"),
+    Route("GET", "/post/all_posts", lambda d, i, t: {"params": {"page": d.page(i)}}, label="page"),
+    Route("GET", "/post/all_posts", lambda d, i, t: {"params": {"after": ""}}, label="cursor"),
+    Route("GET", "/post/one_post/{post_id}", lambda d, i, t: {"path": {"post_id": d.post(i)}}),
+    Route("GET", "/post/category_post_all/{category_id}",
+          lambda d, i, t: {"path": {"category_id": d.category(i)}, "params": {"page": d.page(i)}}),
+    Route("PUT", "/post/update_post/{post_id}", lambda d, i, t: {"path": {"post_id": t}, "data": post_form(d, i)},
+          auth="admin", targets="posts"),
+    Route("PATCH", "/post/update_post_published/{post_id}",
+          lambda d, i, t: {"path": {"post_id": t}, "json": {"published": True}}, auth="admin", targets="posts"),
+    Route("POST", "/post/search/", lambda d, i, t: {"data": {"search": d.term(i)}}),
+    Route("POST", "/post/import_posts", lambda d, i, t: {"content": import_body(d, i)}, auth="admin"),
+    Route("GET", "/post/export_posts", lambda d, i, t: {"params": {
+        "category_id": d.category(i), "created_from": (datetime.utcnow() - timedelta(days=7)).isoformat()
+    }}, auth="admin"),
+    Route("DELETE", "/post/delete_post/{post_id}", lambda d, i, t: {"path": {"post_id": t}},
+          auth="admin", targets="posts"),
+    # category/routers.py
+    Route("POST", "/category/create_category",
+          lambda d, i, t: {"data": {"title": f"{CATEGORY_PREFIX}{d.run} c{i}"}}, auth="admin"),
+    Route("GET", "/category/category/{category_id}", lambda d, i, t: {"path": {"category_id": d.category(i)}}),
+    Route("GET", "/category/categories_all"),
+    Route("GET", "/category/categories"),
+    Route("PUT", "/category/update_category/{category_id}",
+          lambda d, i, t: {"path": {"category_id": t}, "data": {"title": f"{CATEGORY_PREFIX}{d.run} u{i}"}},
+          auth="admin", targets="categories"),
+    Route("DELETE", "/category/delete_category/{category_id}", lambda d, i, t: {"path": {"category_id": t}},
+          auth="admin", targets="categories"),
+    # user/routers.py
+    Route("POST", "/user/user_create", lambda d, i, t: {"data": user_form(d, i, "c")}),
+    Route("POST", "/user/login", lambda d, i, t: {"data": {"username": d.client, "password": SEED_PASSWORD}}),
+    Route("PATCH", "/user/update_user_group/{user_id}",
+          lambda d, i, t: {"path": {"user_id": t}, "json": {"group": "CLIENT"}}, auth="admin", targets="users"),
+    Route("PUT", "/user/update_user/{user_id}", lambda d, i, t: {"path": {"user_id": t}, "data": user_form(d, i, "u")},
+          auth="admin", targets="users"),
+    Route("GET", "/user/logout", auth="client"),
+    Route("GET", "/user/cache_stats"),
+    Route("DELETE", "/user/delete_user/{user_id}", lambda d, i, t: {"path": {"user_id": t}},
+          auth="admin", targets="users"),
+    # HTML (webapp/routers/routers.py)
+    Route("GET", "/", lambda d, i, t: {"params": {"page": d.page(i)}}),
+    Route("GET", "/", lambda d, i, t: {"params": {"page": d.page(i)}}, auth="client", label="authorized"),
+    Route("GET", "/one_post/{post_id}", lambda d, i, t: {"path": {"post_id": d.post(i)}}),
+    Route("GET", "/category_post_all/{category_id}",
+          lambda d, i, t: {"path": {"category_id": d.category(i)}, "params": {"page": d.page(i)}}),
+    Route("POST", "/search/", lambda d, i, t: {"data": {"search": d.term(i)}}),
+    Route("GET", "/registration"),
+    Route("POST", "/registration", lambda d, i, t: {"data": user_form(d, i, "r")}),
+    Route("GET", "/login"),
+    Route("POST", "/login", lambda d, i, t: {"data": {"username": d.client, "password": SEED_PASSWORD}}),
+    Route("GET", "/logout", auth="client"),
+    Route("GET", "/update_user", auth="client"),
+    Route("POST", "/update_user/{user_id}", lambda d, i, t: {"path": {"user_id": t}, "data": user_form(d, i, "w")},
+          auth="admin", targets="users"),
+    Route("GET", "/delete/{user_id}", lambda d, i, t: {"path": {"user_id": t}}, auth="admin", targets="users"),
+    Route("GET", "/create_post", auth="admin"),
+    Route("POST", "/create_post", lambda d, i, t: {"data": post_form(d, i)}, auth="admin"),
+    Route("GET", "/edit_post/{post_id}", lambda d, i, t: {"path": {"post_id": d.post(i)}}, auth="admin"),
+    Route("POST", "/update_post/{post_id}", lambda d, i, t: {"path": {"post_id": t}, "data": post_form(d, i)},
+          auth="admin", targets="posts"),
+    Route("GET", "/delete_post/{post_id}", lambda d, i, t: {"path": {"post_id": t}}, auth="admin", targets="posts"),
+    Route("GET", "/category_create", auth="admin"),
+    Route("POST", "/category_create", lambda d, i, t: {"data": {"title": f"{CATEGORY_PREFIX}{d.run} h{i}"}},
+          auth="admin"),
+    Route("GET", "/category-update-delete", auth="admin"),
+    Route("GET", "/update_category/{category_id}", lambda d, i, t: {"path": {"category_id": d.category(i)}},
+          auth="admin"),
+    Route("POST", "/update_category/{category_id}",
+          lambda d, i, t: {"path": {"category_id": t}, "data": {"title": f"{CATEGORY_PREFIX}{d.run} w{i}"}},
+          auth="admin", targets="categories"),
+    Route("GET", "/delete_category/{category_id}", lambda d, i, t: {"path": {"category_id": t}},
+          auth="admin", targets="categories"),
+]
+
+
+class BenchData:
+    """Данные из БД для построения запросов: выборка записей, категории, слова для поиска, пользователи"""
+
+    def __init__(self, max_page: int, seed_value: int = 0):
+        self.rng = random.Random(seed_value)
+        self.max_page = max_page
+        # Имена создаваемых объектов уникальны между прогонами
+        self.run = format(int(time.time()), "x")
+        self.post_ids, self.category_ids, self.terms, self.contents = [], [], [], []
+        self.admin_id, self.client, self.headers = None, None, {}
+        self.created = 0  # Сколько объектов уже создано для изменяющих маршрутов (номера в именах)
+
+    async def load(self):
+        async with async_session() as session:
+            self.admin_id = await session.scalar(select(User.id).filter(User.username == SEED_ADMIN))
+            if self.admin_id is None:
+                raise SystemExit("No seeded data: run python -m benchmarks.seed first")
+            self.client = await session.scalar(
+                select(User.username).filter(bench_users(), User.group != "ADMIN").order_by(User.id).limit(1)
+            ) or SEED_ADMIN
+            self.category_ids = list(await session.scalars(select(Category.id).filter(bench_categories())))
+            # Случайные id по индексу: ORDER BY random() на миллионах записей читал бы всю таблицу
+            low, high = (await session.execute(select(func.min(Post.id), func.max(Post.id)))).one()
+            candidates = self.rng.sample(range(low, high + 1), min(SAMPLE * 3, high - low + 1)) if high else []
+            rows = (await session.execute(
+                select(Post.id, Post.title, Post.content).filter(Post.id.in_(candidates), Post.published)
+                .limit(SAMPLE))).all()
+        if not rows:
+            raise SystemExit("No published posts: run python -m benchmarks.seed first")
+        self.post_ids = [row.id for row in rows]
+        self.contents = [row.content for row in rows[:100]]
+        self.terms = sorted({word.lower() for row in rows for word in row.title.split() if len(word) > 3})
+        self.headers = {
+            "admin": {"Cookie": f'{NAME_COOKIES}=Bearer {create_access_token({"sub": SEED_ADMIN})}'},
+            "client": {"Cookie": f'{NAME_COOKIES}=Bearer {create_access_token({"sub": self.client})}'},
+            None: {},
+        }
+
+    # Значение для i-го запроса: одинаковое при одинаковых --seed и выборке
+    def post(self, i):
+        return self.post_ids[i * 7919 % len(self.post_ids)]
+
+    def category(self, i):
+        return self.category_ids[i * 31 % len(self.category_ids)]
+
+    def page(self, i):
+        return 1 + i * 13 % self.max_page
+
+    def term(self, i):
+        return self.terms[i * 17 % len(self.terms)]
+
+    def content(self, i):
+        return self.contents[i % len(self.contents)]
+
+    async def targets(self, kind: str, count: int) -> list:
+        """Создаёт count объектов для изменяющих маршрутов, возвращает их id"""
+        numbers, self.created = range(self.created, self.created + count), self.created + count
+        if kind == "posts":
+            content = self.contents[0]
+            values = [{"title": f"Benchmark target {self.run} {i}", "content": content,
+                       "excerpt": make_excerpt(content), "published": False, "user_id": self.admin_id,
+                       "category_id": self.category(i)} for i in numbers]
+            query = insert(Post).values(values).returning(Post.id)
+        elif kind == "categories":
+            query = insert(Category).values(
+                [{"title": f"{CATEGORY_PREFIX}{self.run} t{i}"} for i in numbers]).returning(Category.id)
+        else:
+            password = pbkdf2_sha256.hash(SEED_PASSWORD)
+            query = insert(User).values([
+                {"username": f"{USER_PREFIX}{self.run}T{i}".title(), "password": password,
+                 "email": f"bench.{self.run}.t{i}@example.org", "group": "CLIENT"} for i in numbers
+            ]).returning(User.id)
+        async with async_session() as session:
+            ids = list(await session.scalars(query))
+            await session.commit()
+        return ids
+
+
+def db_queries(route: str) -> float:
+    return REGISTRY.get_sample_value("db_queries_total", {"route": route}) or 0.0
+
+
+def percentile(values: list, p: float) -> float:
+    """Percentile по ближайшему рангу (values отсортированы)"""
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+async def run_route(client: httpx.AsyncClient, route: Route, data: BenchData, requests: int, concurrency: int,
+                    warmup: int, headers: dict) -> dict:
+    """Прогрев (warmup запросов без учёта), затем замер requests запросов"""
+    targets = await data.targets(route.targets, warmup + requests) if route.targets else None
+    latencies, statuses = [], Counter()
+
+    async def worker(numbers, measure: bool):
+        for i in numbers:
+            kwargs = route.make(data, i, targets[i] if targets else None)
+            url = route.path.format(**kwargs.pop("path", {}))
+            started = time.perf_counter()
+            try:
+                response = await client.request(route.method, url, headers={**headers, **data.headers[route.auth]},
+                                                 **kwargs)
+                status = str(response.status_code)
+            except Exception as ex:
+                status = type(ex).__name__
+            if measure:
+                latencies.append(time.perf_counter() - started)
+                statuses[status] += 1
+
+    async def phase(numbers, measure: bool):
+        numbers = iter(numbers)  # Общий итератор: каждый номер достаётся одному исполнителю
+        await asyncio.gather(*(worker(numbers, measure) for _ in range(concurrency)))
+
+    await phase(range(warmup), False)
+    queries = db_queries(route.path)
+    started = time.perf_counter()
+    await phase(range(warmup, warmup + requests), True)
+    elapsed = time.perf_counter() - started
+    queries = db_queries(route.path) - queries
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 2)
+    return {
+        "requests": requests,
+        "errors": sum(count for status, count in statuses.items() if not status.isdigit() or status >= "500"),
+        "statuses": dict(sorted(statuses.items())),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "mean_ms": ms(sum(latencies) / len(latencies)),
+        "max_ms": ms(latencies[-1]),
+        "rps": round(requests / elapsed, 1),
+        "queries_per_request": round(queries / requests, 2),
+    }
+
+
+def configure_rate_limit(mode: str):
+    if mode == "off":
+        rate_limit.limiter.enabled = False
+    elif mode == "unlimited":
+        rate_limit.limiter.enabled = True
+        for limit in rate_limit.LIMITS.values():
+            limit.limit = (1e9, 1e9)
+
+
+async def main(requests: int, concurrency: int, warmup: int, routes: list, max_page: int, no_cache: bool,
+               seed_value: int, rate_limit_mode: str = "off") -> dict:
+    configure_rate_limit(rate_limit_mode)
+    data = BenchData(max_page, seed_value)
+    await data.load()
+    headers = {"Cache-Control": "no-store"} if no_cache else {}
+    selected = [route for route in ROUTES if not routes or any(item in route.name for item in routes)]
+    report = {
+        "config": {"requests": requests, "concurrency": concurrency, "warmup": warmup, "max_page": max_page,
+                   "no_cache": no_cache, "rate_limit": rate_limit_mode, "sampled_posts": len(data.post_ids),
+                   "categories": len(data.category_ids)},
+        "routes": {},
+    }
+    await app.router.startup()
+    try:
+        # Исключения приложения - ответ 500 (считается ошибкой), а не остановка замера
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            # Cookie из ответов (вход) не сохраняются: авторизация задаётся маршрутом, а не предыдущими запросами
+            client.cookies.jar.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            for route in selected:
+                report["routes"][route.name] = await run_route(
+                    client, route, data, requests, concurrency, warmup, headers)
+    finally:
+        await app.router.shutdown()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="замеряемых запросов на маршрут")
+    parser.add_argument("--concurrency", type=int, default=20, help="одновременных запросов")
+    parser.add_argument("--warmup", type=int, default=10, help="запросов прогрева на маршрут (не учитываются)")
+    parser.add_argument("--routes", nargs="*", default=[], help="только маршруты, содержащие эти подстроки")
+    parser.add_argument("--max-page", type=int, default=20, help="страницы списков - от 1 до этой")
+    parser.add_argument("--no-cache", action="store_true", help="запросы с Cache-Control: no-store")
+    parser.add_argument("--rate-limit", choices=RATE_LIMIT_MODES, default="off", help="ограничение частоты")
+    parser.add_argument("--seed", type=int, default=0, help="зерно выборки записей")
+    parser.add_argument("--output", help="записать JSON в файл (иначе - в stdout)")
+    args = parser.parse_args()
+    result = asyncio.run(main(args.requests, args.concurrency, args.warmup, args.routes, args.max_page,
+                              args.no_cache, args.seed, args.rate_limit))
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
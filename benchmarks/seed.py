@@ -0,0 +1,174 @@
+"""
+Заполнение БД правдоподобными данными (Faker) для замеров: пользователи, категории и записи.
+
+Записи собираются из заранее сгенерированных Faker заголовков и абзацев и загружаются пачками
+через COPY asyncpg, поэтому масштаб ограничен только диском (10 тыс. - 10 млн записей).
+Пользователи и категории создаются при первом запуске; повторный запуск добавляет записи к уже
+созданным, так масштаб наращивается без пересоздания. У всех пользователей пароль SEED_PASSWORD,
+SEED_ADMIN - администратор. После загрузки пересчитываются счётчики опубликованных записей
+и обновляется статистика планировщика (ANALYZE).
+--clean удаляет всё, что создали этот скрипт и benchmarks.routes (по префиксам имён).
+
+    python -m benchmarks.seed --posts 10000
+    python -m benchmarks.seed --users 10000 --categories 200 --posts 10000000
+    python -m benchmarks.seed --clean
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+# pip install Faker
+from faker import Faker
+from passlib.hash import pbkdf2_sha256
+from sqlalchemy import delete, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+from api_databases.address_db import _URL_DATABASE
+from post.bulk_import import COLUMNS
+from post.counters import run_reconciliation
+from post.listing import make_excerpt
+from src.api_models import Category, Post, User
+
+# По префиксам созданные пользователи и категории отличаются от настоящих (их записи удаляет --clean)
+USER_PREFIX = "Bench_"
+CATEGORY_PREFIX = "Bench "
+SEED_ADMIN = f"{USER_PREFIX}Admin"
+SEED_PASSWORD = "benchmark1"
+USER_COLUMNS = ("username", "password", "email", "created", "is_active", "group")
+BATCH_SIZE = 10000
+TITLES = 5000  # Размер наборов текстов Faker, из которых собираются записи
+PARAGRAPHS = 10000
+
+
+def bench_users():
+    return User.username.startswith(USER_PREFIX, autoescape=True)
+
+
+def bench_categories():
+    return Category.title.startswith(CATEGORY_PREFIX, autoescape=True)
+
+
+class TextPool:
+    """Заголовки и абзацы Faker генерируются один раз: запись - случайный выбор из них (Faker на запись - слишком медленно)"""
+
+    def __init__(self, faker: Faker, rng: random.Random):
+        self.rng = rng
+        self.titles = [faker.sentence(nb_words=rng.randint(3, 10)).rstrip(".") for _ in range(TITLES)]
+        self.paragraphs = [faker.paragraph(nb_sentences=rng.randint(3, 8)) for _ in range(PARAGRAPHS)]
+
+    def title(self) -> str:
+        return self.rng.choice(self.titles)
+
+    def content(self) -> str:
+        return "\n\n".join(self.rng.sample(self.paragraphs, self.rng.randint(2, 6)))
+
+
+def user_records(faker: Faker, count: int, password: str):
+    """Администратор SEED_ADMIN и count - 1 клиентов (имена в title(), как их сохраняет регистрация)"""
+    now = datetime.utcnow()
+    yield SEED_ADMIN, password, f"bench.admin@{faker.free_email_domain()}", now, True, "ADMIN"
+    for idx in range(1, count):
+        username = f"{USER_PREFIX}{idx}{faker.first_name()}"[:35].title()
+        email = f"bench.{idx}.{faker.user_name()}@{faker.free_email_domain()}".lower()
+        yield username, password, email, now, True, "CLIENT"
+
+
+def category_records(faker: Faker, count: int):
+    for idx in range(count):
+        yield f"{CATEGORY_PREFIX}{faker.word().title()} {idx}",
+
+
+def post_records(pool: TextPool, count: int, user_ids: list, category_ids: list, published_ratio: float,
+                 days: int):
+    """Записи в порядке COLUMNS, даты создания - за последние days дней"""
+    rng, now, span = pool.rng, datetime.utcnow(), days * 86400
+    for _ in range(count):
+        content = pool.content()
+        yield (pool.title(), content, make_excerpt(content), now - timedelta(seconds=rng.uniform(0, span)),
+               rng.random() < published_ratio, rng.choice(user_ids), rng.choice(category_ids))
+
+
+async def load(session: AsyncSession, table: str, columns, records, batch_size: int = BATCH_SIZE) -> int:
+    """Загружает записи через COPY, каждая пачка - отдельная транзакция; возвращает количество"""
+    loaded, records = 0, iter(records)
+    while batch := list(islice(records, batch_size)):
+        connection = await session.connection()
+        driver_connection = (await connection.get_raw_connection()).driver_connection
+        await driver_connection.copy_records_to_table(table, records=batch, columns=columns)
+        await session.commit()
+        loaded += len(batch)
+    return loaded
+
+
+async def seed(users: int, categories: int, posts: int, batch_size: int = BATCH_SIZE,
+               published_ratio: float = 0.9, days: int = 365, seed_value: int = 0) -> dict:
+    """Заполняет БД, возвращает отчёт: сколько создано и за сколько секунд"""
+    rng = random.Random(seed_value)
+    Faker.seed(seed_value)
+    faker = Faker()
+    report = {"users": 0, "categories": 0, "posts": 0}
+    started = time.perf_counter()
+    engine = create_async_engine(_URL_DATABASE, poolclass=NullPool)
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            if await session.scalar(select(User.id).filter(User.username == SEED_ADMIN)) is None:
+                # Один хэш на всех: pbkdf2 для каждого пользователя занял бы больше, чем вся загрузка
+                password = pbkdf2_sha256.hash(SEED_PASSWORD)
+                report["users"] = await load(session, "user", USER_COLUMNS, user_records(faker, users, password))
+                report["categories"] = await load(session, "category", ("title",), category_records(faker, categories))
+            user_ids = list(await session.scalars(select(User.id).filter(bench_users())))
+            category_ids = list(await session.scalars(select(Category.id).filter(bench_categories())))
+            if not category_ids:
+                raise SystemExit("No seeded categories: run with --clean and --categories > 0")
+            records = post_records(TextPool(faker, rng), posts, user_ids, category_ids, published_ratio, days)
+            report["posts"] = await load(session, "post", COLUMNS, records, batch_size)
+            for table in ("user", "category", "post"):
+                await session.execute(text(f'ANALYZE "{table}"'))
+            await session.commit()
+    finally:
+        await engine.dispose()
+    # COPY обходит счётчики - пересчёт по таблице (и сброс кэша списков, если они разошлись)
+    report["counters_fixed"] = len(await run_reconciliation())
+    report["seconds"] = round(time.perf_counter() - started, 1)
+    return report
+
+
+async def clean() -> dict:
+    """Удаляет созданных пользователей и категории вместе с их записями"""
+    engine = create_async_engine(_URL_DATABASE, poolclass=NullPool)
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            users = select(User.id).filter(bench_users())
+            categories = select(Category.id).filter(bench_categories())
+            result = await session.execute(
+                delete(Post).filter(or_(Post.user_id.in_(users), Post.category_id.in_(categories))))
+            report = {"posts": result.rowcount}
+            report["categories"] = (await session.execute(delete(Category).filter(bench_categories()))).rowcount
+            report["users"] = (await session.execute(delete(User).filter(bench_users()))).rowcount
+            await session.commit()
+    finally:
+        await engine.dispose()
+    report["counters_fixed"] = len(await run_reconciliation())
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="пользователей (только при первом запуске)")
+    parser.add_argument("--categories", type=int, default=50, help="категорий (только при первом запуске)")
+    parser.add_argument("--posts", type=int, default=10000, help="добавить записей")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="записей в одной транзакции COPY")
+    parser.add_argument("--published-ratio", type=float, default=0.9, help="доля опубликованных записей")
+    parser.add_argument("--days", type=int, default=365, help="даты создания - за последние дни")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генераторов (одинаковые данные при повторе)")
+    parser.add_argument("--clean", action="store_true", help="удалить созданные данные и выйти")
+    args = parser.parse_args()
+    if args.clean:
+        result = asyncio.run(clean())
+    else:
+        result = asyncio.run(seed(args.users, args.categories, args.posts, args.batch_size,
+                                  args.published_ratio, args.days, args.seed))
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,94 @@
+"""
+Время сериализации страницы записей в JSON (без БД и сети).
+
+before - как было: ORM-объекты, jsonable_encoder FastAPI + JSONResponse.
+after - словари по схеме ResponsePostScheme (src.serialization.dump) + ORJSONResponse без jsonable_encoder.
+validated - для сравнения: response_model с валидацией pydantic, как FastAPI делает при возврате данных.
+
+    python -m benchmarks.serialization --sizes 9 100 --repeat 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import BaseModel
+from typing import List
+from post.schemes import ResponsePostScheme
+from sqlalchemy.orm.attributes import set_committed_value
+from src.api_models import Category, Post
+from src.serialization import dump_all, json_response
+
+
+class PageScheme(BaseModel):
+    """Страница с полными записями (ResponsePostScheme)"""
+    data: List[ResponsePostScheme]
+    total_pages: int
+    show_pagination: bool
+
+
+PAGE_FIELD = create_response_field(name="response", type_=PageScheme)
+
+
+def make_page(size: int) -> dict:
+    """Страница, как её возвращает pagination(): ORM-объекты с загруженной категорией"""
+    category = Category(id=1, title="Python")
+    posts = [
+        Post(id=idx, title=f"Post title {idx}", content="Lorem ipsum dolor sit amet " * 40, created=datetime.now(),
+             published=True, user_id=1, category_id=1)
+        for idx in range(size, 0, -1)
+    ]
+    for post in posts:
+        # Как после selectinload: без обратной ссылки category.posts
+        set_committed_value(post, "category", category)
+    return {"data": posts, "total_pages": 10, "show_pagination": True}
+
+
+async def before(page: dict) -> bytes:
+    content = await serialize_response(response_content=page)
+    return JSONResponse(content).body
+
+
+async def after(page: dict) -> bytes:
+    return json_response({**page, "data": dump_all(ResponsePostScheme, page["data"])}).body
+
+
+async def validated(page: dict) -> bytes:
+    content = await serialize_response(field=PAGE_FIELD, response_content=page, exclude_unset=True)
+    return ORJSONResponse(content).body
+
+
+async def measure(serialize, page: dict, repeat: int) -> float:
+    """Среднее время одной сериализации (микросекунды)"""
+    await serialize(page)  # Прогрев
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await serialize(page)
+    return (time.perf_counter() - started) / repeat * 1_000_000
+
+
+async def main(sizes, repeat: int):
+    results = []
+    for size in sizes:
+        page = make_page(size)
+        # Обе версии должны выдавать одинаковые данные
+        assert json.loads(await before(page)) == json.loads(await after(page)) == json.loads(await validated(page))
+        timings = {name: await measure(serialize, page, repeat) for name, serialize in
+                   (("before", before), ("after", after), ("validated", validated))}
+        results.append({
+            "posts": size,
+            **{f"{name}_us": round(value, 1) for name, value in timings.items()},
+            "speedup": round(timings["before"] / timings["after"], 2),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[9, 100], help="размеры страниц")
+    parser.add_argument("--repeat", type=int, default=2000, help="повторов на размер")
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.repeat))
@@ -0,0 +1,97 @@
+"""
+Отправка писем через локальный SMTP-сервер aiosmtpd (вместо настоящего).
+
+before - как было: новое подключение (и логин) на каждое письмо.
+after - tasks.mailer.SMTPPool: постоянное подключение, письма подряд.
+--latency добавляет задержку ответа сервера на подключение (у настоящего сервера - TLS и логин).
+
+    python -m benchmarks.smtp_delivery --emails 200 --latency 0.05
+"""
+# pip install aiosmtpd
+import argparse
+import asyncio
+import json
+import smtplib
+import time
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import SMTP
+from tasks.mailer import SMTPPool, build_message
+
+HOST = "127.0.0.1"
+
+
+class Handler:
+    """Считает принятые письма"""
+
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+class SlowSMTP(SMTP):
+    """Сервер, который отвечает на подключение с задержкой"""
+    latency = 0.0
+
+    async def _handle_client(self):
+        await asyncio.sleep(self.latency)
+        await super()._handle_client()
+
+
+class SlowController(Controller):
+    def factory(self):
+        return SlowSMTP(self.handler, **self.SMTP_kwargs)
+
+
+def emails(count: int) -> list:
+    return [build_message(f"user{idx}@example.com", "Registration", "<p>Hello</p>") for idx in range(count)]
+
+
+def before(connect, messages: list) -> int:
+    for message in messages:
+        with connect() as server:
+            server.send_message(message)
+    return len(messages)
+
+
+def after(connect, messages: list) -> int:
+    pool = SMTPPool(size=1, max_per_connection=100, idle_check=30, rate=0, connect=connect)
+    # Как последовательные задачи Celery в одном процессе воркера: по одному письму
+    failed = sum(len(pool.send([message])) for message in messages)
+    pool.close()
+    assert not failed
+    return pool.connects
+
+
+def main(count: int, latency: float, port: int):
+    SlowSMTP.latency = latency
+    handler = Handler()
+    controller = SlowController(handler, hostname=HOST, port=port)
+    controller.start()
+    results = {}
+    try:
+        for name, send in (("before", before), ("after", after)):
+            received = handler.received
+            started = time.perf_counter()
+            connects = send(lambda: smtplib.SMTP(HOST, port, timeout=10), emails(count))
+            elapsed = time.perf_counter() - started
+            results[name] = {
+                "emails": handler.received - received,
+                "connects": connects,
+                "seconds": round(elapsed, 3),
+                "emails_per_second": round(count / elapsed, 1),
+            }
+    finally:
+        controller.stop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=200, help="количество писем")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка подключения к серверу (секунды)")
+    parser.add_argument("--port", type=int, default=8025, help="порт локального SMTP-сервера")
+    args = parser.parse_args()
+    main(args.emails, args.latency, args.port)
@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from src.api_models import Category, Post
-from api_databases.connect_db import get_async_session, data_is_not_valid
+from src.api_models import Category
+from api_databases.connect_db import get_async_session, get_read_session, data_is_not_valid
 from sqlalchemy.ext.asyncio import AsyncSession
-from category.schemes import CategoryScheme
-from sqlalchemy import insert, select, update, func
+from typing import List
+from category.schemes import CategoryScheme, ResponseCategoryScheme, ResponseSidebarCategoryScheme
+from sqlalchemy import insert, select, update
 from user.my_token import get_current_user
 from post.routers import content_error, field_validation
+from post.counters import drop_category_counter
+from category.sidebar import get_sidebar
+from src.cache_tags import POSTS_LIST, POSTS_DETAIL, category_tag, invalidate_tags
+from src.serialization import dump
 
 router = APIRouter(
     prefix="/category", tags=["Category"]
@@ -77,6 +82,8 @@ async def update_one_category(category_id: int, category: CategoryScheme = Depen
         await session.commit()
     except Exception as ex:
         return {"errors": f'{ex}'}
+    # Название категории выводится в списках и на страницах записей
+    await invalidate_tags(category_tag(category_id), POSTS_LIST, POSTS_DETAIL)
     response = {
         "status": status.HTTP_202_ACCEPTED,
         "data": {**category.dict()},
@@ -85,7 +92,7 @@ async def update_one_category(category_id: int, category: CategoryScheme = Depen
     return response
 
 
-@router.get("/category/{category_id}")
+@router.get("/category/{category_id}", response_model=ResponseCategoryScheme)
 async def get_category(category_id: int, session: AsyncSession = Depends(get_async_session)):
     """Получение конкретной категории"""
     try:
@@ -94,22 +101,16 @@ async def get_category(category_id: int, session: AsyncSession = Depends(get_asy
         result = my_category.scalar()
         if result is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'Category ID: {category_id} not found')
-        return result
+        return dump(ResponseCategoryScheme, result)
     except Exception:
         raise data_is_not_valid
 
 
-@router.get("/categories_all", status_code=status.HTTP_200_OK)
-async def get_all_categories(session: AsyncSession = Depends(get_async_session)):
-    """Получение только тех категорий, у которых есть опубликованные посты"""
+@router.get("/categories_all", status_code=status.HTTP_200_OK, response_model=List[ResponseSidebarCategoryScheme])
+async def get_all_categories(session: AsyncSession = Depends(get_read_session)):
+    """Получение только тех категорий, у которых есть опубликованные посты (из памяти процесса)"""
     try:
-        category = select(Category.id, Category.title, func.count(Post.id)).join(Category.posts).filter(
-            Post.published).group_by(Category.id, Category.title)
-        exists = await session.execute(category)
-        result = exists.fetchall()
-        if result is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'Categories not found')
-        result = [{"category_id": row[0], "category": row[1], "post_count": row[2]} for row in result]
+        result = await get_sidebar(session)
         return result
 
     except Exception:
@@ -132,8 +133,11 @@ async def delete_category(category_id: int, current_user: dict = Depends(get_cur
         cat_title = category.title
         if not category:
             return {"messages": f"Category ID: {category_id} not found"}
+        # Записи категории удаляются каскадом - вычитаем их из счётчиков в той же транзакции
+        await drop_category_counter(session, category_id)
         await session.delete(category)
         await session.commit()
+        await invalidate_tags(category_tag(category_id), POSTS_LIST, POSTS_DETAIL)
         return {
             "messages": f"Category ID: {category_id} DELETED!",
             "title": cat_title
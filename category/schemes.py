@@ -28,3 +28,10 @@ class ResponseCategoryScheme(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class ResponseSidebarCategoryScheme(BaseModel):
+    """Категория боковой панели с количеством опубликованных записей"""
+    category_id: int
+    category: str
+    post_count: int
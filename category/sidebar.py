@@ -0,0 +1,36 @@
+import time
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.api_models import Category, PostCounter
+from src.cache_tags import ALL_TAGS, POSTS_LIST, on_invalidate
+from src.settings_env import SIDEBAR_TTL
+
+# Снимок боковой панели категорий в памяти процесса
+_sidebar = {"data": None, "expires": 0.0, "generation": 0}
+
+
+@on_invalidate
+def drop_sidebar(tags):
+    """Сбрасывает снимок, если изменились опубликованные записи или категории"""
+    if any(tag in (ALL_TAGS, POSTS_LIST) or tag.startswith("category:") for tag in tags):
+        _sidebar["data"] = None
+        _sidebar["generation"] += 1
+
+
+async def get_sidebar(session: AsyncSession) -> list:
+    """
+    Категории с опубликованными записями и их количеством.
+    Строится по таблице счётчиков (без сканирования post) и отдаётся из памяти до сброса
+    """
+    if _sidebar["data"] is not None and _sidebar["expires"] > time.monotonic():
+        return _sidebar["data"]
+    generation = _sidebar["generation"]
+    query = select(Category.id, Category.title, PostCounter.value).join(
+        PostCounter, PostCounter.name == func.concat("category:", Category.id, ":published")
+    ).filter(PostCounter.value > 0).order_by(Category.title)
+    result = await session.execute(query)
+    data = [{"category_id": row[0], "category": row[1], "post_count": row[2]} for row in result.all()]
+    # Снимок, загруженный до сброса, мог устареть - не сохраняем его
+    if generation == _sidebar["generation"]:
+        _sidebar.update(data=data, expires=time.monotonic() + SIDEBAR_TTL)
+    return data
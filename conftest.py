@@ -0,0 +1,8 @@
+# pip install pytest
+import pytest
+
+
+@pytest.fixture
+def anyio_backend():
+    """Асинхронные тесты (pytest.mark.anyio) выполняются в asyncio"""
+    return "asyncio"
@@ -0,0 +1,9 @@
+# gunicorn main:app -c gunicorn.conf.py
+from prometheus_client import multiprocess
+
+worker_class = "uvicorn.workers.UvicornWorker"
+
+
+def child_exit(server, worker):
+    """Удаляет файлы метрик завершившегося воркера (режим multiprocess prometheus-client)"""
+    multiprocess.mark_process_dead(worker.pid)
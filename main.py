@@ -1,19 +1,31 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
+from src.cache_tags import TaggedRedisBackend, TwoTierBackend, listen_invalidations
+from src.local_cache import LocalCache
 from category.routers import router as router_category
 from user.routers import router as router_user
 from post.routers import router as post_router
 from webapp.routers.routers import router as web_router
-from fastapi.staticfiles import StaticFiles
+from api_databases.routers import router as router_db
+from api_databases.connect_db import engine, replica_engines
+from monitoring.metrics import PrometheusMiddleware, instrument_engine
+from monitoring.profiler import ProfilerMiddleware
+from monitoring.routers import router as router_monitoring
+from webapp.static_files import PrecompressedStaticFiles
 # pip install itsdangerous
 from starlette.middleware.sessions import SessionMiddleware
-from src.settings_env import SECRET_KEY_SESSION
-from src.settings_env import REDIS_HOST
-from redis import asyncio as aioredis
+from src.settings_env import (
+    SECRET_KEY_SESSION, CACHE_LOCAL_MAX_BYTES, CACHE_LOCAL_MAX_ITEM_BYTES, CACHE_LOCAL_TTL, PROFILE_REQUESTS
+)
+from src.redis_client import redis
+from user.hashing import shutdown_hash_pool
+from user.my_token import AuthMiddleware
 
+# JSON-ответы сериализуются через orjson
 app = FastAPI(
-    title="My_app_project"
+    title="My_app_project", default_response_class=ORJSONResponse
 )
 
 
@@ -21,19 +33,49 @@ app = FastAPI(
 # pip install "fastapi-cache2[redis]"
 @app.on_event("startup")
 async def startup():
-    """При старте проекта подключается к redis для кэширования"""
-    redis = aioredis.from_url(f"redis://{REDIS_HOST}", encoding="utf8", decode_responses=True)
-    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    """
+    При старте проекта подключается к redis для кэширования (ключи помечаются тегами для инвалидации);
+    если задан CACHE_LOCAL_MAX_BYTES, перед Redis работает кэш в памяти процесса
+    """
+    if CACHE_LOCAL_MAX_BYTES:
+        local = LocalCache(CACHE_LOCAL_MAX_BYTES, CACHE_LOCAL_MAX_ITEM_BYTES, CACHE_LOCAL_TTL)
+        backend = TwoTierBackend(redis, local)
+    else:
+        backend = TaggedRedisBackend(redis)
+    FastAPICache.init(backend, prefix="fastapi-cache")
+    # Подписка на инвалидацию из других процессов (сбрасывает данные, хранящиеся в памяти процесса)
+    app.state.invalidation_listener = asyncio.create_task(listen_invalidations(redis))
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Остановка подписки на инвалидацию"""
+    app.state.invalidation_listener.cancel()
+    shutdown_hash_pool()
 
 
 # В сессии будем хранить сообщение для вывода при перенаправлении
 app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY_SESSION)
 
-# Подключение статических файлов
+# Токен из cookie проверяется один раз на запрос (результат - в request.state для всех зависимостей)
+app.add_middleware(AuthMiddleware)
+
+# Метрики Prometheus: маршруты и SQL-запросы основной БД и реплик
+app.add_middleware(PrometheusMiddleware)
+for db_engine in [engine, *replica_engines]:
+    instrument_engine(db_engine)
+
+# Профиль запроса в заголовке Server-Timing (внешний middleware - время total включает все остальные)
+if PROFILE_REQUESTS:
+    app.add_middleware(ProfilerMiddleware)
+
+# Подключение статических файлов (после python -m webapp.static_files - с отпечатками и сжатыми вариантами)
 # pip install aiofiles
-app.mount("/static", StaticFiles(directory="webapp/static"), name="static")
+app.mount("/static", PrecompressedStaticFiles(), name="static")
 
 app.include_router(router_category)
 app.include_router(router_user)
 app.include_router(post_router)
 app.include_router(web_router)
+app.include_router(router_db)
+app.include_router(router_monitoring)
@@ -0,0 +1,29 @@
+"""2026-10-18-post-excerpt
+
+Revision ID: 27d9aafc3d1b
+Revises: ac5ce1c17045
+Create Date: 2026-10-18 18:05:41.230577
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '27d9aafc3d1b'
+down_revision = 'ac5ce1c17045'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('post', sa.Column('excerpt', sa.String(length=300), nullable=True))
+    # То же, что post.listing.make_excerpt: первые 30 слов, не длиннее 300 символов
+    op.execute(
+        r"UPDATE post SET excerpt = left(array_to_string("
+        r"(regexp_split_to_array(regexp_replace(content, '^\s+|\s+$', '', 'g'), '\s+'))[1:30], ' '), 300)"
+    )
+    op.alter_column('post', 'excerpt', nullable=False)
+
+
+def downgrade() -> None:
+    op.drop_column('post', 'excerpt')
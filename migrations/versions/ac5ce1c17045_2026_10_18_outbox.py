@@ -0,0 +1,31 @@
+"""2026-10-18-outbox
+
+Revision ID: ac5ce1c17045
+Revises: fe932fa079af
+Create Date: 2026-10-18 17:24:09.518362
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'ac5ce1c17045'
+down_revision = 'fe932fa079af'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('outbox',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('task', sa.String(length=150), nullable=False),
+                    sa.Column('args', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+                    sa.Column('created', sa.TIMESTAMP(), nullable=True),
+                    sa.Column('attempts', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+
+
+def downgrade() -> None:
+    op.drop_table('outbox')
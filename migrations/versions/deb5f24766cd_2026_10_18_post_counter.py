@@ -0,0 +1,35 @@
+"""2026-10-18-post-counter
+
+Revision ID: deb5f24766cd
+Revises: 6d892a8064d5
+Create Date: 2026-10-18 10:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'deb5f24766cd'
+down_revision = '6d892a8064d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('post_counter',
+                    sa.Column('name', sa.String(length=50), nullable=False),
+                    sa.Column('value', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('name')
+                    )
+    # Начальное заполнение счётчиков по существующим записям
+    op.execute("INSERT INTO post_counter (name, value) SELECT 'published', count(*) FROM post WHERE published")
+    # Двоеточие экранируется, иначе ":published" будет принято за параметр запроса
+    op.execute(sa.text(
+        "INSERT INTO post_counter (name, value) "
+        "SELECT 'category\\:' || category_id || '\\:published', count(*) FROM post WHERE published "
+        "GROUP BY category_id"
+    ))
+
+
+def downgrade() -> None:
+    op.drop_table('post_counter')
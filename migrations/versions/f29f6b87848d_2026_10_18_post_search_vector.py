@@ -0,0 +1,35 @@
+"""2026-10-18-post-search-vector
+
+Revision ID: f29f6b87848d
+Revises: deb5f24766cd
+Create Date: 2026-10-18 12:40:05.518342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'f29f6b87848d'
+down_revision = 'deb5f24766cd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Генерируемый столбец заполняется для существующих строк при добавлении
+    op.add_column('post', sa.Column(
+        'search_vector', postgresql.TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(content, '')), 'B')",
+            persisted=True
+        ),
+        nullable=True
+    ))
+    op.create_index('ix_post_search_vector', 'post', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_post_search_vector', table_name='post', postgresql_using='gin')
+    op.drop_column('post', 'search_vector')
@@ -0,0 +1,39 @@
+"""2026-10-18-post-listing-indexes
+
+Revision ID: fe932fa079af
+Revises: f29f6b87848d
+Create Date: 2026-10-18 15:02:47.730915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'fe932fa079af'
+down_revision = 'f29f6b87848d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в post, но не может выполняться внутри транзакции
+    with op.get_context().autocommit_block():
+        # Внешние ключи: каскадное удаление категории и пользователя, подсчёт записей пользователя
+        op.create_index(op.f('ix_post_category_id'), 'post', ['category_id'], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index(op.f('ix_post_user_id'), 'post', ['user_id'], unique=False,
+                        postgresql_concurrently=True)
+        # get_all_posts: WHERE published ORDER BY id DESC
+        op.create_index('ix_post_published_id', 'post', [sa.text('id DESC')], unique=False,
+                        postgresql_where=sa.text('published'), postgresql_concurrently=True)
+        # category_post_all: WHERE category_id = ? AND published ORDER BY id DESC
+        op.create_index('ix_post_published_category_id', 'post', ['category_id', sa.text('id DESC')], unique=False,
+                        postgresql_where=sa.text('published'), postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_post_published_category_id', table_name='post', postgresql_concurrently=True)
+        op.drop_index('ix_post_published_id', table_name='post', postgresql_concurrently=True)
+        op.drop_index(op.f('ix_post_user_id'), table_name='post', postgresql_concurrently=True)
+        op.drop_index(op.f('ix_post_category_id'), table_name='post', postgresql_concurrently=True)
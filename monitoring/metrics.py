@@ -0,0 +1,92 @@
+# pip install prometheus-client
+# Для нескольких воркеров gunicorn задайте PROMETHEUS_MULTIPROC_DIR (пустой каталог) до запуска
+import time
+from contextvars import ContextVar
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from monitoring.profiler import record_query
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Время обработки запроса", ["method", "route", "status"]
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Запросы в обработке", ["method"], multiprocess_mode="livesum"
+)
+DB_QUERIES = Counter("db_queries_total", "Количество SQL-запросов", ["route"])
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Время выполнения SQL-запроса", ["route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL-запросов на один HTTP-запрос", ["route"],
+    buckets=(0, 1, 2, 3, 4, 5, 7, 10, 15, 20, 30, 50)
+)
+CACHE_REQUESTS = Counter("cache_requests_total", "Обращения к fastapi-cache", ["result"])
+RATE_LIMITED = Counter("rate_limited_total", "Запросы, отклонённые ограничением частоты", ["limit"])
+CELERY_ENQUEUE_DURATION = Histogram(
+    "celery_enqueue_duration_seconds", "Время постановки задачи Celery в очередь", ["task"]
+)
+
+# scope текущего запроса и счётчик его SQL-запросов
+_request = ContextVar("metrics_request", default=None)
+
+
+def route_label(scope) -> str:
+    """Шаблон пути маршрута (/post/one_post/{post_id}), а не сам путь - иначе меток будет без счёта"""
+    route = scope.get("route") if scope else None
+    return route.path if route is not None else "unmatched"
+
+
+class PrometheusMiddleware:
+    """ASGI middleware: длительность и количество запросов в обработке, SQL-запросы на маршрут"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        state = {"scope": scope, "queries": 0, "status": 500}
+        token = _request.set(state)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.labels(method).inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = route_label(scope)
+            HTTP_REQUEST_DURATION.labels(method, route, state["status"]).observe(time.perf_counter() - started)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(state["queries"])
+            HTTP_REQUESTS_IN_PROGRESS.labels(method).dec()
+            _request.reset(token)
+
+
+def instrument_engine(engine):
+    """
+    Подписывается на события движка SQLAlchemy: количество и длительность запросов по маршрутам,
+    запросы в профиль текущего запроса (monitoring.profiler)
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_started"].pop()
+        state = _request.get()
+        route = route_label(state["scope"]) if state else "background"
+        if state:
+            state["queries"] += 1
+        DB_QUERIES.labels(route).inc()
+        DB_QUERY_DURATION.labels(route).observe(duration)
+        # asyncpg (без server-side курсора) получает все строки сразу и берёт их число из статуса
+        # команды ("SELECT 10"), поэтому rowcount известен и для чтения; для stream() он -1
+        record_query(statement, parameters, duration, cursor.rowcount)
@@ -0,0 +1,167 @@
+"""
+Профилирование запросов (PROFILE_REQUESTS=true, для разработки): все SQL-запросы HTTP-запроса
+(текст, длительность, строки), время в кэше и в рендеринге шаблонов.
+Ответ получает заголовок Server-Timing (разбивка видна во вкладке Network браузера), а SQL,
+выполненный за один HTTP-запрос несколько раз, записывается в лог как вероятный N+1.
+
+В тестах и скриптах профиль собирается и без middleware:
+
+    with profile_queries() as profile:
+        await client.get("/post/one_post/1")
+    assert profile.query_count == 1 and not profile.repeated()
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from jinja2 import Template
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+# Профиль текущего запроса (или блока profile_queries)
+_profile = ContextVar("request_profile", default=None)
+
+
+class QueryProfile:
+    """SQL-запросы и время по видам работы (cache, render) одного HTTP-запроса"""
+
+    def __init__(self):
+        self.queries = []  # (SQL, параметры, длительность, строк - None, если неизвестно)
+        self.timings = Counter()  # вид работы -> секунды
+        self._open = set()  # Виды работы, замер которых идёт (вложенные вызовы не считаются дважды)
+
+    @property
+    def query_count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def row_count(self) -> int:
+        """Строк, возвращённых или изменённых запросами (где число известно)"""
+        return sum(rows for *_, rows in self.queries if rows is not None)
+
+    @property
+    def db_time(self) -> float:
+        return sum(duration for _, _, duration, _ in self.queries)
+
+    def repeated(self) -> dict:
+        """{SQL: сколько раз} - выполненные больше одного раза (с любыми параметрами): вероятные N+1"""
+        counts = Counter(statement for statement, _, _, _ in self.queries)
+        return {statement: count for statement, count in counts.items() if count > 1}
+
+    def duplicates(self) -> dict:
+        """{SQL: сколько раз} - выполненные больше одного раза с теми же параметрами (лишние запросы)"""
+        counts = Counter((statement, parameters) for statement, parameters, _, _ in self.queries)
+        result = Counter()
+        for (statement, _), count in counts.items():
+            if count > 1:
+                result[statement] += count
+        return dict(result)
+
+    def extend(self, other: "QueryProfile"):
+        self.queries.extend(other.queries)
+        self.timings.update(other.timings)
+
+    def server_timing(self, total: float) -> str:
+        """Значение заголовка Server-Timing (длительности в миллисекундах)"""
+        repeated = len(self.repeated())
+        desc = f"{self.query_count} queries, {self.row_count} rows" + (f", {repeated} repeated" if repeated else "")
+        metrics = [f'db;dur={self.db_time * 1000:.1f};desc="{desc}"']
+        metrics += [f"{kind};dur={seconds * 1000:.1f}" for kind, seconds in sorted(self.timings.items())]
+        return ", ".join(metrics + [f"total;dur={total * 1000:.1f}"])
+
+
+def record_query(statement: str, parameters, duration: float, rows: int):
+    """Вызывается из событий движка SQLAlchemy (monitoring.metrics.instrument_engine)"""
+    profile = _profile.get()
+    if profile is not None:
+        profile.queries.append((statement, repr(parameters), duration, rows if rows >= 0 else None))
+
+
+@contextmanager
+def span(kind: str):
+    """Время блока добавляется к виду работы kind профиля текущего запроса"""
+    profile = _profile.get()
+    if profile is None or kind in profile._open:
+        yield
+        return
+    profile._open.add(kind)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile._open.discard(kind)
+        profile.timings[kind] += time.perf_counter() - started
+
+
+def profiled(kind: str):
+    """Декоратор асинхронной функции: её время - вид работы kind"""
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(kind):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class ProfiledTemplate(Template):
+    """Шаблон Jinja, время рендеринга которого попадает в профиль (Environment.template_class)"""
+
+    def render(self, *args, **kwargs):
+        with span("render"):
+            return super().render(*args, **kwargs)
+
+
+@contextmanager
+def profile_queries():
+    """Собирает профиль всех запросов внутри блока (профили HTTP-запросов добавляются в него)"""
+    profile = QueryProfile()
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+
+def report_repeated(method: str, path: str, profile: QueryProfile):
+    repeated = profile.repeated()
+    if repeated:
+        duplicates = profile.duplicates()
+        logger.warning("%s %s: %d queries, repeated (possible N+1): %s", method, path, profile.query_count, [
+            {"sql": statement, "count": count, "identical": duplicates.get(statement, 0)}
+            for statement, count in repeated.items()
+        ])
+
+
+class ProfilerMiddleware:
+    """ASGI middleware: профиль каждого запроса, заголовок Server-Timing, предупреждение о повторах SQL"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        outer, profile = _profile.get(), QueryProfile()
+        token = _profile.set(profile)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", profile.server_timing(time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _profile.reset(token)
+            report_repeated(scope["method"], scope["path"], profile)
+            if outer is not None:
+                outer.extend(profile)
@@ -0,0 +1,24 @@
+import os
+from fastapi import APIRouter, Response
+from fastapi_cache import FastAPICache
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+
+router = APIRouter(tags=["Monitoring"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Метрики Prometheus (в режиме multiprocess - суммарно по всем воркерам)"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+@router.get("/cache_stats", include_in_schema=False)
+async def cache_stats():
+    """Статистика кэша в памяти этого процесса (если включён)"""
+    local = getattr(FastAPICache.get_backend(), "local", None)
+    return local.stats() if local is not None else {}
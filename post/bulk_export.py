@@ -0,0 +1,64 @@
+"""
+Потоковая выгрузка записей в NDJSON или CSV.
+
+Записи читаются серверным курсором пачками по EXPORT_CHUNK строк и сразу отдаются клиенту:
+память не зависит от количества записей, ответ начинается до окончания выборки.
+"""
+import csv
+import io
+from datetime import datetime
+import orjson
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.api_models import Post
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+COLUMNS = (Post.id, Post.title, Post.content, Post.created, Post.published, Post.user_id, Post.category_id)
+EXPORT_CHUNK = 1000  # Строк за одно обращение к курсору
+
+
+def export_query(category_id: int = None, published: bool = None, created_from: datetime = None,
+                 created_to: datetime = None):
+    """Выборка колонок (не ORM-объектов: они копились бы в identity map сессии) с фильтрами"""
+    query = select(*COLUMNS).order_by(Post.id)
+    if category_id is not None:
+        query = query.filter(Post.category_id == category_id)
+    if published is not None:
+        query = query.filter(Post.published.is_(published))
+    if created_from is not None:
+        query = query.filter(Post.created >= created_from)
+    if created_to is not None:
+        query = query.filter(Post.created < created_to)
+    return query
+
+
+async def export_partitions(session: AsyncSession, query, chunk: int = EXPORT_CHUNK):
+    """Пачки строк из серверного курсора"""
+    result = await session.stream(query.execution_options(yield_per=chunk))
+    async for partition in result.partitions():
+        yield partition
+
+
+async def ndjson_lines(partitions):
+    async for partition in partitions:
+        yield b"".join(orjson.dumps(dict(row._mapping)) + b"\n" for row in partition)
+
+
+async def csv_lines(partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in COLUMNS])
+    async for partition in partitions:
+        for row in partition:
+            writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_posts(session: AsyncSession, export_format: str, **filters):
+    """Тело ответа: генератор NDJSON или CSV по выборке export_query(**filters)"""
+    partitions = export_partitions(session, export_query(**filters))
+    return csv_lines(partitions) if export_format == "csv" else ndjson_lines(partitions)
@@ -0,0 +1,219 @@
+"""
+Массовый импорт записей из NDJSON или CSV.
+
+Вход читается потоком (построчно), строки проверяются правилами PostScheme и загружаются
+пачками через COPY asyncpg. Каждая пачка - отдельная транзакция вместе со счётчиками:
+ошибка пачки попадает в отчёт и не отменяет уже загруженные.
+
+    python -m post.bulk_import posts.ndjson --user-id 1
+    python -m post.bulk_import posts.csv --format csv --user-id 1 --batch-size 10000
+"""
+import argparse
+import asyncio
+import csv
+import json
+from collections import Counter
+from datetime import datetime
+from fastapi_cache import FastAPICache
+from pydantic import ValidationError
+from redis import asyncio as aioredis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+from api_databases.address_db import _URL_DATABASE
+from post.counters import change_published_count
+from post.listing import make_excerpt
+from post.schemes import ImportPostScheme
+from src.api_models import Category, User
+from src.cache_tags import POSTS_LIST, TaggedRedisBackend, category_tag, invalidate_tags
+from src.settings_env import REDIS_HOST
+from user.routers import field_validation
+
+FORMATS = ("ndjson", "csv")
+COLUMNS = ("title", "content", "excerpt", "created", "published", "user_id", "category_id")  # Порядок полей для COPY
+BATCH_SIZE = 5000
+YIELD_EVERY = 200  # Через сколько разобранных строк отдавать управление загрузке пачки
+MAX_REPORTED_ERRORS = 100  # Больше ошибок в отчёт не попадает (только счётчик)
+
+
+async def iter_lines(chunks):
+    """Строки из потока байтов (тело запроса, файл) без чтения всего потока в память"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode().rstrip("\r")
+    if buffer:
+        yield buffer.decode().rstrip("\r")
+
+
+async def ndjson_rows(lines):
+    """(номер строки, данные, ошибка) для каждого объекта JSON"""
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as ex:
+            yield number, None, f"invalid JSON: {ex}"
+            continue
+        if not isinstance(data, dict):
+            yield number, None, "JSON object expected"
+            continue
+        yield number, data, None
+
+
+async def csv_rows(lines):
+    """(номер строки, данные, ошибка) для каждой записи CSV, первая запись - заголовок"""
+    header, record, number, start = None, [], 0, 0
+    async for line in lines:
+        number += 1
+        if not record:
+            start = number
+        record.append(line)
+        text = "\n".join(record)
+        if not text.strip():
+            record = []
+            continue
+        try:
+            values = next(csv.reader([text], strict=True))
+        except csv.Error as ex:
+            # Запись оборвалась внутри поля в кавычках - поле продолжается на следующей строке
+            if str(ex).startswith("unexpected end of data"):
+                continue
+            record = []
+            yield start, None, f"invalid CSV: {ex}"
+            continue
+        record = []
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, None, f"expected {len(header)} fields, got {len(values)}"
+            continue
+        # Пустые значения необязательных полей - как отсутствующие
+        yield start, {key: value for key, value in zip(header, values) if value != ""}, None
+    if record:
+        yield start, None, "unterminated quoted field"
+
+
+def parse_rows(lines, import_format: str):
+    return csv_rows(lines) if import_format == "csv" else ndjson_rows(lines)
+
+
+async def validate_row(data: dict, user_id: int):
+    """Запись для COPY (в порядке COLUMNS) или список ошибок"""
+    try:
+        post = ImportPostScheme(**data)
+    except ValidationError as ex:
+        return None, [f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in ex.errors()]
+    errors = await field_validation(post.dict())
+    if errors:
+        return None, errors
+    record = (post.title, post.content, make_excerpt(post.content), post.created or datetime.utcnow(),
+              post.published, post.user_id or user_id, post.category_id)
+    return record, None
+
+
+def reject(report: dict, line: int, errors: list):
+    report["rejected"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append({"line": line, "errors": errors})
+
+
+async def load_batch(session: AsyncSession, batch: list, report: dict) -> set:
+    """
+    Загружает пачку [(номер строки, запись)] одной транзакцией,
+    возвращает категории, в которых появились опубликованные записи
+    """
+    report["batches"] += 1
+    lines, records = (batch[0][0], batch[-1][0]), None
+    try:
+        # Несуществующие категории и авторы отклоняются построчно, а не ошибкой COPY на всю пачку
+        categories = set(await session.scalars(
+            select(Category.id).filter(Category.id.in_({record[6] for _, record in batch}))))
+        users = set(await session.scalars(select(User.id).filter(User.id.in_({record[5] for _, record in batch}))))
+        records = []
+        for line, record in batch:
+            if record[6] not in categories:
+                reject(report, line, [f"category_id: {record[6]} does not exist"])
+            elif record[5] not in users:
+                reject(report, line, [f"user_id: {record[5]} does not exist"])
+            else:
+                records.append(record)
+        if not records:
+            await session.rollback()
+            return set()
+        connection = await session.connection()
+        driver_connection = (await connection.get_raw_connection()).driver_connection
+        await driver_connection.copy_records_to_table("post", records=records, columns=COLUMNS)
+        deltas = Counter(record[6] for record in records if record[4])
+        await change_published_count(session, deltas)
+        await session.commit()
+    except Exception as ex:
+        await session.rollback()
+        report["failed"] += len(batch) if records is None else len(records)
+        report["failed_batches"].append({"first_line": lines[0], "last_line": lines[1], "error": str(ex)})
+        return set()
+    report["imported"] += len(records)
+    return set(deltas)
+
+
+async def import_posts(session: AsyncSession, rows, user_id: int, batch_size: int = BATCH_SIZE) -> dict:
+    """Импорт строк parse_rows(); user_id - автор записей, у которых он не указан"""
+    report = {"imported": 0, "rejected": 0, "failed": 0, "batches": 0, "errors": [], "failed_batches": []}
+    published_categories, batch, loading = set(), [], None
+    async for line, data, error in rows:
+        record, errors = (None, [error]) if error else await validate_row(data, user_id)
+        if errors:
+            reject(report, line, errors)
+            continue
+        batch.append((line, record))
+        if loading is not None and len(batch) % YIELD_EVERY == 0:
+            await asyncio.sleep(0)  # Даём загрузке предыдущей пачки продвинуться
+        if len(batch) >= batch_size:
+            # Следующая пачка разбирается, пока БД загружает предыдущую (сессия занята только загрузкой)
+            if loading is not None:
+                published_categories |= await loading
+            loading, batch = asyncio.create_task(load_batch(session, batch, report)), []
+    if loading is not None:
+        published_categories |= await loading
+    if batch:
+        published_categories |= await load_batch(session, batch, report)
+    # Кэш сбрасывается один раз после всего импорта
+    if published_categories:
+        await invalidate_tags(POSTS_LIST, *[category_tag(category_id) for category_id in published_categories])
+    return report
+
+
+async def file_chunks(path: str, size: int = 1 << 16):
+    with open(path, "rb") as file:
+        while chunk := file.read(size):
+            yield chunk
+
+
+async def main(path: str, import_format: str, user_id: int, batch_size: int) -> dict:
+    """Импорт из файла вне приложения - с отдельным подключением без пула, кэш сбрасывается через Redis"""
+    redis = aioredis.from_url(f"redis://{REDIS_HOST}", encoding="utf8", decode_responses=True)
+    FastAPICache.init(TaggedRedisBackend(redis), prefix="fastapi-cache")
+    engine = create_async_engine(_URL_DATABASE, poolclass=NullPool)
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            rows = parse_rows(iter_lines(file_chunks(path)), import_format)
+            return await import_posts(session, rows, user_id, batch_size)
+    finally:
+        await engine.dispose()
+        await redis.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="файл NDJSON или CSV")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson", help="формат файла")
+    parser.add_argument("--user-id", type=int, required=True, help="автор записей без user_id")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="записей в одной транзакции COPY")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.path, args.format, args.user_id, args.batch_size)), indent=2))
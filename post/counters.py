@@ -0,0 +1,115 @@
+import asyncio
+import json
+from redis import asyncio as aioredis
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from api_databases.address_db import _URL_DATABASE
+from src.api_models import Post, PostCounter
+from src.cache_tags import INVALIDATION_CHANNEL, POSTS_LIST
+from src.settings_env import REDIS_HOST
+
+ALL_PUBLISHED = "published"  # Имя общего счётчика опубликованных записей
+
+
+def category_counter(category_id: int) -> str:
+    """Имя счётчика опубликованных записей категории"""
+    return f"category:{category_id}:published"
+
+
+async def get_published_count(session: AsyncSession, category_id: int = None) -> int:
+    """Количество опубликованных записей (общее или у категории) из таблицы счётчиков"""
+    name = ALL_PUBLISHED if category_id is None else category_counter(category_id)
+    value = await session.scalar(select(PostCounter.value).filter(PostCounter.name == name))
+    if value is not None:
+        return value
+    # Счётчика ещё нет (например, до первой сверки) - считаем напрямую
+    query = select(func.count(Post.id)).filter(Post.published)
+    if category_id is not None:
+        query = query.filter(Post.category_id == category_id)
+    return await session.scalar(query)
+
+
+async def change_published_count(session: AsyncSession, category_deltas: dict):
+    """
+    Изменяет счётчики в текущей транзакции: {category_id: delta}.
+    Фиксируется вместе с изменением записей, поэтому вызывается до session.commit()
+    """
+    category_deltas = {key: value for key, value in category_deltas.items() if value}
+    total = sum(category_deltas.values())
+    changes = [(ALL_PUBLISHED, total)] if total else []
+    # Один и тот же порядок блокировки строк во всех транзакциях - без взаимных блокировок
+    changes += [(category_counter(key), category_deltas[key]) for key in sorted(category_deltas)]
+    for name, delta in changes:
+        query = insert(PostCounter).values(name=name, value=delta).on_conflict_do_update(
+            index_elements=[PostCounter.name], set_={"value": PostCounter.value + delta}
+        )
+        await session.execute(query)
+
+
+async def drop_category_counter(session: AsyncSession, category_id: int):
+    """Вычитает опубликованные записи категории из общего счётчика и удаляет счётчик категории"""
+    count = await session.scalar(
+        select(func.count(Post.id)).filter(Post.category_id == category_id, Post.published)
+    )
+    await change_published_count(session, {category_id: -count})
+    await session.execute(delete(PostCounter).filter(PostCounter.name == category_counter(category_id)))
+
+
+async def drop_user_posts_counters(session: AsyncSession, user_id: int):
+    """
+    Вычитает из счётчиков опубликованные записи пользователя (удаляются каскадом вместе с ним),
+    возвращает id затронутых категорий
+    """
+    query = select(Post.category_id, func.count(Post.id)).filter(
+        Post.user_id == user_id, Post.published).group_by(Post.category_id)
+    result = await session.execute(query)
+    category_deltas = {category_id: -count for category_id, count in result.all()}
+    await change_published_count(session, category_deltas)
+    return list(category_deltas)
+
+
+async def reconcile_counters(session: AsyncSession) -> dict:
+    """Пересчитывает все счётчики по таблице post, возвращает исправленные расхождения"""
+    # Блокировка ждёт завершения транзакций, изменяющих счётчики, и не пускает новые до commit
+    await session.execute(text("LOCK TABLE post_counter IN EXCLUSIVE MODE"))
+    result = await session.execute(
+        select(Post.category_id, func.count(Post.id)).filter(Post.published).group_by(Post.category_id)
+    )
+    actual = {category_counter(category_id): count for category_id, count in result.all()}
+    actual[ALL_PUBLISHED] = sum(actual.values())
+    result = await session.execute(select(PostCounter.name, PostCounter.value))
+    stored = dict(result.all())
+    drift = {
+        name: {"stored": stored.get(name), "actual": actual.get(name, 0)}
+        for name in stored.keys() | actual.keys() if stored.get(name) != actual.get(name, 0)
+    }
+    await session.execute(delete(PostCounter))
+    await session.execute(insert(PostCounter).values([{"name": k, "value": v} for k, v in actual.items()]))
+    await session.commit()
+    return drift
+
+
+async def run_reconciliation() -> dict:
+    """Сверка счётчиков вне приложения (Celery, cron) - с отдельным подключением без пула"""
+    engine = create_async_engine(_URL_DATABASE, poolclass=NullPool)
+    try:
+        async with sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)() as session:
+            drift = await reconcile_counters(session)
+    finally:
+        await engine.dispose()
+    if drift:
+        # Процессы приложения сбрасывают данные, построенные по исправленным счётчикам
+        redis = aioredis.from_url(f"redis://{REDIS_HOST}", encoding="utf8", decode_responses=True)
+        try:
+            await redis.publish(INVALIDATION_CHANNEL, json.dumps([POSTS_LIST]))
+        finally:
+            await redis.close()
+    return drift
+
+
+if __name__ == "__main__":
+    # python -m post.counters
+    print(asyncio.run(run_reconciliation()))
@@ -0,0 +1,18 @@
+from sqlalchemy.orm import load_only, selectinload
+from src.api_models import Post
+
+EXCERPT_WORDS = 30  # Слов в начале текста, сохраняемом для списков записей
+EXCERPT_LENGTH = 300  # Наибольшая длина начала текста (длина колонки post.excerpt)
+# Колонки записи в списках (ResponsePostListScheme)
+LIST_COLUMNS = (Post.id, Post.title, Post.excerpt, Post.created, Post.published, Post.user_id, Post.category_id)
+
+
+def make_excerpt(content: str) -> str:
+    """Начало текста для списков: первые EXCERPT_WORDS слов (остальной текст не разбивается)"""
+    words = content.split(maxsplit=EXCERPT_WORDS)[:EXCERPT_WORDS]
+    return " ".join(words)[:EXCERPT_LENGTH]
+
+
+def list_options():
+    """Для списков загружаются только выводимые колонки (без content) и категория"""
+    return load_only(*LIST_COLUMNS), selectinload(Post.category)
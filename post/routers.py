@@ -1,14 +1,30 @@
-from fastapi import APIRouter, Depends, status, HTTPException
-from fastapi_cache.decorator import cache
+import base64
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, status, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from math import ceil
-from sqlalchemy.orm import joinedload, selectinload
-from src.api_models import Post
+from sqlalchemy.orm import joinedload
+from src.api_models import Post, User
 from sqlalchemy.ext.asyncio import AsyncSession
-from api_databases.connect_db import get_async_session, data_is_not_valid, PAGE, LIMIT
-from post.schemes import PostScheme, AdminPostScheme, SearchPostScheme
-from sqlalchemy import insert, select, update, and_, func
+from api_databases.connect_db import (
+    get_async_session, get_read_session, stick_to_primary, data_is_not_valid, PAGE, LIMIT
+)
+from post.schemes import (
+    PostScheme, AdminPostScheme, SearchPostScheme, ResponsePostListScheme, ResponseOnePostScheme,
+    ResponsePostsPageScheme, ResponseSearchPageScheme
+)
+from sqlalchemy import insert, select, update, and_
 from user.my_token import get_current_user
 from user.routers import field_validation
+from post.counters import get_published_count, change_published_count
+from post.search import search_posts
+from post.listing import make_excerpt, list_options
+from post.bulk_import import FORMATS, iter_lines, parse_rows, import_posts
+from post.bulk_export import MEDIA_TYPES, export_posts
+from src.cache_tags import POSTS_LIST, POSTS_DETAIL, cached, category_tag, post_tag, invalidate_tags
+from src.serialization import dump, dump_all, json_response
+from src.rate_limit import search_limit
 
 router = APIRouter(
     prefix="/post", tags=["Post"]
@@ -19,9 +35,8 @@ router = APIRouter(
 
 
 async def get_count_date_all(session: AsyncSession = Depends(get_async_session)):
-    """Получает общее количество опубликованных данных"""
-    query = select(func.count()).select_from(Post).filter(Post.published)
-    exists = await session.scalar(query)
+    """Получает общее количество опубликованных данных (из поддерживаемого счётчика)"""
+    exists = await get_published_count(session)
     return exists
 
 
@@ -37,7 +52,7 @@ async def pagination(
     all_posts = await session.execute(query)
     result = all_posts.scalars().all()
     response = {
-        "data": result,
+        "data": dump_all(ResponsePostListScheme, result),
         "total_pages": total_pages,
         "show_pagination": show_pagination
     }
@@ -51,6 +66,68 @@ async def my_range(page, limit):
     return start, end
 
 
+def encode_cursor(**fields):
+    """Кодирует позицию последней записи страницы в непрозрачный курсор"""
+    raw = json.dumps(fields, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(after: str, **expected):
+    """Декодирует курсор (пустая строка - первая страница), expected - поля, с которыми курсор должен совпадать"""
+    if not after:
+        return {}
+    try:
+        fields = json.loads(base64.urlsafe_b64decode(after + "=" * (-len(after) % 4)))
+    except (ValueError, TypeError):
+        raise data_is_not_valid
+    if not isinstance(fields, dict) or not isinstance(fields.get("id"), int):
+        raise data_is_not_valid
+    if any(fields.get(key) != value for key, value in expected.items()):
+        raise data_is_not_valid
+    return fields
+
+
+async def keyset_pagination(
+        query, limit, cursor: dict, count_data=None, session: AsyncSession = Depends(get_async_session),
+        **cursor_fields
+):
+    """Пагинация по курсору: вместо OFFSET выборка продолжается после id последней записи (id desc)"""
+    if cursor:
+        query = query.filter(Post.id < cursor["id"])
+    # Берём на одну запись больше, чтобы узнать, есть ли следующая страница, без COUNT(*)
+    all_posts = await session.execute(query.limit(limit + 1))
+    result = all_posts.scalars().all()
+    has_more = len(result) > limit
+    result = result[:limit]
+    response = {
+        "data": dump_all(ResponsePostListScheme, result),
+        "total_pages": ceil(count_data / limit) if count_data is not None else None,
+        "show_pagination": has_more or bool(cursor),
+        "next_cursor": encode_cursor(id=result[-1].id, **cursor_fields) if has_more else None,
+        "has_more": has_more
+    }
+    return response
+
+
+def published_posts_query():
+    """Опубликованные записи, новые первыми (индекс ix_post_published_id)"""
+    return select(Post).options(*list_options()).filter(Post.published).order_by(Post.id.desc())
+
+
+def category_posts_query(category_id: int):
+    """Опубликованные записи категории, новые первыми (индекс ix_post_published_category_id)"""
+    return select(Post).options(*list_options()).filter(
+        and_(Post.category_id == category_id, Post.published)).order_by(Post.id.desc())
+
+
+def one_post_query(post_id: int):
+    """Запись с категорией и автором"""
+    # У автора загружаются только выводимые поля (хэш пароля не попадает ни в ответ, ни в кэш)
+    return select(Post).options(
+        joinedload(Post.category), joinedload(Post.user).load_only(User.id, User.username)
+    ).filter(Post.id == post_id)
+
+
 async def content_error(row_dict: dict, key: str):
     """Получает данные если они были введены некорректно"""
     content_error_dict = {}
@@ -62,6 +139,7 @@ async def content_error(row_dict: dict, key: str):
 
 @router.post("/create_post")
 async def create_post(
+        request: Request,
         post: PostScheme = Depends(PostScheme.as_form),
         session: AsyncSession = Depends(get_async_session),
         current_user: dict = Depends(get_current_user)
@@ -80,11 +158,21 @@ async def create_post(
         }
         return response
     try:
-        query = insert(Post).values(**post.dict(), user_id=current_user["user_id"])
-        await session.execute(query)
+        query = insert(Post).values(
+            **post.dict(), excerpt=make_excerpt(post.content), user_id=current_user["user_id"]
+        ).returning(
+            Post.published, Post.category_id
+        )
+        new_post = (await session.execute(query)).one()
+        if new_post.published:
+            await change_published_count(session, {new_post.category_id: 1})
         await session.commit()
     except Exception:
         raise data_is_not_valid
+    stick_to_primary(request)
+    # Неопубликованная запись в списки не попадает
+    if new_post.published:
+        await invalidate_tags(POSTS_LIST, category_tag(new_post.category_id))
 
     response = {
         "status": status.HTTP_201_CREATED,
@@ -95,50 +183,59 @@ async def create_post(
 
 
 # @router.get("/all_posts", status_code=status.HTTP_200_OK)
-@cache(expire=600)
-async def get_all_posts(page: int = PAGE, limit: int = LIMIT,
-                        session: AsyncSession = Depends(get_async_session)):
-    """Получение всех опубликованных записей + кэширование записей"""
+@cached(POSTS_LIST)
+async def get_all_posts(page: int = PAGE, limit: int = LIMIT, after: str = None, with_total: bool = False,
+                        session: AsyncSession = Depends(get_read_session)):
+    """Получение всех опубликованных записей + кэширование записей (after - режим курсора)"""
     try:
+        qu = published_posts_query()
+        if after is not None:
+            cursor = decode_cursor(after)
+            count_date = await get_count_date_all(session) if with_total else None
+            return await keyset_pagination(
+                query=qu, limit=limit, cursor=cursor, count_data=count_date, session=session
+            )
         # Получаем общее количество данных
         count_date = await get_count_date_all(session)
         # Получение записей в диапазоне
         start, end = await my_range(page, limit)
-        qu = select(Post).options(selectinload(Post.category)).filter(
-            Post.published
-        ).order_by(Post.id.desc()).slice(start, end)
         # Пагинация
-        result = await pagination(query=qu, count_data=count_date, limit=limit, session=session)
+        result = await pagination(query=qu.slice(start, end), count_data=count_date, limit=limit, session=session)
         # print(result)
         return result
     except Exception:
         raise data_is_not_valid
 
 
-@router.get("/all_posts", status_code=status.HTTP_200_OK)
-async def get_all_posts_handler(posts=Depends(get_all_posts)):
+@router.get("/all_posts", status_code=status.HTTP_200_OK, response_model=ResponsePostsPageScheme)
+async def get_all_posts_handler(response: Response, posts=Depends(get_all_posts)):
     """Обработчик для получения всех опубликованных записей"""
-    return posts
+    return json_response(posts, response)
 
 
-@router.get("/one_post/{post_id}", status_code=status.HTTP_200_OK)
-async def get_one_post(post_id: int, session: AsyncSession = Depends(get_async_session)):
-    """Получение конкретной записи"""
-    query = select(Post).options(joinedload(Post.category), joinedload(Post.user)).filter(Post.id == post_id)
-    post = await session.execute(query)
+@cached(lambda post_id, **_: post_tag(post_id), POSTS_DETAIL)
+async def get_one_post(post_id: int, session: AsyncSession = Depends(get_read_session)):
+    """Получение конкретной записи + кэширование"""
+    post = await session.execute(one_post_query(post_id))
     result = post.scalar()
     if result is not None:
-        return result
+        return dump(ResponseOnePostScheme, result)
     raise data_is_not_valid
 
 
+@router.get("/one_post/{post_id}", status_code=status.HTTP_200_OK, response_model=ResponseOnePostScheme)
+async def get_one_post_handler(response: Response, post=Depends(get_one_post)):
+    """Обработчик для получения конкретной записи"""
+    return json_response(post, response)
+
+
 @router.put("/update_post/{post_id}", status_code=status.HTTP_202_ACCEPTED)
-async def update_post(post_id: int, post: PostScheme = Depends(PostScheme.as_form),
+async def update_post(post_id: int, request: Request, post: PostScheme = Depends(PostScheme.as_form),
                       current_user: dict = Depends(get_current_user),
                       session: AsyncSession = Depends(get_async_session)
                       ):
     """Обновление конкретной записи"""
-    query = select(Post).filter(Post.id == post_id)
+    query = select(Post).filter(Post.id == post_id).with_for_update()
     exists = await session.execute(query)
     result = exists.scalar()
     if result is None:
@@ -154,9 +251,15 @@ async def update_post(post_id: int, post: PostScheme = Depends(PostScheme.as_for
         }
         return response
     if current_user["group"] == "ADMIN" or result.user_id == current_user["user_id"]:
+        # До UPDATE: ORM-запрос UPDATE (synchronize_session) перезаписывает поля загруженного result
+        old_category_id, was_published = result.category_id, result.published
         try:
-            post_update = update(Post).values(**post.dict()).filter(Post.id == post_id)
+            post_update = update(Post).values(**post.dict(), excerpt=make_excerpt(post.content)).filter(
+                Post.id == post_id)
             await session.execute(post_update)
+            # Опубликованная запись перенесена в другую категорию
+            if was_published and old_category_id != post.category_id:
+                await change_published_count(session, {old_category_id: -1, post.category_id: 1})
             await session.commit()
         except Exception:
             raise data_is_not_valid
@@ -164,90 +267,187 @@ async def update_post(post_id: int, post: PostScheme = Depends(PostScheme.as_for
         msg = {"errors": "You are not the author of this post"}
         errors_list.append(msg)
         return errors_list
+    stick_to_primary(request)
+    if was_published:
+        await invalidate_tags(post_tag(post_id), POSTS_LIST, category_tag(old_category_id),
+                              category_tag(post.category_id))
+    else:
+        await invalidate_tags(post_tag(post_id))
     return {**post.dict()}
 
 
 @router.patch("/update_post_published/{post_id}", status_code=status.HTTP_202_ACCEPTED)
-async def update_post_published(post_id: int, post: AdminPostScheme, current_user: dict = Depends(get_current_user),
+async def update_post_published(post_id: int, post: AdminPostScheme, request: Request,
+                                current_user: dict = Depends(get_current_user),
                                 session: AsyncSession = Depends(get_async_session)
                                 ):
     """Опубликовывает запись (published ставить в True)"""
     if current_user["group"] == "ADMIN":
         try:
             update_published = post.dict(exclude_unset=True)
+            current = await session.execute(
+                select(Post.published, Post.category_id).filter(Post.id == post_id).with_for_update()
+            )
+            old_post = current.one()
             query = update(Post).values(**update_published).filter(Post.id == post_id)
-            print(query)
             await session.execute(query)
+            if "published" in update_published:
+                delta = int(bool(update_published["published"])) - int(bool(old_post.published))
+                await change_published_count(session, {old_post.category_id: delta})
             await session.commit()
-            return {"messages": f"Post ID: {post_id} published"}
         except Exception:
             raise data_is_not_valid
+        stick_to_primary(request)
+        await invalidate_tags(post_tag(post_id), POSTS_LIST, category_tag(old_post.category_id))
+        return {"messages": f"Post ID: {post_id} published"}
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Only an Administrator can change the status of a post"
     )
 
 
-@router.get("/category_post_all/{category_id}", status_code=status.HTTP_200_OK)
-async def category_post_all(category_id: int, page: int = PAGE, limit: int = LIMIT,
-                            session: AsyncSession = Depends(get_async_session)):
-    """Получение всех записей у конкретной категории"""
+@cached(lambda category_id, **_: category_tag(category_id))
+async def category_post_all(category_id: int, page: int = PAGE, limit: int = LIMIT, after: str = None,
+                            with_total: bool = False, session: AsyncSession = Depends(get_read_session)):
+    """Получение всех записей у конкретной категории + кэширование (after - режим курсора)"""
     try:
+        posts_for_category = category_posts_query(category_id)
+        if after is not None:
+            cursor = decode_cursor(after, category=category_id)
+            exists = await get_published_count(session, category_id) if with_total else None
+            return await keyset_pagination(
+                query=posts_for_category, limit=limit, cursor=cursor, count_data=exists, session=session,
+                category=category_id
+            )
         # Получение количества записей у категории
-        post_count = select(func.count(Post.id)).select_from(Post).filter(
-            and_(Post.category_id == category_id, Post.published))
-        exists = await session.scalar(post_count)
+        exists = await get_published_count(session, category_id)
         # Получение записей в диапазоне
         start, end = await my_range(page, limit)
-        posts_for_category = select(Post).options(selectinload(Post.category)).filter(
-            and_(Post.category_id == category_id, Post.published)).order_by(Post.id.desc()).slice(start, end)
         # Пагинация
-        result = await pagination(query=posts_for_category, count_data=exists, limit=limit, session=session)
+        result = await pagination(
+            query=posts_for_category.slice(start, end), count_data=exists, limit=limit, session=session
+        )
         return result
     except Exception:
         raise data_is_not_valid
 
 
+@router.get("/category_post_all/{category_id}", status_code=status.HTTP_200_OK, response_model=ResponsePostsPageScheme)
+async def category_post_all_handler(response: Response, posts=Depends(category_post_all)):
+    """Обработчик для получения записей категории"""
+    return json_response(posts, response)
+
+
 @router.delete("/delete_post/{post_id}")
-async def delete_post(post_id: int, session: AsyncSession = Depends(get_async_session),
+async def delete_post(post_id: int, request: Request, session: AsyncSession = Depends(get_async_session),
                       current_user: dict = Depends(get_current_user)
                       ):
     """Удаление записи"""
-    query = select(Post).filter(Post.id == post_id)
+    query = select(Post).filter(Post.id == post_id).with_for_update()
     post = await session.execute(query)
     post_delete = post.scalar()
     if not current_user:
         return {"messages": "No authorization"}
-    if not post:
+    if not post_delete:
         return {"messages": f"Post ID: {post_id} not found"}
     if current_user["group"] != "ADMIN" and post_delete.user_id != current_user["user_id"]:
         return {"messages": "You are not the post author or administrator"}
+    if post_delete.published:
+        await change_published_count(session, {post_delete.category_id: -1})
     await session.delete(post_delete)
     await session.commit()
+    stick_to_primary(request)
+    if post_delete.published:
+        await invalidate_tags(post_tag(post_id), POSTS_LIST, category_tag(post_delete.category_id))
+    else:
+        await invalidate_tags(post_tag(post_id))
     return {"messages": f"Post ID: {post_id} Delete"}
 
 
-@router.post("/search/")
 async def search_post(
         post_title: SearchPostScheme = Depends(SearchPostScheme.as_form),
         session: AsyncSession = Depends(get_async_session),
-        page: int = PAGE, limit: int = LIMIT
+        page: int = PAGE, limit: int = LIMIT, after: str = None
 ):
-    """Поиск"""
-    post_search = post_title.search.lower()
-    post_count = select(func.count(Post.id)).select_from(Post).filter(
-        and_(func.lower(Post.title).like(f"%{post_search}%"), Post.published))
-    exists = await session.scalar(post_count)
-    if exists == 0:
+    """Полнотекстовый поиск по заголовку и содержимому, по релевантности (after - режим курсора)"""
+    cursor = decode_cursor(after) if after is not None else None
+    if cursor and not isinstance(cursor.get("rank"), (int, float)):
+        raise data_is_not_valid
+    if cursor is not None:
+        # На одну запись больше, чтобы узнать, есть ли следующая страница
+        rows = await search_posts(session, post_title.search, limit + 1, cursor=cursor)
+    else:
+        # Получение записей в диапазоне
+        start, end = await my_range(page, limit)
+        rows = await search_posts(session, post_title.search, limit, offset=start)
+    if not rows and not cursor:
         response = {
             "not_found": f"Post {post_title.search} not found"
         }
         return response
-    # Получение записей в диапазоне
-    start, end = await my_range(page, limit)
-    post_search = select(Post).options(selectinload(Post.category)).filter(
-        and_(Post.published, func.lower(Post.title).like(f"%{post_search}%"))).order_by(Post.id.desc()).slice(start,
-                                                                                                              end)
-    # Пагинация
-    result = await pagination(query=post_search, count_data=exists, limit=limit, session=session)
-    return result
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    # Общее количество совпадений приходит вместе со страницей
+    total_pages = ceil(rows[0].total / limit) if rows else None
+    response = {
+        "data": dump_all(ResponsePostListScheme, [row.Post for row in rows]),
+        "total_pages": total_pages,
+        "show_pagination": (has_more or bool(cursor)) if cursor is not None else total_pages > 1,
+        "highlights": {row.Post.id: row.headline for row in rows}
+    }
+    if cursor is not None:
+        response["next_cursor"] = encode_cursor(id=rows[-1].Post.id, rank=rows[-1].rank) if has_more else None
+        response["has_more"] = has_more
+    return response
+
+
+@router.post("/search/", response_model=ResponseSearchPageScheme, dependencies=[Depends(search_limit)])
+async def search_post_handler(posts=Depends(search_post)):
+    """Обработчик полнотекстового поиска"""
+    return json_response(posts)
+
+
+@router.post("/import_posts")
+async def import_posts_handler(request: Request, import_format: str = "ndjson",
+                               session: AsyncSession = Depends(get_async_session),
+                               current_user: dict = Depends(get_current_user)
+                               ):
+    """
+    Массовый импорт записей: тело запроса - NDJSON или CSV с заголовком (import_format),
+    читается потоком и загружается пачками через COPY. Возвращает отчёт по строкам и пачкам
+    """
+    if not current_user or current_user["group"] != "ADMIN":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Only an Administrator can import posts"
+        )
+    if import_format not in FORMATS:
+        raise data_is_not_valid
+    rows = parse_rows(iter_lines(request.stream()), import_format)
+    report = await import_posts(session, rows, current_user["user_id"])
+    stick_to_primary(request)
+    return report
+
+
+@router.get("/export_posts")
+async def export_posts_handler(export_format: str = "ndjson", category_id: int = None, published: bool = None,
+                               created_from: datetime = None, created_to: datetime = None,
+                               session: AsyncSession = Depends(get_read_session),
+                               current_user: dict = Depends(get_current_user)
+                               ):
+    """
+    Выгрузка записей в NDJSON или CSV (export_format) с фильтрами по категории, публикации
+    и дате создания [created_from, created_to). Ответ отдаётся потоком из серверного курсора
+    """
+    if not current_user or current_user["group"] != "ADMIN":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Only an Administrator can export posts"
+        )
+    if export_format not in MEDIA_TYPES:
+        raise data_is_not_valid
+    content = export_posts(session, export_format, category_id=category_id, published=published,
+                           created_from=created_from, created_to=created_to)
+    return StreamingResponse(content, media_type=MEDIA_TYPES[export_format], headers={
+        "Content-Disposition": f'attachment; filename="posts.{export_format}"'
+    })
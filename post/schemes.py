@@ -1,6 +1,8 @@
+from datetime import datetime
 from pydantic import BaseModel, validator
-from typing import Text
+from typing import Text, List, Dict, Optional
 from fastapi import Form
+from category.schemes import ResponseCategoryScheme
 
 
 class PostScheme(BaseModel):
@@ -43,6 +45,13 @@ class PostScheme(BaseModel):
         orm_mode = True
 
 
+class ImportPostScheme(PostScheme):
+    """Строка массового импорта: правила PostScheme + необязательные поля переносимой записи"""
+    published: bool = False
+    created: Optional[datetime]
+    user_id: Optional[int]
+
+
 class AdminPostScheme(BaseModel):
     published: bool = True
 
@@ -54,3 +63,67 @@ class SearchPostScheme(BaseModel):
     @classmethod
     def as_form(cls, search: str = Form(...)):
         return cls(search=search)
+
+
+class ResponseAuthorScheme(BaseModel):
+    """Автор записи (только выводимые поля)"""
+    id: int
+    username: str
+
+    class Config:
+        orm_mode = True
+
+
+class ResponsePostScheme(BaseModel):
+    """Запись в ответе API"""
+    id: int
+    title: str
+    content: str
+    created: Optional[datetime]
+    published: Optional[bool]
+    user_id: int
+    category_id: int
+    category: Optional[ResponseCategoryScheme]
+
+    class Config:
+        orm_mode = True
+
+
+class ResponseOnePostScheme(ResponsePostScheme):
+    """Запись с автором"""
+    user: Optional[ResponseAuthorScheme]
+
+
+class ResponsePostListScheme(BaseModel):
+    """Запись в списке: вместо содержимого - его начало (excerpt)"""
+    id: int
+    title: str
+    excerpt: str
+    created: Optional[datetime]
+    published: Optional[bool]
+    user_id: int
+    category_id: int
+    category: Optional[ResponseCategoryScheme]
+
+    class Config:
+        orm_mode = True
+
+
+class ResponsePostsPageScheme(BaseModel):
+    """Страница записей (next_cursor и has_more - только в режиме курсора)"""
+    data: List[ResponsePostListScheme]
+    total_pages: Optional[int]
+    show_pagination: bool
+    next_cursor: Optional[str]
+    has_more: Optional[bool]
+
+
+class ResponseSearchPageScheme(BaseModel):
+    """Страница результатов поиска или not_found"""
+    not_found: Optional[str]
+    data: List[ResponsePostListScheme] = []
+    total_pages: Optional[int]
+    show_pagination: bool = False
+    highlights: Dict[int, str] = {}
+    next_cursor: Optional[str]
+    has_more: Optional[bool]
@@ -0,0 +1,39 @@
+from sqlalchemy import select, func, tuple_, cast
+from sqlalchemy.dialects.postgresql import REAL
+from sqlalchemy.ext.asyncio import AsyncSession
+from post.listing import list_options
+from src.api_models import Post
+
+SEARCH_CONFIG = "simple"  # Конфигурация текстового поиска (та же, что в Post.search_vector)
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=25, MinWords=10, MaxFragments=2"
+
+
+def search_query(term: str, limit: int, offset: int = 0, cursor: dict = None):
+    """
+    Полнотекстовый поиск опубликованных записей по индексу ix_post_search_vector.
+    Строки (Post, rank, total, headline): total - количество всех совпадений,
+    headline - фрагмент содержимого с подсвеченными словами. cursor - {"rank", "id"} последней записи
+    """
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, term)
+    ranked = select(
+        Post.id.label("id"),
+        func.ts_rank_cd(Post.search_vector, ts_query).label("rank"),
+        func.count().over().label("total")
+    ).filter(Post.published, Post.search_vector.bool_op("@@")(ts_query)).subquery("ranked")
+    page = select(ranked).order_by(ranked.c.rank.desc(), ranked.c.id.desc()).limit(limit)
+    if cursor:
+        page = page.filter(tuple_(ranked.c.rank, ranked.c.id) < tuple_(cast(cursor["rank"], REAL), cursor["id"]))
+    else:
+        page = page.offset(offset)
+    page = page.subquery("page")
+    # Фрагменты строятся только для записей текущей страницы
+    headline = func.ts_headline(SEARCH_CONFIG, Post.content, ts_query, HEADLINE_OPTIONS)
+    query = select(Post, page.c.rank, page.c.total, headline.label("headline")).join(
+        page, Post.id == page.c.id).options(*list_options()).order_by(page.c.rank.desc(), Post.id.desc())
+    return query
+
+
+async def search_posts(session: AsyncSession, term: str, limit: int, offset: int = 0, cursor: dict = None):
+    """Выполняет поиск одним запросом (см. search_query)"""
+    result = await session.execute(search_query(term, limit, offset, cursor))
+    return result.all()
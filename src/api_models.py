@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, TIMESTAMP, Computed, Index
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy_utils.types import ChoiceType
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.orm import declarative_base, relationship, deferred
 from datetime import datetime
 
 Base = declarative_base()
@@ -29,13 +30,28 @@ class Post(Base):
     id = Column(Integer, primary_key=True)
     title = Column(String(250), nullable=False)
     content = Column(Text, nullable=False)
+    # Начало текста для списков записей (post.listing.make_excerpt), чтобы не читать content целиком
+    excerpt = Column(String(300), nullable=False)
     created = Column(TIMESTAMP, default=datetime.utcnow)
     published = Column(Boolean, default=False)
-    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
-    category_id = Column(Integer, ForeignKey("category.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False, index=True)
+    category_id = Column(Integer, ForeignKey("category.id"), nullable=False, index=True)
+    # Поисковый вектор поддерживается самой БД: заголовок весомее содержимого
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(content, '')), 'B')",
+        persisted=True
+    )))
     user = relationship("User", back_populates="posts")
     category = relationship("Category", back_populates="posts")
 
+    __table_args__ = (
+        Index("ix_post_search_vector", "search_vector", postgresql_using="gin"),
+        # Списки опубликованных записей: общий и по категории (новые первыми, OFFSET и курсор)
+        Index("ix_post_published_id", id.desc(), postgresql_where=published),
+        Index("ix_post_published_category_id", category_id, id.desc(), postgresql_where=published),
+    )
+
 
 class Category(Base):
     """Модель категории для записи"""
@@ -43,3 +59,20 @@ class Category(Base):
     id = Column(Integer, primary_key=True)
     title = Column(String(40), nullable=False, unique=True, index=True)
     posts = relationship("Post", back_populates="category", cascade="all, delete")
+
+
+class PostCounter(Base):
+    """Модель счётчиков опубликованных записей (общий и по категориям)"""
+    __tablename__ = "post_counter"
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+class Outbox(Base):
+    """Модель задач Celery, записанных в одной транзакции с изменением данных (отправляет tasks.outbox)"""
+    __tablename__ = "outbox"
+    id = Column(Integer, primary_key=True)
+    task = Column(String(150), nullable=False)
+    args = Column(JSONB, nullable=False, default=list)
+    created = Column(TIMESTAMP, default=datetime.utcnow)
+    attempts = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,422 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.decorator import cache
+from sqlalchemy.ext.asyncio import AsyncSession
+from monitoring.metrics import CACHE_REQUESTS
+from monitoring.profiler import profiled
+from src.local_cache import LocalCache
+from src.settings_env import CACHE_STALE_TTL, CACHE_TTL_JITTER, CACHE_LOCK_TIMEOUT, CACHE_LOCK_WAIT
+
+logger = logging.getLogger(__name__)
+
+CACHE_EXPIRE = 60 * 60  # Длинный TTL: свежесть данных обеспечивает инвалидация по тегам
+CACHE_VERSION = 2  # Увеличивается при изменении формата кэшируемых данных (старые ключи не читаются)
+
+POSTS_LIST = "posts:list"  # Страницы общего списка записей
+POSTS_DETAIL = "posts:detail"  # Все страницы отдельных записей (переименование категории, удаление автора)
+# Только для обработчиков on_invalidate: сбросить всё, что процесс хранит в памяти (уведомления могли потеряться)
+ALL_TAGS = "*"
+
+INVALIDATION_CHANNEL = "fastapi-cache:invalidate"  # Канал Redis, по которому процессы узнают о сброшенных тегах
+# Время жизни счётчика версии тега после последнего сброса (должно быть много больше длительности пересчёта)
+TAG_VERSION_TTL = 24 * 60 * 60
+
+
+def category_tag(category_id: int) -> str:
+    """Тег страниц записей категории"""
+    return f"category:{category_id}"
+
+
+def post_tag(post_id: int) -> str:
+    """Тег страницы конкретной записи"""
+    return f"post:{post_id}"
+
+
+def user_tag(user_id: int) -> str:
+    """Тег пользователя в кэшах процессов (изменение группы, данных, удаление, выход)"""
+    return f"user:{user_id}"
+
+
+def tag_key(tag: str) -> str:
+    """Ключ множества Redis с ключами кэша, помеченными тегом"""
+    return f"{FastAPICache.get_prefix()}:tag:{tag}"
+
+
+def tag_version_key(tag: str) -> str:
+    """Ключ счётчика версии тега: увеличивается при каждом сбросе тега"""
+    return f"{FastAPICache.get_prefix()}:tagver:{tag}"
+
+
+def lock_key(key: str) -> str:
+    """Ключ блокировки пересчёта значения"""
+    return f"{key}:lock"
+
+
+# Теги и параметры ключей, построенных в текущем запросе: backend.set() регистрирует ключ только при записи в кэш
+_key_options: ContextVar[dict] = ContextVar("cache_key_options", default={})
+# Блокировки пересчёта, взятые в текущем запросе: key -> token (снимаются в backend.set())
+_held_locks: ContextVar[dict] = ContextVar("cache_held_locks", default={})
+# Версии тегов, прочитанные вместе с ключом в текущем запросе: key -> [версия тега, ...] (проверяются в backend.set())
+_seen_versions: ContextVar[dict] = ContextVar("cache_seen_versions", default={})
+
+# Снимает блокировку, только если она ещё наша (могла истечь и достаться другому)
+_UNLOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Добавляет ключ в множество тега. TTL множества только растёт (не меньше TTL любого его ключа,
+# иначе множество истечёт раньше ключей и их нельзя будет сбросить); ключ без срока (expire = 0) - множество без срока
+_TAG_ADD = """
+local function tag_add(tag, key, expire)
+    local existed = redis.call('EXISTS', tag)
+    redis.call('SADD', tag, key)
+    if expire == 0 then
+        return redis.call('PERSIST', tag)
+    end
+    local ttl = redis.call('TTL', tag)
+    if existed == 0 or (ttl >= 0 and ttl < expire) then
+        return redis.call('EXPIRE', tag, expire)
+    end
+    return 0
+end
+"""
+
+_TAG_ADD_LUA = _TAG_ADD + "return tag_add(KEYS[1], ARGV[1], tonumber(ARGV[2]))"
+
+# Записывает значение, только если версии тегов не изменились с чтения перед пересчётом (иначе сброс,
+# прошедший во время пересчёта, был бы перезаписан старыми данными), и снимает блокировку пересчёта.
+# KEYS: ключ, блокировка, множества тегов (ARGV[4] штук), счётчики их версий (если проверяются);
+# ARGV: значение, expire (0 - без срока), токен блокировки ('' - нет), количество тегов, прочитанные версии
+_SET_LUA = _TAG_ADD + """
+local tags = tonumber(ARGV[4])
+local versions = #KEYS - 2 - tags
+local written = 1
+for n = 1, versions do
+    if (redis.call('GET', KEYS[2 + tags + n]) or '0') ~= ARGV[4 + n] then
+        written = 0
+        break
+    end
+end
+if written == 1 then
+    local expire = tonumber(ARGV[2])
+    if expire > 0 then
+        redis.call('SET', KEYS[1], ARGV[1], 'EX', expire)
+    else
+        redis.call('SET', KEYS[1], ARGV[1])
+    end
+    for n = 1, tags do
+        tag_add(KEYS[2 + n], KEYS[1], expire)
+    end
+end
+if ARGV[3] ~= '' and redis.call('GET', KEYS[2]) == ARGV[3] then
+    redis.call('DEL', KEYS[2])
+end
+return written
+"""
+
+# Удаляет ключи всех переданных тегов и сами множества одним обращением к Redis и увеличивает версии тегов.
+# KEYS: множества тегов, затем счётчики их версий в том же порядке; ARGV[1] - время жизни счётчика
+_INVALIDATE_LUA = """
+local unpack = unpack or table.unpack
+local count = #KEYS / 2
+local removed = 0
+for n = 1, count do
+    local keys = redis.call('SMEMBERS', KEYS[n])
+    for i = 1, #keys, 500 do
+        removed = removed + redis.call('DEL', unpack(keys, i, math.min(i + 499, #keys)))
+    end
+    redis.call('DEL', KEYS[n])
+    redis.call('INCR', KEYS[count + n])
+    redis.call('EXPIRE', KEYS[count + n], ARGV[1])
+end
+return removed
+"""
+
+
+def tagged_key_builder(*tags, stale: int = CACHE_STALE_TTL, jitter: float = CACHE_TTL_JITTER,
+                       single_flight: bool = True):
+    """
+    key_builder для @cache: tags - строки или функции от аргументов обработчика, возвращающие тег.
+    Сессия БД не участвует в ключе (её repr разный в каждом запросе).
+    stale - сколько секунд после истечения отдавать старое значение, пока его пересчитывает один запрос;
+    jitter - expire уменьшается на случайную долю до jitter, чтобы ключи, записанные вместе, не истекали вместе;
+    single_flight - отсутствующее значение пересчитывает один запрос (под блокировкой в Redis), остальные ждут
+    """
+    options = {"stale": stale, "jitter": jitter, "single_flight": single_flight}
+
+    def key_builder(func, namespace: str = "", request=None, response=None, args=None, kwargs=None):
+        kwargs = {key: value for key, value in (kwargs or {}).items() if not isinstance(value, AsyncSession)}
+        prefix = f"{FastAPICache.get_prefix()}:{namespace}:"
+        cache_key = prefix + hashlib.md5(f"{func.__module__}:{func.__name__}:{CACHE_VERSION}:{args}:{kwargs}".encode()).hexdigest()
+        names = [tag(**kwargs) if callable(tag) else tag for tag in tags]
+        _key_options.set({**_key_options.get(), cache_key: {**options, "tags": names}})
+        return cache_key
+
+    return key_builder
+
+
+def cached(*tags, expire: int = CACHE_EXPIRE, **options):
+    """
+    @cache с тегами и защитой от одновременного пересчёта: options - stale, jitter, single_flight
+    (см. tagged_key_builder). Если пересчёт упал, блокировка снимается сразу, а не по истечении.
+    Для запросов не GET (функция - зависимость формы) кэш не используется
+    """
+
+    def decorator(func):
+        # Параметры до того, как cache добавит к сигнатуре request и response
+        parameters = inspect.signature(func).parameters
+        cached_func = cache(expire=expire, key_builder=tagged_key_builder(*tags, **options))(func)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            request = kwargs.get("request")
+            if request is not None and request.method != "GET":
+                # fastapi-cache 0.2.1 здесь передаёт request позиционно (TypeError) и успевает взять блокировку
+                return await func(*args, **{key: value for key, value in kwargs.items() if key in parameters})
+            try:
+                return await cached_func(*args, **kwargs)
+            except Exception:
+                backend = FastAPICache.get_backend()
+                if isinstance(backend, TaggedRedisBackend):
+                    await backend.release_locks()
+                raise
+
+        return wrapper
+
+    return decorator
+
+
+class TaggedRedisBackend(RedisBackend):
+    """
+    RedisBackend, который вместе со значением добавляет ключ в множества его тегов.
+    Для ключей tagged_key_builder защищает БД от одновременного пересчёта одного значения (см. его параметры)
+    """
+
+    @staticmethod
+    def key_tags(key: str, tags=None):
+        """tags - теги ключа; если не переданы, берутся построенные key_builder в этом запросе"""
+        return _key_options.get().get(key, {}).get("tags", ()) if tags is None else tags
+
+    @profiled("cache")
+    async def get_with_ttl(self, key: str, tags=None):
+        """
+        (оставшееся время свежести, значение). Значение в периоде stale отдаётся с TTL 0;
+        запрос, получивший вместо него None, пересчитывает значение под блокировкой
+        """
+        options = _key_options.get().get(key, {})
+        ttl, value, versions = await self.read(key, self.key_tags(key, tags))
+        # Если значение будет пересчитано, set() запишет его, только пока версии тегов те же
+        _seen_versions.set({**_seen_versions.get(), key: versions})
+        stale = options.get("stale", 0)
+        if value is not None and stale and 0 <= ttl <= stale:
+            if await self.acquire_lock(key):
+                value = None
+                CACHE_REQUESTS.labels("stale_refresh").inc()
+            else:
+                CACHE_REQUESTS.labels("stale").inc()
+            return 0, value
+        if value is None and options.get("single_flight") and not await self.acquire_lock(key):
+            ttl, value = await self.wait_for_value(key)
+        CACHE_REQUESTS.labels("miss" if value is None else "hit").inc()
+        return max(ttl - stale, 0) if ttl > 0 else ttl, value
+
+    async def read(self, key: str, tags):
+        """(TTL, значение, версии тегов) одним обращением к Redis"""
+        async with self.redis.pipeline(transaction=not self.is_cluster) as pipe:
+            pipe.ttl(key).get(key)
+            for tag in tags:
+                pipe.get(tag_version_key(tag))
+            ttl, value, *versions = await pipe.execute()
+        return ttl, value, [version or "0" for version in versions]
+
+    async def acquire_lock(self, key: str) -> bool:
+        """Берёт блокировку пересчёта ключа на CACHE_LOCK_TIMEOUT (если пересчёт упадёт, она истечёт сама)"""
+        token = f"{random.getrandbits(64):x}"
+        if await self.redis.set(lock_key(key), token, nx=True, px=int(CACHE_LOCK_TIMEOUT * 1000)):
+            _held_locks.set({**_held_locks.get(), key: token})
+            return True
+        return False
+
+    async def wait_for_value(self, key: str):
+        """Ждёт значение, которое пересчитывает другой запрос; не дождавшись - промах (пересчёт сам)"""
+        deadline = time.monotonic() + CACHE_LOCK_WAIT
+        delay = 0.01
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.2)
+            ttl, value = await super().get_with_ttl(key)
+            if value is not None:
+                return ttl, value
+            # Блокировку сняли без значения - пересчёт не удался
+            if not await self.redis.exists(lock_key(key)):
+                break
+        return 0, None
+
+    async def release_locks(self):
+        """Снимает блокировки пересчёта, взятые в текущем запросе"""
+        locks = _held_locks.get()
+        _held_locks.set({})
+        for key, token in locks.items():
+            await self.redis.eval(_UNLOCK_LUA, 1, lock_key(key), token)
+
+    @profiled("cache")
+    async def set(self, key: str, value: str, expire: int = None, tags=None) -> bool:
+        """
+        Записывает значение, если его теги не сбрасывали после get_with_ttl в этом запросе
+        (без предшествующего чтения - без проверки); возвращает, записано ли оно
+        """
+        options = _key_options.get().get(key, {})
+        tags = list(self.key_tags(key, tags))
+        if expire:
+            # Ключ хранится на stale секунд дольше: в это время его отдают, пока один запрос пересчитывает
+            expire = int(expire * (1 - random.uniform(0, options.get("jitter", 0)))) + options.get("stale", 0)
+        token = _held_locks.get().get(key)
+        seen = _seen_versions.get()
+        versions = seen.get(key) if len(seen.get(key) or ()) == len(tags) else None
+        _seen_versions.set({name: item for name, item in seen.items() if name != key})
+        if self.is_cluster:
+            written = await self.set_cluster(key, value, expire, tags, token, versions)
+        else:
+            keys = [key, lock_key(key), *[tag_key(tag) for tag in tags]]
+            if versions is not None:
+                keys += [tag_version_key(tag) for tag in tags]
+            written = await self.redis.eval(_SET_LUA, len(keys), *keys, value, expire or 0, token or "", len(tags),
+                                            *(versions or ()))
+        if token is not None:
+            _held_locks.set({name: value for name, value in _held_locks.get().items() if name != key})
+        if not written:
+            CACHE_REQUESTS.labels("stale_write_skipped").inc()
+        return bool(written)
+
+    async def set_cluster(self, key: str, value: str, expire, tags, token, versions) -> bool:
+        """set() для Redis Cluster: ключи в разных слотах, поэтому проверка версий и запись не атомарны"""
+        if versions is not None:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for tag in tags:
+                    pipe.get(tag_version_key(tag))
+                current = [version or "0" for version in await pipe.execute()]
+        written = versions is None or current == versions
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if written:
+                pipe.set(key, value, ex=expire)
+                for tag in tags:
+                    pipe.eval(_TAG_ADD_LUA, 1, tag_key(tag), key, expire or 0)
+            if token is not None:
+                pipe.eval(_UNLOCK_LUA, 1, lock_key(key), token)
+            await pipe.execute()
+        return written
+
+    async def invalidate(self, *tags) -> int:
+        """Удаляет все ключи кэша, помеченные тегами, и увеличивает версии тегов (незавершённые пересчёты не запишутся)"""
+        keys = [tag_key(tag) for tag in tags] + [tag_version_key(tag) for tag in tags]
+        return await self.redis.eval(_INVALIDATE_LUA, len(keys), *keys, TAG_VERSION_TTL)
+
+
+class TwoTierBackend(TaggedRedisBackend):
+    """
+    TaggedRedisBackend с кэшем в памяти процесса перед Redis: попадание не обращается к Redis.
+    Локально хранятся только ключи с известными тегами; они сбрасываются вместе с Redis через on_invalidate
+    (в других процессах - по каналу INVALIDATION_CHANNEL). Без уведомления запись живёт не дольше local.ttl
+    """
+
+    def __init__(self, redis, local: LocalCache):
+        super().__init__(redis)
+        self.local = local
+        on_invalidate(self.drop_local)
+
+    def drop_local(self, tags):
+        if ALL_TAGS in tags:
+            self.local.clear()
+        else:
+            self.local.drop_tags(tags)
+
+    @profiled("cache")
+    async def get_with_ttl(self, key: str, tags=None):
+        cached = self.local.get(key)
+        if cached is not None:
+            CACHE_REQUESTS.labels("local_hit").inc()
+            return cached
+        tags = self.key_tags(key, tags)
+        generation = self.local.generation
+        ttl, value = await super().get_with_ttl(key, tags)
+        # Пока шёл запрос к Redis, теги могли сбросить - такое значение в память не попадает.
+        # Устаревшее значение (TTL 0) тоже: его вот-вот заменит пересчитанное
+        if value is not None and ttl and tags and generation == self.local.generation:
+            self.local.set(key, value, tags, ttl)
+        return ttl, value
+
+    @profiled("cache")
+    async def set(self, key: str, value: str, expire: int = None, tags=None) -> bool:
+        tags = self.key_tags(key, tags)
+        generation = self.local.generation
+        written = await super().set(key, value, expire=expire, tags=tags)
+        if written and tags and generation == self.local.generation:
+            self.local.set(key, value, tags, expire)
+        return written
+
+
+# Обработчики сброса тегов для данных, хранящихся в памяти процесса: callback(tags)
+_listeners = []
+
+
+def on_invalidate(callback):
+    """
+    Регистрирует обработчик сброса тегов (вызывается и для своих, и для чужих сбросов).
+    Теги могут содержать ALL_TAGS - тогда обработчик сбрасывает всё, что хранит
+    """
+    _listeners.append(callback)
+    return callback
+
+
+def _notify(tags):
+    for callback in _listeners:
+        callback(tags)
+
+
+@profiled("cache")
+async def invalidate_tags(*tags):
+    """Сбрасывает кэш по тегам после commit; ошибка кэша не должна ломать уже выполненную запись"""
+    tags = sorted({tag for tag in tags if tag})
+    if not tags:
+        return 0
+    _notify(tags)
+    try:
+        backend = FastAPICache.get_backend()
+        if not isinstance(backend, TaggedRedisBackend):
+            return 0
+        removed = await backend.invalidate(*tags)
+        await backend.redis.publish(INVALIDATION_CHANNEL, json.dumps(tags))
+        return removed
+    except Exception:
+        logger.warning(f"Error invalidating cache tags {tags}:", exc_info=True)
+        return 0
+
+
+async def listen_invalidations(redis, retry_delay: float = 1.0):
+    """Фоновая задача процесса: получает сброшенные теги из Redis и передаёт их обработчикам"""
+    while True:
+        try:
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # После переподключения сообщения могли потеряться - сбрасываем всё
+                _notify([ALL_TAGS])
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        _notify(json.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Cache invalidation listener disconnected, reconnecting:", exc_info=True)
+            await asyncio.sleep(retry_delay)
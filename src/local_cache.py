@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+
+
+class LocalCache:
+    """
+    LRU-кэш строк в памяти процесса: ограничен суммарным размером значений и коротким временем жизни,
+    записи помечены тегами (для сброса вместе с Redis). Используется только из event loop
+    """
+
+    def __init__(self, max_bytes: int, max_item_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value, tags, remote_expires_at)
+        self._tags = {}  # tag -> set(key)
+        self.size = 0  # Суммарная длина значений (JSON кэша в ASCII - символы равны байтам)
+        # Увеличивается при каждом сбросе: значение, прочитанное до сброса, не сохраняется
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        """(оставшийся TTL в Redis, значение) или None"""
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        remote_ttl = max(int(item[3] - time.monotonic()), 0) if item[3] is not None else -1
+        return remote_ttl, item[1]
+
+    def set(self, key: str, value: str, tags, remote_ttl: int = None):
+        """Сохраняет значение на ttl секунд (не дольше, чем оно осталось бы в Redis)"""
+        if len(value) > self.max_item_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        now = time.monotonic()
+        ttl = min(self.ttl, remote_ttl) if remote_ttl and remote_ttl > 0 else self.ttl
+        remote_expires_at = now + remote_ttl if remote_ttl and remote_ttl > 0 else None
+        self._data[key] = (now + ttl, value, tuple(tags), remote_expires_at)
+        self.size += len(value)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, value, tags, _ = self._data.pop(key)
+        self.size -= len(value)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def drop_tags(self, tags):
+        """Удаляет записи, помеченные любым из тегов"""
+        self.generation += 1
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def clear(self):
+        self.generation += 1
+        self._data.clear()
+        self._tags.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        """Счётчики для мониторинга"""
+        total = self.hits + self.misses
+        return {
+            "items": len(self._data),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else None
+        }
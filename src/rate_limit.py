@@ -0,0 +1,132 @@
+"""
+Ограничение частоты дорогих запросов (поиск, вход, регистрация) для каждого пользователя или IP.
+Token bucket хранится в Redis: проверка и списание - один Lua-скрипт, поэтому лимит общий для всех
+процессов. Если Redis недоступен, RATE_LIMIT_REDIS_RETRY секунд используются корзины в памяти
+процесса (лимит действует в каждом процессе отдельно). Превышение - 429 с заголовком Retry-After.
+"""
+import logging
+import math
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request, status
+from monitoring.metrics import RATE_LIMITED
+from src.redis_client import redis
+from src.settings_env import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_SEARCH, RATE_LIMIT_LOGIN, RATE_LIMIT_REGISTER, RATE_LIMIT_MEMORY_SIZE,
+    RATE_LIMIT_REDIS_RETRY
+)
+from user.my_token import token_payload
+
+logger = logging.getLogger(__name__)
+
+# Пополняет корзину по времени Redis (одинаковому для всех процессов) и списывает cost токенов.
+# Возвращает {1 - разрешено, секунд до появления нужных токенов} (дробное - строкой)
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(now - updated, 0) * rate)
+local allowed, retry_after = 0, (cost - tokens) / rate
+if tokens >= cost then
+    tokens, allowed, retry_after = tokens - cost, 1, 0
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+
+def parse_limit(value: str):
+    """'30/60' - 30 запросов за 60 секунд: (пополнение в секунду, размер корзины); пусто или 0 - без лимита"""
+    if not value or value == "0":
+        return None
+    count, _, seconds = value.partition("/")
+    count = float(count)
+    return count / float(seconds or 1), count
+
+
+class MemoryBuckets:
+    """Корзины token bucket в памяти процесса (LRU, не больше maxsize). Используется только из event loop"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (tokens, updated)
+
+    def hit(self, key: str, rate: float, burst: float, cost: float = 1):
+        now = time.monotonic()
+        tokens, updated = self._data.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._data[key] = (tokens, now)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+class RateLimiter:
+    """Корзины в Redis, при его недоступности - в памяти процесса"""
+
+    def __init__(self, redis_client, memory_size: int = RATE_LIMIT_MEMORY_SIZE,
+                 redis_retry: float = RATE_LIMIT_REDIS_RETRY):
+        self.script = redis_client.register_script(_TOKEN_BUCKET_LUA)  # EVALSHA, текст скрипта - только один раз
+        self.memory = MemoryBuckets(memory_size)
+        self.redis_retry = redis_retry
+        self.redis_down_until = 0.0
+        self.enabled = RATE_LIMIT_ENABLED
+
+    async def hit(self, key: str, rate: float, burst: float):
+        """(разрешено ли, через сколько секунд повторить)"""
+        if time.monotonic() >= self.redis_down_until:
+            try:
+                allowed, retry_after = await self.script(keys=[f"rate:{key}"], args=[rate, burst, 1])
+                return bool(int(allowed)), float(retry_after)
+            except Exception:
+                logger.warning("Rate limiter: Redis is unavailable, in-process buckets for %s s",
+                               self.redis_retry, exc_info=True)
+                self.redis_down_until = time.monotonic() + self.redis_retry
+        return self.memory.hit(key, rate, burst)
+
+
+limiter = RateLimiter(redis)
+LIMITS = {}  # Название -> RateLimit (для мониторинга и замеров)
+
+
+def client_identity(request: Request) -> str:
+    """Авторизованный пользователь - по имени, аноним - по IP"""
+    payload = token_payload(request)
+    if payload is not None and payload.get("sub"):
+        return f"user:{payload['sub']}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class RateLimit:
+    """Зависимость маршрута: не больше limit ("N/секунд") запросов от одного пользователя или IP"""
+
+    def __init__(self, name: str, limit: str):
+        self.name = name
+        self.limit = parse_limit(limit)
+        LIMITS[name] = self
+
+    async def __call__(self, request: Request):
+        if self.limit is None or not limiter.enabled:
+            return
+        allowed, retry_after = await limiter.hit(f"{self.name}:{client_identity(request)}", *self.limit)
+        if not allowed:
+            RATE_LIMITED.labels(self.name).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, try again later",
+                headers={"Retry-After": str(max(math.ceil(retry_after), 1))}
+            )
+
+
+search_limit = RateLimit("search", RATE_LIMIT_SEARCH)
+login_limit = RateLimit("login", RATE_LIMIT_LOGIN)
+register_limit = RateLimit("register", RATE_LIMIT_REGISTER)
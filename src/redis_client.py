@@ -0,0 +1,6 @@
+# pip install "redis"
+from redis import asyncio as aioredis
+from src.settings_env import REDIS_HOST
+
+# Общий клиент Redis процесса (кэш, уведомления об инвалидации); подключение создаётся при первом запросе
+redis = aioredis.from_url(f"redis://{REDIS_HOST}", encoding="utf8", decode_responses=True)
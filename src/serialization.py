@@ -0,0 +1,54 @@
+# pip install orjson
+from datetime import date
+from functools import lru_cache
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_SINGLETON
+
+
+@lru_cache(maxsize=None)
+def _plan(scheme) -> tuple:
+    """Поля схемы: (имя, вложенная схема или None, список ли это)"""
+    plan = []
+    for name, field in scheme.__fields__.items():
+        nested = field.type_ if isinstance(field.type_, type) and issubclass(field.type_, BaseModel) else None
+        plan.append((name, nested, field.shape != SHAPE_SINGLETON))
+    return tuple(plan)
+
+
+def dump(scheme, obj):
+    """
+    ORM-объект в словарь с полями схемы ответа (даты - строки ISO, как у jsonable_encoder).
+    Без валидации pydantic: данные пришли из нашей БД
+    """
+    if obj is None:
+        return None
+    result = {}
+    for name, nested, many in _plan(scheme):
+        value = getattr(obj, name)
+        if nested is not None and value is not None:
+            value = [dump(nested, item) for item in value] if many else dump(nested, value)
+        elif isinstance(value, date):
+            value = value.isoformat()
+        result[name] = value
+    return result
+
+
+def dump_all(scheme, objects) -> list:
+    return [dump(scheme, obj) for obj in objects]
+
+
+def json_response(content, response: Response = None) -> Response:
+    """
+    Готовые словари (см. dump) сразу в ORJSONResponse, минуя jsonable_encoder FastAPI.
+    Заголовки и статус, выставленные зависимостями (например, @cache), переносятся
+    """
+    if isinstance(content, Response):
+        return content
+    result = ORJSONResponse(content)
+    if response is not None:
+        if response.status_code:
+            result.status_code = response.status_code
+        result.headers.raw.extend(response.headers.raw)
+    return result
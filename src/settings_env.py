@@ -8,12 +8,61 @@ POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT")
 POSTGRES_DB = os.getenv("POSTGRES_DB")
+# Реплики для чтения через запятую: host:port,host:port (пользователь и БД те же)
+POSTGRES_REPLICA_HOSTS = [host.strip() for host in os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",") if host.strip()]
+READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", 10))  # Чтение из основной БД после записи (секунды)
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", 30))  # Пауза перед повтором недоступной реплики
+
+# Пул подключений к БД (на каждый воркер)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))  # Постоянных подключений
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))  # Дополнительных подключений при нагрузке
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))  # Ожидание свободного подключения (секунды)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # Пересоздание подключения старше (секунды, -1 - никогда)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"  # Проверка подключения перед выдачей
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))  # Кэш подготовленных запросов asyncpg
+# Работа через PgBouncer в режиме transaction: без кэша подготовленных запросов и с уникальными именами
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
 
 SECRET_KEY_TOKEN = os.getenv("SECRET_KEY_TOKEN")
 ALGORITHM_TOKEN = os.getenv("ALGORITHM_TOKEN")
 
 SECRET_KEY_SESSION = os.getenv("SECRET_KEY_SESSION")
 
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 1024))  # Количество пользователей в кэше процесса
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 30))  # Время жизни пользователя в кэше (секунды)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))  # Проверенных токенов в кэше процесса (до их exp)
+# Страховочное время жизни боковой панели категорий в памяти (обычно сбрасывается при изменениях)
+SIDEBAR_TTL = float(os.getenv("SIDEBAR_TTL", 300))
+
+# Защита от одновременного пересчёта истёкших ключей кэша (параметры tagged_key_builder по умолчанию)
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", 60))  # Сколько секунд после истечения отдавать старое значение
+CACHE_TTL_JITTER = float(os.getenv("CACHE_TTL_JITTER", 0.1))  # Случайное уменьшение expire (доля)
+CACHE_LOCK_TIMEOUT = float(os.getenv("CACHE_LOCK_TIMEOUT", 10))  # Наибольшее время пересчёта под блокировкой
+CACHE_LOCK_WAIT = float(os.getenv("CACHE_LOCK_WAIT", 3))  # Сколько ждать значения, которое пересчитывает другой
+
+# Кэш fastapi-cache в памяти процесса перед Redis (0 - отключён)
+CACHE_LOCAL_MAX_BYTES = int(os.getenv("CACHE_LOCAL_MAX_BYTES", 32 * 1024 * 1024))  # Суммарный размер значений
+CACHE_LOCAL_MAX_ITEM_BYTES = int(os.getenv("CACHE_LOCAL_MAX_ITEM_BYTES", 1024 * 1024))  # Больше - только в Redis
+CACHE_LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", 5))  # Время жизни в памяти без уведомления о сбросе (секунды)
+
+# Браузер может показывать закэшированную анонимную страницу без перепроверки ETag (секунды)
+PAGE_CACHE_MAX_AGE = int(os.getenv("PAGE_CACHE_MAX_AGE", 0))
+
+# Ограничение частоты запросов "N/секунд" с одного пользователя или IP (пусто или 0 - без ограничения)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_SEARCH = os.getenv("RATE_LIMIT_SEARCH", "30/60")  # Полнотекстовый поиск
+RATE_LIMIT_LOGIN = os.getenv("RATE_LIMIT_LOGIN", "10/60")  # Вход (проверка пароля pbkdf2)
+RATE_LIMIT_REGISTER = os.getenv("RATE_LIMIT_REGISTER", "5/600")  # Регистрация (хэширование пароля, письмо)
+RATE_LIMIT_MEMORY_SIZE = int(os.getenv("RATE_LIMIT_MEMORY_SIZE", 10000))  # Корзин в памяти (если Redis недоступен)
+RATE_LIMIT_REDIS_RETRY = float(os.getenv("RATE_LIMIT_REDIS_RETRY", 5))  # Пауза перед повторным обращением к Redis
+
+# Профилирование запросов: заголовок Server-Timing и предупреждения о повторяющихся SQL (только для разработки)
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "false").lower() == "true"
+
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", 2))  # Процессов для хэширования паролей (на воркер)
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", 32))  # Сколько операций хэширования может ждать очереди
+HASH_QUEUE_TIMEOUT = float(os.getenv("HASH_QUEUE_TIMEOUT", 5))  # Сколько ждать места в очереди (секунды)
+
 REDIS_HOST = os.getenv("REDIS_HOST")
 REDIS_PORT = os.getenv("REDIS_PORT")
 
@@ -21,6 +70,18 @@ SMTP_USER = os.getenv("SMTP_USER")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 SMTP_HOST = os.getenv("SMTP_HOST")
 SMTP_PORT = os.getenv("SMTP_PORT")
+SMTP_SSL = os.getenv("SMTP_SSL", "true").lower() == "true"  # false - без TLS (локальный тестовый сервер)
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 10))  # Таймаут подключения и команд SMTP (секунды)
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 1))  # Постоянных SMTP-подключений на процесс воркера Celery
+SMTP_MAX_PER_CONNECTION = int(os.getenv("SMTP_MAX_PER_CONNECTION", 100))  # Писем через одно подключение
+SMTP_IDLE_CHECK = float(os.getenv("SMTP_IDLE_CHECK", 30))  # Простаивавшее дольше подключение проверяется NOOP
+SMTP_RATE_LIMIT = float(os.getenv("SMTP_RATE_LIMIT", 0))  # Писем в секунду на процесс воркера (0 - без ограничения)
+SMTP_MAX_RETRIES = int(os.getenv("SMTP_MAX_RETRIES", 5))  # Повторов задачи при временной ошибке SMTP
+SMTP_RETRY_BACKOFF_MAX = int(os.getenv("SMTP_RETRY_BACKOFF_MAX", 600))  # Наибольшая пауза между повторами (секунды)
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))  # Задач outbox за одну публикацию в брокер
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 1))  # Пауза опроса пустого outbox (секунды)
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 10))  # После стольких неудачных публикаций задача удаляется
 
 URL_HOST = os.getenv("URL_HOST")  # Хост приложения
 URL_PORT = os.getenv("URL_PORT")  # Порт приложения
@@ -0,0 +1,173 @@
+import queue
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from src.settings_env import (
+    SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_SSL, SMTP_TIMEOUT, SMTP_POOL_SIZE, SMTP_MAX_PER_CONNECTION,
+    SMTP_IDLE_CHECK, SMTP_RATE_LIMIT
+)
+
+# Ошибки отдельного письма: подключение после них остаётся рабочим (smtplib сам делает RSET)
+MESSAGE_ERRORS = (
+    smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError, smtplib.SMTPNotSupportedError
+)
+
+
+def build_message(to: str, subject: str, html: str) -> MIMEMultipart:
+    """Письмо с HTML-текстом от имени SMTP_USER"""
+    msg = MIMEMultipart()
+    msg["From"] = SMTP_USER
+    msg["To"] = to
+    msg["Subject"] = subject
+    msg.attach(MIMEText(html, "html"))
+    return msg
+
+
+def connect_smtp() -> smtplib.SMTP:
+    """Новое подключение к SMTP-серверу из настроек (с логином, если заданы учётные данные)"""
+    smtp = smtplib.SMTP_SSL if SMTP_SSL else smtplib.SMTP
+    server = smtp(SMTP_HOST, int(SMTP_PORT), timeout=SMTP_TIMEOUT)
+    try:
+        if SMTP_USER and SMTP_PASSWORD:
+            server.login(SMTP_USER, SMTP_PASSWORD)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
+def is_transient(ex: Exception) -> bool:
+    """Временная ошибка (код 4xx, обрыв или недоступность сервера) - отправку стоит повторить"""
+    if isinstance(ex, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in ex.recipients.values())
+    if isinstance(ex, smtplib.SMTPResponseException):
+        return 400 <= ex.smtp_code < 500
+    if isinstance(ex, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(ex, OSError) and not isinstance(ex, smtplib.SMTPException)
+
+
+class RateLimiter:
+    """Не больше rate писем в секунду (равномерно); rate=0 - без ограничения"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class _Connection:
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.sent = 0
+        self.used_at = time.monotonic()
+
+
+class SMTPPool:
+    """
+    Постоянные SMTP-подключения процесса воркера: TLS и логин - один раз на подключение, а не на письмо.
+    Подключение заменяется новым после max_per_connection писем, простаивавшее дольше idle_check
+    проверяется NOOP перед использованием
+    """
+
+    def __init__(self, size: int, max_per_connection: int, idle_check: float, rate: float, connect=connect_smtp):
+        self.connect = connect
+        self.max_per_connection = max_per_connection
+        self.idle_check = idle_check
+        self.limiter = RateLimiter(rate)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.connects = 0
+
+    def _open(self) -> _Connection:
+        connection = _Connection(self.connect())
+        self.connects += 1
+        return connection
+
+    @staticmethod
+    def _close(connection: _Connection):
+        try:
+            connection.server.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.server.close()
+
+    def _take(self) -> _Connection:
+        """Свободное рабочее подключение или новое"""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+            if time.monotonic() - connection.used_at < self.idle_check:
+                return connection
+            try:
+                connection.server.noop()
+                return connection
+            except (smtplib.SMTPException, OSError):
+                connection.server.close()
+
+    def send(self, messages: list) -> list:
+        """
+        Отправляет письма подряд через одно подключение.
+        Возвращает [(индекс письма, ошибка)] неотправленных
+        """
+        failed, index, connection, reconnected = [], 0, None, False
+        with self._slots:
+            try:
+                while index < len(messages):
+                    if connection is None:
+                        connection = self._take()
+                    self.limiter.wait()
+                    try:
+                        connection.server.send_message(messages[index])
+                    except MESSAGE_ERRORS as ex:
+                        failed.append((index, ex))
+                    except smtplib.SMTPServerDisconnected:
+                        # Сервер закрыл подключение (например, по таймауту) - одна попытка переподключиться
+                        connection.server.close()
+                        connection = None
+                        if reconnected:
+                            raise
+                        reconnected = True
+                        continue
+                    else:
+                        connection.sent += 1
+                    index += 1
+                    if connection.sent >= self.max_per_connection:
+                        self._close(connection)
+                        connection = None
+            except (smtplib.SMTPException, OSError) as ex:
+                if connection is not None:
+                    connection.server.close()
+                    connection = None
+                failed.extend((position, ex) for position in range(index, len(messages)))
+            finally:
+                if connection is not None:
+                    connection.used_at = time.monotonic()
+                    self._idle.put(connection)
+        return failed
+
+    def close(self):
+        """Закрывает свободные подключения (при остановке процесса воркера)"""
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+smtp_pool = SMTPPool(
+    size=SMTP_POOL_SIZE, max_per_connection=SMTP_MAX_PER_CONNECTION, idle_check=SMTP_IDLE_CHECK, rate=SMTP_RATE_LIMIT
+)
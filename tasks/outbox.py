@@ -0,0 +1,138 @@
+"""
+Transactional outbox: задачи Celery записываются в таблицу outbox в той же транзакции, что и данные,
+а отдельный процесс публикует их в брокер пачками и удаляет опубликованные.
+Обработчик запроса не ждёт брокер, и задача не теряется, если брокер недоступен в момент commit.
+Доставка "хотя бы один раз": при сбое между публикацией и удалением задача будет опубликована повторно.
+Задача, публикация которой OUTBOX_MAX_ATTEMPTS раз завершилась ошибкой (не из-за недоступности брокера),
+удаляется с записью в журнал.
+
+    python -m tasks.outbox
+    python -m tasks.outbox --once
+"""
+import argparse
+import asyncio
+import logging
+from kombu.exceptions import OperationalError
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from api_databases.address_db import _URL_DATABASE
+from monitoring.metrics import CELERY_ENQUEUE_DURATION
+from src.api_models import Outbox
+from src.settings_env import OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS, OUTBOX_POLL_INTERVAL
+from tasks.tasks import celery, send_emails
+
+logger = logging.getLogger(__name__)
+
+
+async def add_to_outbox(session: AsyncSession, task, *args):
+    """Добавляет задачу в текущую транзакцию: будет опубликована после session.commit()"""
+    await session.execute(insert(Outbox).values(task=task.name, args=list(args)))
+
+
+def group_tasks(rows) -> list:
+    """
+    [(id строк, задача, аргументы)] для публикации: письма всех строк send_emails
+    объединяются в одну задачу, которая отправит их через одно SMTP-подключение
+    """
+    tasks, email_rows, emails = [], [], []
+    for row_id, task, args, *_ in rows:
+        if task == send_emails.name:
+            email_rows.append(row_id)
+            emails.extend(args[0])
+        else:
+            tasks.append(([row_id], task, args))
+    if email_rows:
+        tasks.append((email_rows, send_emails.name, [emails]))
+    return tasks
+
+
+def publish(rows) -> tuple:
+    """
+    Публикует задачи через одно подключение к брокеру.
+    Возвращает (id опубликованных строк, id строк, задачи которых не удалось опубликовать).
+    При недоступном брокере остальные строки не входят ни в один список: это не ошибка задачи
+    """
+    published, failed = [], []
+    try:
+        with celery.producer_or_acquire() as producer:
+            for row_ids, task, args in group_tasks(rows):
+                try:
+                    with CELERY_ENQUEUE_DURATION.labels(task.rsplit(".", 1)[-1]).time():
+                        celery.send_task(task, args=args, producer=producer)
+                except OperationalError:
+                    raise
+                # Ошибка одной задачи не мешает публикации остальных
+                except Exception:
+                    logger.warning("Error publishing outbox task %s (rows %s):", task, row_ids, exc_info=True)
+                    failed.extend(row_ids)
+                    continue
+                published.extend(row_ids)
+    except Exception:
+        logger.warning("Error publishing outbox tasks:", exc_info=True)
+    return published, failed
+
+
+async def relay_batch(session: AsyncSession, batch_size: int = OUTBOX_BATCH_SIZE,
+                      max_attempts: int = OUTBOX_MAX_ATTEMPTS) -> int:
+    """
+    Публикует самые старые задачи outbox, возвращает количество опубликованных.
+    Задачи с меньшим числом неудачных попыток идут первыми: повторяющаяся ошибка не задерживает новые.
+    Недоступность брокера попыткой не считается - задачи ждут его сколько угодно.
+    Строки блокируются (SKIP LOCKED), поэтому процессов-ретрансляторов может быть несколько
+    """
+    result = await session.execute(
+        select(Outbox.id, Outbox.task, Outbox.args, Outbox.attempts).order_by(Outbox.attempts, Outbox.id)
+        .limit(batch_size).with_for_update(skip_locked=True)
+    )
+    rows = result.all()
+    if not rows:
+        await session.rollback()
+        return 0
+    # Публикация блокирующая (kombu) - в отдельном потоке
+    published, failed = await asyncio.to_thread(publish, rows)
+    if published:
+        await session.execute(delete(Outbox).filter(Outbox.id.in_(published)))
+    failed_rows = [row for row in rows if row.id in failed]
+    dead = [row for row in failed_rows if row.attempts + 1 >= max_attempts]
+    for row in dead:
+        logger.error("Outbox task %s (row %s) was not published after %s attempts, dropped: args=%s",
+                     row.task, row.id, row.attempts + 1, row.args)
+    if dead:
+        await session.execute(delete(Outbox).filter(Outbox.id.in_([row.id for row in dead])))
+    retry = [row.id for row in failed_rows if row.attempts + 1 < max_attempts]
+    if retry:
+        await session.execute(update(Outbox).filter(Outbox.id.in_(retry)).values(attempts=Outbox.attempts + 1))
+    await session.commit()
+    return len(published)
+
+
+async def run_relay(batch_size: int = OUTBOX_BATCH_SIZE, poll_interval: float = OUTBOX_POLL_INTERVAL,
+                    once: bool = False):
+    """Разбирает outbox, пока есть задачи; затем опрашивает каждые poll_interval секунд (once - выйти)"""
+    engine = create_async_engine(_URL_DATABASE, pool_size=1, max_overflow=0, pool_pre_ping=True)
+    session_factory = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    try:
+        while True:
+            try:
+                async with session_factory() as session:
+                    published = await relay_batch(session, batch_size)
+            except Exception:
+                logger.warning("Error relaying outbox:", exc_info=True)
+                published = 0
+            if published < batch_size:
+                if once:
+                    return
+                await asyncio.sleep(poll_interval)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE, help="задач за одну публикацию")
+    parser.add_argument("--poll-interval", type=float, default=OUTBOX_POLL_INTERVAL, help="пауза опроса (секунды)")
+    parser.add_argument("--once", action="store_true", help="разобрать outbox и выйти")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_relay(args.batch_size, args.poll_interval, args.once))
@@ -1,32 +1,79 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import asyncio
 from celery import Celery
-from src.settings_env import REDIS_HOST, REDIS_PORT, SMTP_HOST, SMTP_USER, SMTP_PASSWORD, SMTP_PORT, URL_HOST, URL_PORT
+from celery.signals import worker_process_shutdown
+from celery.utils.log import get_task_logger
+from celery.utils.time import get_exponential_backoff_interval
+from post.counters import run_reconciliation
+from src.settings_env import (
+    REDIS_HOST, REDIS_PORT, URL_HOST, URL_PORT, SMTP_MAX_RETRIES, SMTP_RETRY_BACKOFF_MAX
+)
+from tasks.mailer import build_message, is_transient, smtp_pool
 
 celery = Celery("tasks", broker=f"redis://{REDIS_HOST}:{REDIS_PORT}/0", broker_connection_retry_on_startup=True)
+# Периодическая сверка счётчиков опубликованных записей (celery -A tasks.tasks beat)
+celery.conf.beat_schedule = {
+    "reconcile-post-counters": {
+        "task": "tasks.tasks.reconcile_post_counters",
+        "schedule": 60 * 60,
+    },
+}
 
 url_address = f"http://{URL_HOST}:{URL_PORT}"
+logger = get_task_logger(__name__)
 
 
-@celery.task
-def send_email_login(username: str, user_email):
-    """Отправляет письмо на email указанный пользователем при регистрации"""
-    msg = MIMEMultipart()
-    msg["From"] = SMTP_USER
-    msg["To"] = user_email
-    msg["Subject"] = f"Registration on the site FastAPI app"
+@worker_process_shutdown.connect
+def close_smtp_connections(**kwargs):
+    smtp_pool.close()
+
 
+def registration_email(username: str, user_email) -> dict:
+    """Письмо на email указанный пользователем при регистрации"""
     # Форматирование текста письма с использованием HTML
     message = f"Admin: {username.title()}, Thank you for registering on the site. "
     message += f"Click <a href='{url_address}'>here</a> to visit the site."
+    return {"to": user_email, "subject": "Registration on the site FastAPI app", "html": message}
+
+
+def deliver(task, emails: list) -> tuple:
+    """
+    Отправляет письма через пул подключений процесса.
+    Возвращает (письма с временной ошибкой, {адрес: ошибка} для остальных неотправленных)
+    """
+    failed = smtp_pool.send([build_message(**email) for email in emails])
+    retry = [emails[index] for index, ex in failed if is_transient(ex)]
+    errors = {emails[index]["to"]: f"{ex}" for index, ex in failed if not is_transient(ex)}
+    for address, error in errors.items():
+        logger.warning("Email to %s was not sent: %s", address, error)
+    if retry and task.request.retries >= SMTP_MAX_RETRIES:
+        errors.update({email["to"]: "retries exhausted" for email in retry})
+        retry = []
+    return retry, errors
+
 
-    # Добавление текста письма как HTML-части
-    msg.attach(MIMEText(message, "html"))
-    try:
-        with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) as server:
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            server.sendmail(msg["From"], msg["To"], msg.as_string())
-        return {"message": "sent email"}
-    except smtplib.SMTPException as ex:
-        return {'Sending error email:': f"{ex}"}
+def retry_later(task, **kwargs):
+    """Повтор задачи с экспоненциально растущей паузой (со случайным разбросом)"""
+    countdown = get_exponential_backoff_interval(
+        factor=2, retries=task.request.retries, maximum=SMTP_RETRY_BACKOFF_MAX, full_jitter=True
+    )
+    raise task.retry(countdown=countdown, max_retries=SMTP_MAX_RETRIES, **kwargs)
+
+
+@celery.task(bind=True)
+def send_emails(self, emails: list):
+    """
+    Пакетная отправка писем [{"to", "subject", "html"}] через одно подключение.
+    Письма из нескольких строк outbox объединяются в одну задачу (tasks.outbox.group_tasks).
+    Повторяются только письма с временной ошибкой
+    """
+    retry, errors = deliver(self, emails)
+    if retry:
+        retry_later(self, args=(retry,))
+    return {"sent": len(emails) - len(errors), "errors": errors}
+
+
+@celery.task
+def reconcile_post_counters():
+    """Исправляет расхождения счётчиков опубликованных записей с таблицей post"""
+    drift = asyncio.run(run_reconciliation())
+    return {"drift": drift}
@@ -0,0 +1,145 @@
+"""
+Массовый импорт (post.bulk_import): разбор NDJSON и CSV, отчёт об ошибках проверки.
+Для загрузки нужна PostgreSQL из настроек (POSTGRES_*): данные создаются в транзакции и откатываются
+"""
+import json
+import pytest
+# pip install "fakeredis[lua]"
+from fakeredis import FakeServer, aioredis
+from fastapi_cache import FastAPICache
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from benchmarks.explain_check import seeded_connection
+from post.bulk_import import import_posts, iter_lines, parse_rows, validate_row
+from src.api_models import Category, Post, User
+from src.cache_tags import TaggedRedisBackend
+from src.settings_env import POSTGRES_HOST
+
+pytestmark = pytest.mark.anyio
+
+CONTENT = "Content that is long enough to pass validation"
+
+
+async def chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def parse(text: str, import_format: str, size: int = 7):
+    """Разбор в [(номер строки, данные, ошибка)], поток режется на куски size байт"""
+    return [row async for row in parse_rows(iter_lines(chunks(text.encode(), size)), import_format)]
+
+
+@pytest.mark.parametrize("size", [1, 7, 1 << 16])
+async def test_lines_split_across_chunks(size):
+    text = "первая\r\nвторая\n\nпоследняя без перевода строки"
+    lines = [line async for line in iter_lines(chunks(text.encode(), size))]
+    assert lines == ["первая", "вторая", "", "последняя без перевода строки"]
+
+
+async def test_ndjson_rows():
+    text = "\n".join([
+        json.dumps({"title": "First", "content": CONTENT, "category_id": 1}),
+        "",
+        "{broken",
+        "[1, 2]",
+        json.dumps({"title": "Fifth", "content": CONTENT, "category_id": 2}),
+    ])
+    rows = await parse(text, "ndjson")
+    assert [(line, data and data["title"], error and error.split(":")[0]) for line, data, error in rows] == [
+        (1, "First", None), (3, None, "invalid JSON"), (4, None, "JSON object expected"), (5, "Fifth", None)]
+
+
+async def test_csv_multiline_quoted_fields():
+    text = (
+        "title,content,category_id\r\n"
+        'One,"first line\r\nsecond line, with comma\r\n\r\nafter blank line",1\r\n'
+        'Two,"say ""hi""\nand ""bye""",2\n'
+        "\n"
+        'Three,"""quoted"" start",3\n'
+    )
+    rows = await parse(text, "csv")
+    assert rows == [
+        (2, {"title": "One", "content": "first line\nsecond line, with comma\n\nafter blank line",
+             "category_id": "1"}, None),
+        (6, {"title": "Two", "content": 'say "hi"\nand "bye"', "category_id": "2"}, None),
+        (9, {"title": "Three", "content": '"quoted" start', "category_id": "3"}, None),
+    ]
+
+
+async def test_csv_bare_quote_does_not_swallow_following_rows():
+    # Кавычка внутри поля без кавычек - обычный символ, следующая строка - новая запись
+    text = 'title,content,category_id\nInches,5 inches" wide,1\nNext,text,2\n'
+    rows = await parse(text, "csv")
+    assert [(line, data) for line, data, _ in rows] == [
+        (2, {"title": "Inches", "content": '5 inches" wide', "category_id": "1"}),
+        (3, {"title": "Next", "content": "text", "category_id": "2"}),
+    ]
+
+
+async def test_csv_errors():
+    text = (
+        "title,content,category_id\n"
+        "Short,row\n"
+        'Bad,"closed"tail,1\n'
+        "Empty,,1\n"
+        'Open,"never closed,1\n'
+        "Lost,row,2\n"
+    )
+    rows = await parse(text, "csv")
+    assert rows[0] == (2, None, "expected 3 fields, got 2")
+    assert rows[1][0] == 3 and rows[1][2].startswith("invalid CSV")
+    # Пустое значение - как отсутствующее поле
+    assert rows[2] == (4, {"title": "Empty", "category_id": "1"}, None)
+    # Незакрытая кавычка забирает всё до конца файла - одна ошибка с номером строки начала записи
+    assert rows[3] == (5, None, "unterminated quoted field")
+    assert len(rows) == 4
+
+
+async def test_validate_row_reports_errors():
+    record, errors = await validate_row({"title": "Post", "content": CONTENT, "category_id": "3"}, user_id=7)
+    assert errors is None
+    assert record[:2] == ("Post", CONTENT) and record[4:] == (False, 7, 3)
+
+    record, errors = await validate_row({"title": "No", "content": "short", "category_id": 3}, user_id=7)
+    assert record is None
+    assert [error.split(":")[0] for error in errors] == ["title", "content"]
+
+    record, errors = await validate_row({"title": "Post", "content": CONTENT, "category_id": "x",
+                                         "published": "maybe"}, user_id=7)
+    assert record is None
+    assert [error.split(":")[0] for error in errors] == ["category_id", "published"]
+
+    record, errors = await validate_row({"content": CONTENT}, user_id=7)
+    assert errors == ["title: field required", "category_id: field required"]
+
+
+@pytest.fixture
+async def session():
+    FastAPICache.reset()
+    FastAPICache.init(TaggedRedisBackend(aioredis.FakeRedis(server=FakeServer(), decode_responses=True)),
+                      prefix="test")
+    async with seeded_connection(users=2, categories=2, posts=0) as connection:
+        async with AsyncSession(bind=connection, expire_on_commit=False,
+                                join_transaction_mode="create_savepoint") as session:
+            yield session
+
+
+@pytest.mark.skipif(not POSTGRES_HOST, reason="PostgreSQL is not configured (POSTGRES_HOST)")
+async def test_import_reports_rejected_rows(session):
+    category_id = await session.scalar(select(func.min(Category.id)).filter(Category.title.like("explain\\_%")))
+    posts_before = await session.scalar(select(func.count(Post.id)))
+    lines = [
+        {"title": "Imported one", "content": CONTENT, "category_id": category_id, "published": True},
+        {"title": "No", "content": CONTENT, "category_id": category_id},
+        {"title": "Unknown category", "content": CONTENT, "category_id": -1},
+        {"title": "Imported two", "content": CONTENT, "category_id": category_id},
+    ]
+    user_id = await session.scalar(select(func.min(User.id)).filter(User.username.like("explain\\_%")))
+    text = "\n".join(map(json.dumps, lines))
+    rows = parse_rows(iter_lines(chunks(text.encode(), 64)), "ndjson")
+    report = await import_posts(session, rows, user_id=user_id, batch_size=2)
+    assert (report["imported"], report["rejected"], report["failed"]) == (2, 2, 0)
+    assert [error["line"] for error in report["errors"]] == [2, 3]
+    assert report["errors"][1]["errors"] == ["category_id: -1 does not exist"]
+    assert await session.scalar(select(func.count(Post.id))) == posts_before + 2
@@ -0,0 +1,73 @@
+"""Кэш с тегами (src.cache_tags) на fakeredis: сброс тегов во время пересчёта значения"""
+import pytest
+# pip install "fakeredis[lua]"
+from fakeredis import FakeServer, aioredis
+from fastapi_cache import FastAPICache
+from src.cache_tags import ALL_TAGS, TaggedRedisBackend, TwoTierBackend, _notify, tag_key
+from src.local_cache import LocalCache
+
+pytestmark = pytest.mark.anyio
+
+KEY = "test:key"
+TAGS = ["posts:list", "category:1"]
+
+
+@pytest.fixture
+def redis():
+    return aioredis.FakeRedis(server=FakeServer(), decode_responses=True)
+
+
+@pytest.fixture
+def backend(redis):
+    backend = TaggedRedisBackend(redis)
+    FastAPICache.reset()
+    FastAPICache.init(backend, prefix="test")
+    return backend
+
+
+async def test_set_after_read_writes_value(backend, redis):
+    assert await backend.get_with_ttl(KEY, tags=TAGS) == (-2, None)
+    assert await backend.set(KEY, "fresh", expire=60, tags=TAGS)
+    assert await redis.get(KEY) == "fresh"
+    assert KEY in await redis.smembers(tag_key("category:1"))
+
+
+async def test_invalidate_during_refill_discards_value(backend, redis):
+    # Пересчёт прочитал промах, затем запись в БД сбросила тег, затем пересчёт пытается записать старые данные
+    await backend.get_with_ttl(KEY, tags=TAGS)
+    await backend.invalidate("category:1")
+    assert not await backend.set(KEY, "stale", expire=60, tags=TAGS)
+    assert await redis.get(KEY) is None
+    # Следующий пересчёт (после нового чтения) записывается
+    await backend.get_with_ttl(KEY, tags=TAGS)
+    assert await backend.set(KEY, "fresh", expire=60, tags=TAGS)
+    assert await redis.get(KEY) == "fresh"
+
+
+async def test_invalidate_of_other_tag_does_not_block_write(backend, redis):
+    await backend.get_with_ttl(KEY, tags=TAGS)
+    await backend.invalidate("category:2")
+    assert await backend.set(KEY, "fresh", expire=60, tags=TAGS)
+
+
+async def test_discarded_value_is_not_kept_locally(redis):
+    backend = TwoTierBackend(redis, LocalCache(max_bytes=1 << 20, max_item_bytes=1 << 16, ttl=60))
+    FastAPICache.reset()
+    FastAPICache.init(backend, prefix="test")
+    await backend.get_with_ttl(KEY, tags=TAGS)
+    # Сброс из другого процесса: локальный кэш этого процесса о нём ещё не знает
+    await backend.invalidate("posts:list")
+    assert not await backend.set(KEY, "stale", expire=60, tags=TAGS)
+    assert backend.local.get(KEY) is None
+
+
+async def test_reconnect_drops_all_local_entries(redis):
+    backend = TwoTierBackend(redis, LocalCache(max_bytes=1 << 20, max_item_bytes=1 << 16, ttl=60))
+    FastAPICache.reset()
+    FastAPICache.init(backend, prefix="test")
+    await backend.get_with_ttl(KEY, tags=["post:1"])
+    assert await backend.set(KEY, "value", expire=60, tags=["post:1"])
+    assert backend.local.get(KEY) is not None
+    # Сброс post:1 потерян, пока подписка была отключена: после переподключения процесс сбрасывает всё
+    _notify([ALL_TAGS])
+    assert backend.local.get(KEY) is None
@@ -0,0 +1,20 @@
+"""
+Запросы обработчиков к таблице post не читают её целиком (EXPLAIN без Seq Scan по post).
+Нужна PostgreSQL из настроек (POSTGRES_*): данные создаются в транзакции и откатываются
+"""
+import pytest
+from benchmarks.explain_check import explain_checks, seeded_connection
+from src.settings_env import POSTGRES_HOST
+
+pytestmark = [
+    pytest.mark.anyio,
+    pytest.mark.skipif(not POSTGRES_HOST, reason="PostgreSQL is not configured (POSTGRES_HOST)"),
+]
+
+
+async def test_no_seq_scan_on_post():
+    async with seeded_connection(users=200, categories=20, posts=10000) as connection:
+        results = await explain_checks(connection)
+    assert results
+    seq_scans = [f"{name}: {' '.join(statement.split())}" for name, statement, scans in results if scans]
+    assert not seq_scans, "Seq Scan on post:\n" + "\n".join(seq_scans)
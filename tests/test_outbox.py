@@ -0,0 +1,113 @@
+"""
+Публикация задач outbox (tasks.outbox).
+Для ретранслятора нужна PostgreSQL из настроек (POSTGRES_*): строки создаются в транзакции и откатываются
+"""
+import logging
+from contextlib import contextmanager
+import pytest
+from kombu.exceptions import OperationalError
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from benchmarks.explain_check import seeded_connection
+from src.api_models import Outbox
+from src.settings_env import POSTGRES_HOST
+from tasks import outbox
+from tasks.outbox import group_tasks, publish, relay_batch
+from tasks.tasks import celery, reconcile_post_counters, send_emails
+
+
+def email(address: str) -> dict:
+    return {"to": address, "subject": "Subject", "html": "<p>Hello</p>"}
+
+
+def test_emails_of_batch_grouped_into_one_task():
+    rows = [
+        (1, send_emails.name, [[email("a@example.com")]]),
+        (2, reconcile_post_counters.name, []),
+        (3, send_emails.name, [[email("b@example.com"), email("c@example.com")]]),
+    ]
+    assert group_tasks(rows) == [
+        ([2], reconcile_post_counters.name, []),
+        ([1, 3], send_emails.name, [[email("a@example.com"), email("b@example.com"), email("c@example.com")]]),
+    ]
+
+
+def test_no_emails_no_group():
+    assert group_tasks([(5, reconcile_post_counters.name, [])]) == [([5], reconcile_post_counters.name, [])]
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Задачи, отправленные в брокер; задача "broken" не публикуется, "down" - брокер недоступен"""
+    sent = []
+
+    def send_task(task, args, producer):
+        if task == "broken":
+            raise ValueError("cannot serialize")
+        if task == "down":
+            raise OperationalError("broker is unavailable")
+        sent.append((task, args))
+
+    monkeypatch.setattr(celery, "producer_or_acquire", contextmanager(lambda: (yield None)))
+    monkeypatch.setattr(celery, "send_task", send_task)
+    return sent
+
+
+def test_failed_task_does_not_stop_batch(sent):
+    rows = [(1, "broken", []), (2, reconcile_post_counters.name, []), (3, send_emails.name, [[email("a@b.c")]])]
+    assert publish(rows) == ([2, 3], [1])
+    assert sent == [(reconcile_post_counters.name, []), (send_emails.name, [[email("a@b.c")]])]
+
+
+def test_broker_unavailable_is_not_task_failure(sent):
+    rows = [(1, reconcile_post_counters.name, []), (2, "down", []), (3, reconcile_post_counters.name, [])]
+    assert publish(rows) == ([1], [])
+
+
+@pytest.fixture
+async def session():
+    async with seeded_connection(users=0, categories=0, posts=0) as connection:
+        async with AsyncSession(bind=connection, expire_on_commit=False,
+                                join_transaction_mode="create_savepoint") as session:
+            await session.execute(delete(Outbox))
+            yield session
+
+
+async def outbox_rows(session) -> dict:
+    return dict((await session.execute(select(Outbox.task, Outbox.attempts).order_by(Outbox.id))).all())
+
+
+@pytest.mark.anyio
+@pytest.mark.skipif(not POSTGRES_HOST, reason="PostgreSQL is not configured (POSTGRES_HOST)")
+async def test_relay_counts_attempts_and_drops_poison_task(session, monkeypatch, caplog):
+    await session.execute(insert(Outbox).values([
+        {"task": "broken", "args": [], "attempts": 0},
+        {"task": "broken_old", "args": [], "attempts": 2},
+        {"task": reconcile_post_counters.name, "args": [], "attempts": 0},
+    ]))
+    sent_tasks = []
+
+    def fake_publish(rows):
+        sent_tasks.append([row.task for row in rows])
+        return [row.id for row in rows if not row.task.startswith("broken")], \
+            [row.id for row in rows if row.task.startswith("broken")]
+
+    monkeypatch.setattr(outbox, "publish", fake_publish)
+    with caplog.at_level(logging.ERROR, logger=outbox.__name__):
+        # Сначала задачи без неудачных попыток
+        assert await relay_batch(session, batch_size=2, max_attempts=3) == 1
+        assert sent_tasks[-1] == ["broken", reconcile_post_counters.name]
+        assert await outbox_rows(session) == {"broken": 1, "broken_old": 2}
+        # Третья неудачная попытка - задача удаляется с записью в журнал
+        assert await relay_batch(session, batch_size=2, max_attempts=3) == 0
+        assert await outbox_rows(session) == {"broken": 2}
+    assert [record.message.split(" (")[0] for record in caplog.records] == ["Outbox task broken_old"]
+
+
+@pytest.mark.anyio
+@pytest.mark.skipif(not POSTGRES_HOST, reason="PostgreSQL is not configured (POSTGRES_HOST)")
+async def test_relay_keeps_tasks_while_broker_unavailable(session, sent):
+    await session.execute(insert(Outbox).values([{"task": "down", "args": [], "attempts": 0}]))
+    for _ in range(5):
+        assert await relay_batch(session, batch_size=10, max_attempts=3) == 0
+    assert await outbox_rows(session) == {"down": 0}
@@ -0,0 +1,78 @@
+"""Кэш страниц целиком (webapp.page_cache) на fakeredis: ETag и 304, обход для авторизованных, параметры запроса"""
+import httpx
+import pytest
+from fakeredis import FakeServer, aioredis
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import HTMLResponse
+from fastapi_cache import FastAPICache
+from src.cache_tags import TaggedRedisBackend
+from user.my_token import NAME_COOKIES
+from webapp.page_cache import PageCacheRoute, cache_page
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def redis():
+    redis = aioredis.FakeRedis(server=FakeServer(), decode_responses=True)
+    FastAPICache.reset()
+    FastAPICache.init(TaggedRedisBackend(redis), prefix="test")
+    return redis
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.state.renders = 0
+    router = APIRouter(route_class=PageCacheRoute)
+
+    @router.get("/")
+    @cache_page("posts:list")
+    async def index(page: int = 1, messages: str = None):
+        app.state.renders += 1
+        return HTMLResponse(f"<p>page {page} {messages}</p>")
+
+    app.include_router(router)
+    return app
+
+
+@pytest.fixture
+async def client(app, redis):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def page_keys(redis) -> int:
+    return len([key async for key in redis.scan_iter("test:page:*")])
+
+
+async def test_etag_and_304(client, app):
+    first = await client.get("/")
+    assert first.status_code == 200 and first.text == "<p>page 1 None</p>"
+    etag = first.headers["etag"]
+    assert first.headers["vary"] == "Cookie"
+    second = await client.get("/")
+    assert second.headers["etag"] == etag and second.text == first.text
+    not_modified = await client.get("/", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert (await client.get("/", headers={"If-None-Match": '"other"'})).status_code == 200
+    assert app.state.renders == 1
+
+
+async def test_authenticated_request_bypasses_cache(client, app, redis):
+    await client.get("/")
+    response = await client.get("/", cookies={NAME_COOKIES: "Bearer token"})
+    assert response.status_code == 200 and "etag" not in response.headers
+    assert app.state.renders == 2
+    assert await page_keys(redis) == 1
+
+
+async def test_only_declared_query_params_are_cached(client, app, redis):
+    await client.get("/?page=2")
+    await client.get("/?page=2")
+    assert app.state.renders == 1 and await page_keys(redis) == 1
+    # Неизвестные, повторённые и свободные параметры не создают ключей
+    for url in ("/?x=1", "/?x=2", "/?page=2&page=2", "/?page=2&x=1", "/?messages=hello"):
+        assert (await client.get(url)).status_code == 200
+    assert await page_keys(redis) == 1
+    assert app.state.renders == 6
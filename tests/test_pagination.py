@@ -0,0 +1,124 @@
+"""
+Курсорная пагинация (post.routers): кодирование курсора, испорченные курсоры, границы страниц.
+Для проверок границ нужна PostgreSQL из настроек (POSTGRES_*): данные создаются в транзакции и откатываются
+"""
+import base64
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from benchmarks.explain_check import seeded_connection
+from post.listing import make_excerpt
+from post.routers import category_post_all, decode_cursor, encode_cursor, search_post
+from post.schemes import SearchPostScheme
+from src.api_models import Category, Post, User
+from src.settings_env import POSTGRES_HOST
+
+needs_postgres = pytest.mark.skipif(not POSTGRES_HOST, reason="PostgreSQL is not configured (POSTGRES_HOST)")
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(id=123, category=4)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == {"id": 123, "category": 4}
+    assert decode_cursor(cursor, category=4) == {"id": 123, "category": 4}
+    assert decode_cursor(encode_cursor(id=5, rank=0.1)) == {"id": 5, "rank": 0.1}
+
+
+def test_empty_cursor_is_first_page():
+    assert decode_cursor("") == {}
+    assert decode_cursor("", category=4) == {}
+
+
+@pytest.mark.parametrize("after", [
+    "!!!",  # не base64
+    base64.urlsafe_b64encode(b"not json").decode(),
+    encode_cursor(),  # нет id
+    base64.urlsafe_b64encode(b"[1, 2]").decode(),  # не объект
+    encode_cursor(id="5"),  # id не число
+    encode_cursor(id=None),
+    encode_cursor(id=5)[:-2],  # обрезанный
+])
+def test_garbage_cursor_is_rejected(after):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(after)
+    assert error.value.status_code == 400
+
+
+def test_cursor_of_other_category_is_rejected():
+    with pytest.raises(HTTPException):
+        decode_cursor(encode_cursor(id=10, category=1), category=2)
+    with pytest.raises(HTTPException):
+        decode_cursor(encode_cursor(id=10), category=2)
+
+
+@pytest.fixture
+async def session():
+    async with seeded_connection(users=5, categories=3, posts=50) as connection:
+        async with AsyncSession(bind=connection, expire_on_commit=False) as session:
+            yield session
+
+
+async def category_ids(session, category_id):
+    result = await session.scalars(
+        select(Post.id).filter(Post.category_id == category_id, Post.published).order_by(Post.id.desc()))
+    return list(result)
+
+
+async def walk_category(session, category_id, limit):
+    """Все страницы категории по next_cursor: [(id записей, has_more)]"""
+    pages, after = [], ""
+    while after is not None:
+        result = await category_post_all.__wrapped__(category_id=category_id, limit=limit, after=after,
+                                                     session=session)
+        pages.append(([post["id"] for post in result["data"]], result["has_more"]))
+        after = result["next_cursor"]
+    return pages
+
+
+@needs_postgres
+@pytest.mark.anyio
+async def test_keyset_walk_covers_category_without_gaps(session):
+    category_id = await session.scalar(select(func.min(Category.id)).filter(Category.title.like("explain\\_%")))
+    expected = await category_ids(session, category_id)
+    assert len(expected) > 4
+    pages = await walk_category(session, category_id, limit=4)
+    assert [post_id for ids, _ in pages for post_id in ids] == expected
+    assert [has_more for _, has_more in pages] == [True] * (len(pages) - 1) + [False]
+    assert all(len(ids) == 4 for ids, _ in pages[:-1])
+
+
+@needs_postgres
+@pytest.mark.anyio
+async def test_keyset_boundaries(session):
+    category_id = await session.scalar(select(func.min(Category.id)).filter(Category.title.like("explain\\_%")))
+    expected = await category_ids(session, category_id)
+    # Ровно limit записей - одна страница без следующей (запись limit + 1 не найдена)
+    assert await walk_category(session, category_id, limit=len(expected)) == [(expected, False)]
+    # На одну меньше - вторая страница с последней записью
+    assert await walk_category(session, category_id, limit=len(expected) - 1) == [
+        (expected[:-1], True), (expected[-1:], False)]
+    # Курсор после последней записи - пустая страница
+    after = encode_cursor(id=expected[-1], category=category_id)
+    result = await category_post_all.__wrapped__(category_id=category_id, limit=5, after=after, session=session)
+    assert result["data"] == [] and not result["has_more"] and result["next_cursor"] is None
+
+
+@needs_postgres
+@pytest.mark.anyio
+async def test_search_cursor_breaks_rank_ties_by_id(session):
+    user_id = await session.scalar(select(func.min(User.id)).filter(User.username.like("explain\\_%")))
+    category_id = await session.scalar(select(func.min(Category.id)).filter(Category.title.like("explain\\_%")))
+    content = "quokkatiebreaker appears in every one of these posts"
+    result = await session.execute(insert(Post).values([
+        {"title": "Tie", "content": content, "excerpt": make_excerpt(content), "published": True,
+         "user_id": user_id, "category_id": category_id} for _ in range(7)
+    ]).returning(Post.id))
+    expected = sorted((row[0] for row in result), reverse=True)
+    found, after = [], ""
+    while after is not None:
+        page = await search_post(SearchPostScheme(search="quokkatiebreaker"), session, limit=3, after=after)
+        found += [post["id"] for post in page["data"]]
+        after = page["next_cursor"]
+    # Одинаковый rank у всех: порядок и продолжение - по id, без повторов и пропусков
+    assert found == expected
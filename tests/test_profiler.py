@@ -0,0 +1,57 @@
+"""
+Количество SQL-запросов функций данных обработчиков и отсутствие повторов (N+1) - через profile_queries.
+Нужна PostgreSQL из настроек (POSTGRES_*): данные создаются в транзакции и откатываются
+"""
+import pytest
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from benchmarks.explain_check import seeded_connection
+from monitoring.metrics import instrument_engine
+from monitoring.profiler import profile_queries
+from post.counters import reconcile_counters
+from post.routers import get_all_posts, category_post_all, get_one_post
+from src.api_models import Category, Post
+from src.settings_env import POSTGRES_HOST
+
+pytestmark = [
+    pytest.mark.anyio,
+    pytest.mark.skipif(not POSTGRES_HOST, reason="PostgreSQL is not configured (POSTGRES_HOST)"),
+]
+
+
+@pytest.fixture
+async def session():
+    async with seeded_connection(users=20, categories=5, posts=200) as connection:
+        instrument_engine(connection.engine)
+        async with AsyncSession(bind=connection, expire_on_commit=False) as session:
+            # Счётчики для тестовых категорий (иначе количество считается запасным запросом по post)
+            await reconcile_counters(session)
+            yield session
+
+
+async def test_get_all_posts_queries(session):
+    with profile_queries() as profile:
+        result = await get_all_posts.__wrapped__(page=2, limit=10, session=session)
+    assert len(result["data"]) == 10
+    # Счётчик, страница записей, категории записей страницы (одним запросом)
+    assert profile.query_count == 3
+    assert not profile.repeated()
+    # Строки SELECT записываются (asyncpg сообщает их число в статусе команды)
+    assert [rows for *_, rows in profile.queries[:2]] == [1, 10]
+    assert "rows" in profile.server_timing(0.1)
+
+
+async def test_category_post_all_queries(session):
+    category_id = await session.scalar(select(func.min(Category.id)).filter(Category.title.like("explain\\_%")))
+    with profile_queries() as profile:
+        result = await category_post_all.__wrapped__(category_id=category_id, page=1, limit=10, session=session)
+    assert result["data"]
+    assert profile.query_count == 3
+    assert not profile.repeated()
+
+
+async def test_get_one_post_queries(session):
+    post_id = await session.scalar(select(func.max(Post.id)).filter(Post.published))
+    with profile_queries() as profile:
+        await get_one_post.__wrapped__(post_id=post_id, session=session)
+    assert profile.query_count == 1
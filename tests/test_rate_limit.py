@@ -0,0 +1,125 @@
+"""Ограничение частоты (src.rate_limit): token bucket в памяти процесса с управляемыми часами"""
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from src import rate_limit
+from src.rate_limit import MemoryBuckets, RateLimit, RateLimiter, parse_limit
+
+
+class Clock:
+    """Подменяет time в src.rate_limit: monotonic() возвращает now"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class DownRedis:
+    """Redis, который недоступен: скрипт token bucket падает с ошибкой подключения"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def register_script(self, script):
+        async def run(keys, args):
+            self.calls += 1
+            raise ConnectionError("Redis is down")
+
+        return run
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+def make_request(host="10.0.0.1", payload=None):
+    return Request({"type": "http", "headers": [], "client": (host, 5000), "state": {"token_payload": payload}})
+
+
+def test_parse_limit():
+    assert parse_limit("30/60") == (0.5, 30)
+    assert parse_limit("5") == (5, 5)
+    assert parse_limit("") is None
+    assert parse_limit("0") is None
+
+
+def test_bucket_allows_burst_then_blocks(clock):
+    buckets = MemoryBuckets(maxsize=10)
+    assert all(buckets.hit("k", rate=0.5, burst=3)[0] for _ in range(3))
+    allowed, retry_after = buckets.hit("k", rate=0.5, burst=3)
+    # Пустая корзина: один токен появится через 1 / 0.5 = 2 секунды
+    assert not allowed and retry_after == pytest.approx(2)
+
+
+def test_bucket_refills_over_time(clock):
+    buckets = MemoryBuckets(maxsize=10)
+    for _ in range(3):
+        buckets.hit("k", rate=0.5, burst=3)
+    clock.now += 1
+    allowed, retry_after = buckets.hit("k", rate=0.5, burst=3)
+    assert not allowed and retry_after == pytest.approx(1)
+    clock.now += 1
+    assert buckets.hit("k", rate=0.5, burst=3)[0]
+    # Пополнение не выше burst
+    clock.now += 3600
+    assert sum(buckets.hit("k", rate=0.5, burst=3)[0] for _ in range(5)) == 3
+
+
+def test_bucket_keys_are_independent_and_bounded(clock):
+    buckets = MemoryBuckets(maxsize=2)
+    assert buckets.hit("a", rate=1, burst=1)[0]
+    assert not buckets.hit("a", rate=1, burst=1)[0]
+    assert buckets.hit("b", rate=1, burst=1)[0]
+    buckets.hit("c", rate=1, burst=1)
+    # "a" вытеснена (LRU) - её корзина снова полная
+    assert buckets.hit("a", rate=1, burst=1)[0]
+
+
+@pytest.mark.anyio
+async def test_limiter_falls_back_to_memory_while_redis_is_down(clock):
+    redis = DownRedis()
+    limiter = RateLimiter(redis, memory_size=10, redis_retry=30)
+    assert await limiter.hit("k", rate=1, burst=2) == (True, 0.0)
+    assert redis.calls == 1
+    assert (await limiter.hit("k", rate=1, burst=2))[0]
+    allowed, retry_after = await limiter.hit("k", rate=1, burst=2)
+    assert not allowed and retry_after == pytest.approx(1)
+    # Пока не прошло redis_retry секунд, Redis не запрашивается
+    assert redis.calls == 1
+    clock.now += 31
+    await limiter.hit("k", rate=1, burst=2)
+    assert redis.calls == 2
+
+
+@pytest.mark.anyio
+async def test_rate_limit_raises_429_with_retry_after(clock, monkeypatch):
+    limiter = RateLimiter(DownRedis(), memory_size=10, redis_retry=30)
+    limiter.enabled = True
+    monkeypatch.setattr(rate_limit, "limiter", limiter)
+    limit = RateLimit("test", "2/10")
+    request = make_request()
+    await limit(request)
+    await limit(request)
+    with pytest.raises(HTTPException) as error:
+        await limit(request)
+    assert error.value.status_code == 429
+    # Токен появляется через 5 секунд
+    assert error.value.headers["Retry-After"] == "5"
+    # Другой IP и авторизованный пользователь с того же IP - свои корзины
+    await limit(make_request(host="10.0.0.2"))
+    await limit(make_request(payload={"sub": "Alice"}))
+
+
+@pytest.mark.anyio
+async def test_rate_limit_disabled(clock, monkeypatch):
+    limiter = RateLimiter(DownRedis(), memory_size=10, redis_retry=30)
+    limiter.enabled = False
+    monkeypatch.setattr(rate_limit, "limiter", limiter)
+    limit = RateLimit("test", "1/10")
+    for _ in range(5):
+        await limit(make_request())
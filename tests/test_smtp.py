@@ -0,0 +1,161 @@
+"""Отправка писем (tasks.mailer, tasks.tasks.send_emails) через локальный SMTP-сервер aiosmtpd"""
+import smtplib
+import socket
+import pytest
+# pip install aiosmtpd
+from aiosmtpd.controller import Controller
+from src.settings_env import SMTP_MAX_RETRIES
+from tasks import tasks
+from tasks.mailer import SMTPPool, build_message, is_transient
+
+HOST = "127.0.0.1"
+
+
+class Handler:
+    """Принимает письма; адреса refused@ отклоняются (550), адреса later@ - временно (451) fail_later раз"""
+
+    def __init__(self):
+        self.received = []
+        self.fail_later = 0
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("refused@"):
+            return "550 No such user"
+        if address.startswith("later@") and self.fail_later:
+            self.fail_later -= 1
+            return "451 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.extend(envelope.rcpt_tos)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """Локальный SMTP-сервер, который можно остановить и снова запустить на том же порту"""
+
+    def __init__(self):
+        self.handler = Handler()
+        self.port = free_port()
+        self.controller = None
+
+    def start(self):
+        self.controller = Controller(self.handler, hostname=HOST, port=self.port)
+        self.controller.start()
+
+    def stop(self):
+        if self.controller is not None:
+            self.controller.stop()
+            self.controller = None
+
+
+@pytest.fixture
+def server():
+    server = Server()
+    server.start()
+    yield server
+    server.stop()
+
+
+def make_pool(server, **kwargs) -> SMTPPool:
+    options = {"size": 1, "max_per_connection": 100, "idle_check": 30, "rate": 0, **kwargs}
+    return SMTPPool(connect=lambda: smtplib.SMTP(HOST, server.port, timeout=5), **options)
+
+
+def messages(*addresses) -> list:
+    return [build_message(address, "Subject", "<p>Hello</p>") for address in addresses]
+
+
+def test_batch_uses_one_connection(server):
+    pool = make_pool(server)
+    addresses = [f"user{idx}@example.com" for idx in range(5)]
+    assert pool.send(messages(*addresses)) == []
+    assert pool.send(messages("next@example.com")) == []
+    pool.close()
+    assert server.handler.received == [*addresses, "next@example.com"]
+    assert pool.connects == 1
+
+
+def test_connection_renewed_after_max_messages(server):
+    pool = make_pool(server, max_per_connection=2)
+    assert pool.send(messages(*[f"user{idx}@example.com" for idx in range(5)])) == []
+    pool.close()
+    assert len(server.handler.received) == 5
+    assert pool.connects == 3
+
+
+def test_reconnect_after_server_closed_connection(server):
+    pool = make_pool(server)
+    assert pool.send(messages("first@example.com")) == []
+    # Сервер перезапущен - подключение в пуле оборвано
+    server.stop()
+    server.start()
+    assert pool.send(messages("second@example.com", "third@example.com")) == []
+    pool.close()
+    assert server.handler.received == ["first@example.com", "second@example.com", "third@example.com"]
+    assert pool.connects == 2
+
+
+def test_idle_connection_checked_before_use(server):
+    pool = make_pool(server, idle_check=0)
+    assert pool.send(messages("first@example.com")) == []
+    server.stop()
+    server.start()
+    assert pool.send(messages("second@example.com")) == []
+    pool.close()
+    assert pool.connects == 2
+
+
+def test_refused_recipients_do_not_stop_batch(server):
+    server.handler.fail_later = 1
+    pool = make_pool(server)
+    failed = pool.send(messages("a@example.com", "refused@example.com", "later@example.com", "b@example.com"))
+    pool.close()
+    assert [(index, is_transient(ex)) for index, ex in failed] == [(1, False), (2, True)]
+    assert server.handler.received == ["a@example.com", "b@example.com"]
+    assert pool.connects == 1
+
+
+def test_server_unavailable_is_transient(server):
+    server.stop()
+    pool = make_pool(server)
+    failed = pool.send(messages("a@example.com", "b@example.com"))
+    assert [index for index, _ in failed] == [0, 1]
+    assert all(is_transient(ex) for _, ex in failed)
+
+
+@pytest.fixture
+def smtp_pool(server, monkeypatch):
+    pool = make_pool(server)
+    monkeypatch.setattr(tasks, "smtp_pool", pool)
+    yield pool
+    pool.close()
+
+
+def emails(*addresses) -> list:
+    return [{"to": address, "subject": "Subject", "html": "<p>Hello</p>"} for address in addresses]
+
+
+def test_send_emails_retries_only_transient_failures(server, smtp_pool):
+    # Задача выполняется сразу (apply), повтор - тоже сразу, без паузы
+    server.handler.fail_later = 2
+    result = tasks.send_emails.apply(args=(emails("a@example.com", "refused@example.com", "later@example.com"),))
+    # Результат задачи - результат последнего повтора (только письма с временной ошибкой),
+    # постоянная ошибка refused@ записана в журнал при первой попытке
+    assert result.get() == {"sent": 1, "errors": {}}
+    assert server.handler.received == ["a@example.com", "later@example.com"]
+    assert smtp_pool.connects == 1
+
+
+def test_send_emails_gives_up_after_max_retries(server, smtp_pool):
+    server.handler.fail_later = SMTP_MAX_RETRIES + 1
+    result = tasks.send_emails.apply(args=(emails("later@example.com"),)).get()
+    assert result == {"sent": 0, "errors": {"later@example.com": "retries exhausted"}}
+    assert server.handler.received == []
@@ -0,0 +1,121 @@
+"""Кэши пользователей и проверенных токенов (user.user_cache, user.my_token) с управляемыми часами"""
+import hashlib
+import time
+import pytest
+from jose import jwt
+from starlette.requests import Request
+from src.cache_tags import ALL_TAGS, user_tag
+from user import my_token, user_cache
+from user.user_cache import TTLCache, current_users, drop_users, verified_tokens
+
+
+class Clock:
+    """Подменяет time в user.user_cache: monotonic() возвращает now"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(user_cache, "time", clock)
+    return clock
+
+
+@pytest.fixture(autouse=True)
+def clean_caches(monkeypatch):
+    monkeypatch.setattr(my_token, "SECRET_KEY_TOKEN", "test-secret")
+    monkeypatch.setattr(my_token, "ALGORITHM_TOKEN", "HS256")
+    current_users.clear()
+    verified_tokens.clear()
+    yield
+    current_users.clear()
+    verified_tokens.clear()
+
+
+def test_lru_evicts_least_recently_used(clock):
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+    clock.now += 6
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    clock.now += 60
+    assert cache.get("a") is None
+
+
+def test_verified_token_cached_until_exp(clock):
+    token = jwt.encode({"sub": "Alice", "exp": int(time.time()) + 100}, "test-secret", algorithm="HS256")
+    assert my_token.verify_token(f"Bearer {token}")["sub"] == "Alice"
+    key = hashlib.sha256(token.encode()).digest()
+    clock.now += 95
+    assert verified_tokens.get(key) is not None
+    clock.now += 10
+    assert verified_tokens.get(key) is None
+
+
+def test_invalid_token_is_not_cached(clock):
+    token = jwt.encode({"sub": "Alice"}, "other-secret", algorithm="HS256")
+    assert my_token.verify_token(f"Bearer {token}") is None
+    assert verified_tokens.stats()["size"] == 0
+
+
+def test_verified_payload_is_a_copy(clock):
+    token = jwt.encode({"sub": "Alice", "exp": int(time.time()) + 100}, "test-secret", algorithm="HS256")
+    my_token.verify_token(f"Bearer {token}")["sub"] = "Mallory"
+    assert my_token.verify_token(f"Bearer {token}")["sub"] == "Alice"
+    my_token.verify_token(f"Bearer {token}")["sub"] = "Mallory"
+    assert my_token.verify_token(f"Bearer {token}")["sub"] == "Alice"
+
+
+def test_drop_users_by_tag(clock):
+    current_users.set("Alice", {"user_id": 7, "group": "ADMIN"})
+    current_users.set("Bob", {"user_id": 8, "group": "CLIENT"})
+    drop_users([user_tag(7), "posts:list"])
+    assert current_users.get("Alice") is None
+    assert current_users.get("Bob") is not None
+    drop_users([ALL_TAGS])
+    assert current_users.get("Bob") is None
+
+
+class FakeSession:
+    """Сессия, которая на запрос пользователя возвращает одну строку"""
+
+    def __init__(self, row):
+        self.row = row
+        self.queries = 0
+
+    async def execute(self, query):
+        self.queries += 1
+        return self
+
+    def all(self):
+        return [self.row]
+
+
+@pytest.mark.anyio
+async def test_current_user_is_a_copy_on_miss_and_hit(clock):
+    request = Request({"type": "http", "headers": [], "state": {"token_payload": {"sub": "Alice"}}})
+    session = FakeSession(("Alice", "ADMIN", True, 7, "alice@example.com"))
+    user = await my_token.get_current_user(request, session)
+    user["group"] = "CLIENT"
+    assert current_users.get("Alice")["group"] == "ADMIN"
+    user = await my_token.get_current_user(request, session)
+    user["group"] = "CLIENT"
+    assert (await my_token.get_current_user(request, session))["group"] == "ADMIN"
+    assert session.queries == 1
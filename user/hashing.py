@@ -0,0 +1,53 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException, status
+from passlib.hash import pbkdf2_sha256
+from src.settings_env import HASH_POOL_SIZE, HASH_QUEUE_SIZE, HASH_QUEUE_TIMEOUT
+
+# pbkdf2 занимает процессор на десятки миллисекунд - выполняется в пуле процессов, а не в event loop
+_pool = {"executor": None, "slots": None}
+
+# исключение, которое возникает, когда очередь хэширования переполнена
+hashing_is_busy = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Server is busy, try again later",
+    headers={"Retry-After": "1"}
+)
+
+
+def _get_pool():
+    """Пул процессов и ограничитель очереди создаются при первом использовании"""
+    if _pool["executor"] is None:
+        _pool["executor"] = ProcessPoolExecutor(max_workers=HASH_POOL_SIZE)
+        _pool["slots"] = asyncio.Semaphore(HASH_POOL_SIZE + HASH_QUEUE_SIZE)
+    return _pool["executor"], _pool["slots"]
+
+
+async def _run(func, *args):
+    """Выполняет функцию в пуле; если очередь занята дольше HASH_QUEUE_TIMEOUT - 503"""
+    executor, slots = _get_pool()
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise hashing_is_busy
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+    finally:
+        slots.release()
+
+
+async def hash_password(password: str) -> str:
+    """Хэширование пароля"""
+    return await _run(pbkdf2_sha256.hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    """Проверка пароля"""
+    return await _run(pbkdf2_sha256.verify, password, hashed_password)
+
+
+def shutdown_hash_pool():
+    """Остановка пула процессов"""
+    if _pool["executor"] is not None:
+        _pool["executor"].shutdown(cancel_futures=True)
+        _pool.update(executor=None, slots=None)
@@ -1,12 +1,16 @@
 # pip install "python-jose[cryptography]"
+import hashlib
+import time
 from fastapi import Depends, HTTPException, status, Request
 from jose import jwt, JWTError
+from starlette.requests import HTTPConnection
 from src.settings_env import SECRET_KEY_TOKEN, ALGORITHM_TOKEN
 from datetime import datetime, timedelta
 from sqlalchemy import select
 from src.api_models import User
 from api_databases.connect_db import get_async_session
 from sqlalchemy.ext.asyncio import AsyncSession
+from user.user_cache import current_users, verified_tokens
 
 ACCESS_TOKEN_EXPIRE_DAYS = 1
 NAME_COOKIES = "my_app_cookies"
@@ -22,19 +26,61 @@ def create_access_token(data: dict):
     return encoded_jwt  # Возвращаем закодированный токен
 
 
+def verify_token(cookie: str):
+    """
+    Payload токена из cookie ("Bearer <токен>") или None, если токена нет или он недействителен.
+    Проверенные токены кэшируются (по sha256) до своего exp: подпись проверяется один раз
+    """
+    scheme, _, token = (cookie or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    key = hashlib.sha256(token.encode()).digest()
+    payload = verified_tokens.get(key)
+    if payload is not None:
+        return dict(payload)
+    try:
+        payload = jwt.decode(token, key=SECRET_KEY_TOKEN, algorithms=ALGORITHM_TOKEN)
+    except JWTError:
+        # Недействительные токены не кэшируются (иначе ими можно вытеснить действительные)
+        return None
+    expire = payload.get("exp")
+    verified_tokens.set(key, payload, ttl=expire - time.time() if isinstance(expire, (int, float)) else None)
+    # Копия: изменения вызывающего кода не должны попасть в кэш
+    return dict(payload)
+
+
+class AuthMiddleware:
+    """ASGI middleware: токен из cookie проверяется один раз на запрос, payload - в request.state.token_payload"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            cookie = HTTPConnection(scope).cookies.get(NAME_COOKIES)
+            scope.setdefault("state", {})["token_payload"] = verify_token(cookie)
+        await self.app(scope, receive, send)
+
+
+def token_payload(request: Request):
+    """Payload токена текущего запроса (проверенный AuthMiddleware, без него - проверяется здесь)"""
+    state = request.scope.setdefault("state", {})
+    if "token_payload" not in state:
+        state["token_payload"] = verify_token(request.cookies.get(NAME_COOKIES))
+    return state["token_payload"]
+
+
 async def get_current_user(request: Request, session: AsyncSession = Depends(get_async_session)):
     """Получение текущего пользователя"""
     credentials_exception = None
-    try:
-        token = request.cookies.get(NAME_COOKIES)
-        if token is not None:
-            scheme = token.split(" ")[1]
-            payload = jwt.decode(scheme, key=SECRET_KEY_TOKEN, algorithms=ALGORITHM_TOKEN)
-            username = payload.get("sub")
-        else:
-            return credentials_exception
-    except JWTError:
+    payload = token_payload(request)
+    if payload is None:
         return credentials_exception
+    username = payload.get("sub")
+    # Пользователь недавно уже загружался этим процессом
+    cached_user = current_users.get(username)
+    if cached_user is not None:
+        return dict(cached_user)
     user = select(User.username, User.group, User.is_active, User.id, User.email).select_from(User).filter(
         User.username == username)
     if user is None:
@@ -43,8 +89,9 @@ async def get_current_user(request: Request, session: AsyncSession = Depends(get
     try:
         temporary_user = temporary.all()[0]  # Попадаем внутрь списка
         current_user = dict(zip(["username", "group", "is_active", "user_id", "email"], temporary_user))
-        # Возвращаем словарь с информацией о текущего пользователя
-        return current_user
+        current_users.set(username, current_user)
+        # Возвращаем словарь с информацией о текущего пользователя (копию, как и из кэша)
+        return dict(current_user)
     except IndexError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -5,10 +5,15 @@ from src.api_models import User
 from user.schemas import UserSchema, AdminUserScheme, AuthUserScheme
 from api_databases.connect_db import get_async_session, data_is_not_valid
 from sqlalchemy.ext.asyncio import AsyncSession
-from passlib.hash import pbkdf2_sha256
+from user.hashing import hash_password, verify_password
 from sqlalchemy import insert, select, update
 from user.my_token import get_current_user
-from tasks.tasks import send_email_login
+from tasks.tasks import registration_email, send_emails
+from tasks.outbox import add_to_outbox
+from post.counters import drop_user_posts_counters
+from src.cache_tags import POSTS_LIST, POSTS_DETAIL, category_tag, invalidate_tags
+from user.user_cache import current_users, invalidate_user
+from src.rate_limit import login_limit, register_limit
 
 router = APIRouter(
     prefix="/user", tags=["User"]
@@ -26,7 +31,7 @@ async def field_validation(field: dict) -> list:
     return errors_list
 
 
-@router.post("/user_create")
+@router.post("/user_create", dependencies=[Depends(register_limit)])
 async def user_create(user: UserSchema = Depends(UserSchema.as_form),
                       session: AsyncSession = Depends(get_async_session)
                       ):
@@ -47,25 +52,27 @@ async def user_create(user: UserSchema = Depends(UserSchema.as_form),
             return {"errors": errors_list}
 
         # Добавление (регистрация) пользователя в базу данных
-        hashed_password = pbkdf2_sha256.hash(user_data["password"])
+        hashed_password = await hash_password(user_data["password"])
         new_user = insert(User).values(
             username=user_data["username"].title(),
             password=hashed_password,
             email=user_data["email"]
         )
         await session.execute(new_user)
+        # Письмо при успешной регистрации - в той же транзакции (отправит tasks.outbox)
+        await add_to_outbox(session, send_emails, [registration_email(user_data["username"], user_data["email"])])
         await session.commit()
     # Если email неуникальны (Пользователь с таким email уже есть в базе данных)
     except IntegrityError:
         errors_list.append(msg)
         return {"errors": errors_list}
+    # Очередь хэширования переполнена (503)
+    except HTTPException:
+        raise
     # Перехватываем все непредвиденные исключения
     except Exception:
         raise data_is_not_valid
 
-    # Отправка письма при успешной регистрации
-    send_email_login.delay(user_data["username"], user_data["email"])
-
     # При успешной регистрации возвращаем словарь
     response = {
         "status": status.HTTP_201_CREATED,
@@ -76,7 +83,7 @@ async def user_create(user: UserSchema = Depends(UserSchema.as_form),
     return response
 
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(login_limit)])
 async def login(
         response: Response,
         user_form: AuthUserScheme = Depends(AuthUserScheme.as_form),
@@ -96,7 +103,7 @@ async def login(
         msg = f"User: {user_data['username']} not found'"
         errors_list.append(msg)
         return {"errors": errors_list}
-    elif not pbkdf2_sha256.verify(user_data["password"], user.password):
+    elif not await verify_password(user_data["password"], user.password):
         msg = f"Password: '{user_data['password']}' invalid password"
         errors_list.append(msg)
         return {"errors": errors_list}
@@ -122,6 +129,7 @@ async def update_user(
             query = update(User).filter(User.id == user_id).values(**update_values)
             await session.execute(query)
             await session.commit()
+            await invalidate_user(user_id)
             return {"message": "group changed successful to ADMIN"}
         except Exception:
             raise data_is_not_valid
@@ -142,8 +150,12 @@ async def delete_user(user_id: int, current_user: dict = Depends(get_current_use
         try:
             query = select(User).filter(User.id == user_id)
             user_delete = await session.execute(query)
+            # Записи пользователя удаляются каскадом - вычитаем их из счётчиков в той же транзакции
+            categories_ids = await drop_user_posts_counters(session, user_id)
             await session.delete(user_delete.scalar())
             await session.commit()
+            await invalidate_user(user_id)
+            await invalidate_tags(POSTS_LIST, POSTS_DETAIL, *[category_tag(idx) for idx in categories_ids])
             return {
                 "status": status.HTTP_204_NO_CONTENT,
                 "detail": "User Deleted!"
@@ -185,7 +197,7 @@ async def update_user(user_id: int, response: Response, user: UserSchema = Depen
                 msg = f"User with email: {user.email} is already registered."
                 errors_list.append(msg)
                 return {"errors": errors_list}
-        hashed_password = pbkdf2_sha256.hash(user.password)
+        hashed_password = await hash_password(user.password)
         try:
             user_update = update(User).values(
                 username=user.username,
@@ -194,6 +206,10 @@ async def update_user(user_id: int, response: Response, user: UserSchema = Depen
             ).filter(User.id == user_id)
             await session.execute(user_update)
             await session.commit()
+            await invalidate_user(user_id)
+            # Имя автора выводится на страницах записей
+            if user.username != current_user["username"]:
+                await invalidate_tags(POSTS_DETAIL)
             # Создание токена
             jwt_token = create_access_token(data={"sub": user.username})
             # Сохранение токена в cookie
@@ -215,4 +231,11 @@ async def update_user(user_id: int, response: Response, user: UserSchema = Depen
 async def user_logout(response: Response, current_user: dict = Depends(get_current_user)):
     """Выход пользователя из приложения"""
     response.delete_cookie(NAME_COOKIES)
+    await invalidate_user(current_user["user_id"])
     return {"message": f'User: {current_user["username"]} logged out'}
+
+
+@router.get("/cache_stats")
+async def user_cache_stats():
+    """Статистика кэша текущих пользователей этого процесса (для мониторинга)"""
+    return current_users.stats()
@@ -1,47 +0,0 @@
-from typing import Any, Dict, Optional, cast
-from fastapi.exceptions import HTTPException
-from fastapi.openapi.models import OAuthFlows as OAuthFlowsModel
-from fastapi.security import OAuth2
-from fastapi.security.utils import get_authorization_scheme_param
-from starlette.requests import Request
-from starlette.status import HTTP_401_UNAUTHORIZED
-
-
-class OAuth2PasswordBearerWithCookie(OAuth2):
-    """Получение токена из cookies"""
-
-    def __init__(
-            self,
-            token_url: str,
-            cookies: str,
-            scheme_name: Optional[str] = None,
-            scopes: Optional[Dict[str, str]] = None,
-            description: Optional[str] = None,
-            auto_error: bool = True,
-    ):
-        self.cookies = cookies
-        if not scopes:
-            scopes = {}
-        flows = OAuthFlowsModel(
-            password=cast(Any, {"tokenUrl": token_url, "scopes": scopes})
-        )
-        super().__init__(
-            flows=flows,
-            scheme_name=scheme_name,
-            description=description,
-            auto_error=auto_error,
-        )
-
-    async def __call__(self, request: Request) -> Optional[str]:
-        authorization: str = request.cookies.get(self.cookies)  # Получение токена из cookies
-        scheme, param = get_authorization_scheme_param(authorization)
-        if not authorization or scheme.lower() != "bearer":
-            if self.auto_error:
-                raise HTTPException(
-                    status_code=HTTP_401_UNAUTHORIZED,
-                    detail="Not authenticated",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
-            else:
-                return None
-        return param
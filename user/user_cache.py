@@ -0,0 +1,90 @@
+import time
+from collections import OrderedDict
+from src.cache_tags import ALL_TAGS, invalidate_tags, on_invalidate, user_tag
+from src.settings_env import USER_CACHE_SIZE, USER_CACHE_TTL, TOKEN_CACHE_SIZE
+
+
+class TTLCache:
+    """
+    Ограниченный LRU-кэш с временем жизни записей (в пределах одного процесса).
+    Используется только из event loop, поэтому блокировки не нужны
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Значение по ключу или None (просроченные записи удаляются)"""
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key, value, ttl: float = None):
+        """Сохраняет значение на ttl секунд (по умолчанию - ttl кэша), вытесняя давно не использованные записи"""
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key):
+        """Удаляет запись по ключу"""
+        self._data.pop(key, None)
+
+    def pop_where(self, predicate):
+        """Удаляет записи, значения которых удовлетворяют условию"""
+        for key in [key for key, (_, value) in self._data.items() if predicate(value)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        """Счётчики для мониторинга"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else None
+        }
+
+
+# Пользователи, найденные по subject токена (username)
+current_users = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# Payload проверенных токенов по sha256 токена - каждая запись живёт до exp своего токена
+verified_tokens = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=24 * 60 * 60)
+
+
+@on_invalidate
+def drop_users(tags):
+    """Удаляет из кэша процесса пользователей, сброшенных в этом или другом процессе"""
+    if ALL_TAGS in tags:
+        current_users.clear()
+        return
+    users_ids = {int(tag.split(":", 1)[1]) for tag in tags if tag.startswith("user:")}
+    if users_ids:
+        current_users.pop_where(lambda user: user["user_id"] in users_ids)
+
+
+async def invalidate_user(user_id: int):
+    """
+    Сбрасывает пользователя в кэше всех процессов (после изменения, удаления, выхода):
+    смена группы не должна ждать USER_CACHE_TTL в других воркерах
+    """
+    await invalidate_tags(user_tag(user_id))
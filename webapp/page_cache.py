@@ -0,0 +1,116 @@
+import hashlib
+import json
+import logging
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from fastapi_cache import FastAPICache
+from src.cache_tags import CACHE_EXPIRE, TaggedRedisBackend
+from src.settings_env import PAGE_CACHE_MAX_AGE
+from user.my_token import NAME_COOKIES
+
+logger = logging.getLogger(__name__)
+
+# По умолчанию (max-age=0) браузер перепроверяет страницу по ETag при каждом показе
+CACHE_CONTROL = f"public, max-age={PAGE_CACHE_MAX_AGE}, must-revalidate"
+# Параметры запроса, которые читают кэшируемые страницы (пагинация и курсор)
+PAGE_PARAMS = ("page", "limit", "after", "with_total")
+
+
+def cache_page(*tags, params=PAGE_PARAMS):
+    """
+    Помечает страницу для кэширования целиком (только для анонимных посетителей).
+    tags - строки или функции от параметров пути, возвращающие тег (как в tagged_key_builder);
+    params - параметры запроса, от которых зависит страница: запрос с другими (или повторёнными)
+    параметрами не кэшируется, иначе произвольные ?x=1, ?x=2 заполняли бы Redis без ограничений
+    """
+
+    def decorator(endpoint):
+        endpoint.page_cache_tags = tags
+        endpoint.page_cache_params = frozenset(params)
+        return endpoint
+
+    return decorator
+
+
+def page_backend():
+    """Backend кэша с поддержкой тегов или None (кэш не инициализирован или без тегов)"""
+    try:
+        backend = FastAPICache.get_backend()
+    except AssertionError:
+        return None
+    return backend if isinstance(backend, TaggedRedisBackend) else None
+
+
+def cacheable_query(request: Request, params) -> bool:
+    """В запросе только известные параметры, каждый не больше одного раза"""
+    items = request.query_params.multi_items()
+    return len(items) == len(request.query_params) and all(name in params for name, _ in items)
+
+
+def page_key(request: Request) -> str:
+    """Ключ страницы: путь и отсортированные параметры запроса"""
+    query = sorted(request.query_params.multi_items())
+    raw = f"{request.url.path}?{query}".encode()
+    return f"{FastAPICache.get_prefix()}:page:{hashlib.md5(raw).hexdigest()}"
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Проверка If-None-Match (для него допускается слабое сравнение)"""
+    if not if_none_match:
+        return False
+    candidates = [item.strip() for item in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def page_response(request: Request, page: dict) -> Response:
+    """Ответ из кэшированной страницы: 304, если у браузера та же версия"""
+    headers = {"ETag": page["etag"], "Cache-Control": CACHE_CONTROL, "Vary": "Cookie"}
+    if etag_matches(request.headers.get("if-none-match"), page["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=page["body"], media_type=page["media_type"], headers=headers)
+
+
+class PageCacheRoute(APIRoute):
+    """
+    Маршрут, который для анонимных GET-запросов отдаёт страницу из кэша до выполнения зависимостей.
+    Кэшируются только обработчики, помеченные cache_page
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        tags = getattr(self.endpoint, "page_cache_tags", None)
+        if tags is None:
+            return handler
+        params = self.endpoint.page_cache_params
+
+        async def cached_handler(request: Request) -> Response:
+            backend = page_backend()
+            if request.method not in ("GET", "HEAD") or NAME_COOKIES in request.cookies or backend is None \
+                    or not cacheable_query(request, params):
+                return await handler(request)
+            key = page_key(request)
+            names = [tag(**request.path_params) if callable(tag) else tag for tag in tags]
+            try:
+                _, cached = await backend.get_with_ttl(key, tags=names)
+            except Exception:
+                logger.warning("Error reading page cache:", exc_info=True)
+                return await handler(request)
+            if cached is not None:
+                return page_response(request, json.loads(cached))
+            response = await handler(request)
+            # Ошибки, перенаправления и ответы, меняющие cookie, не кэшируются
+            if response.status_code != 200 or "set-cookie" in response.headers or not hasattr(response, "body"):
+                return response
+            body = response.body.decode(response.charset)
+            page = {
+                "etag": f'"{hashlib.sha256(response.body).hexdigest()[:32]}"',
+                "body": body,
+                "media_type": response.media_type
+            }
+            try:
+                await backend.set(key, json.dumps(page), expire=CACHE_EXPIRE, tags=names)
+            except Exception:
+                logger.warning("Error writing page cache:", exc_info=True)
+            return page_response(request, page)
+
+        return cached_handler
@@ -1,5 +1,7 @@
 from fastapi import APIRouter, Request, Depends, status, responses
 from fastapi.templating import Jinja2Templates
+from markupsafe import Markup, escape
+from datetime import datetime
 from api_databases.connect_db import PAGE
 from user.my_token import get_current_user
 from post.routers import (
@@ -9,7 +11,7 @@ from post.routers import (
     update_post,
     delete_post,
     search_post,
-    get_all_posts_handler
+    get_all_posts
 )
 from category.routers import (
     get_all_categories,
@@ -27,14 +29,23 @@ from user.routers import (
     update_user
 )
 from user.my_token import NAME_COOKIES
-
-router = APIRouter(include_in_schema=False)
+from webapp.page_cache import PageCacheRoute, cache_page
+from monitoring.profiler import ProfiledTemplate
+from webapp.static_files import static_path
+from src.rate_limit import search_limit, login_limit, register_limit
+from src.cache_tags import POSTS_LIST, POSTS_DETAIL, category_tag, post_tag
+
+# Страницы, помеченные cache_page, для анонимных посетителей отдаются из кэша целиком
+router = APIRouter(include_in_schema=False, route_class=PageCacheRoute)
 templates = Jinja2Templates(directory="webapp/templates")
 env = templates.env
+env.template_class = ProfiledTemplate  # Время рендеринга - в профиле запроса (monitoring.profiler)
 
 
-# Определение фильтра форматирования времени
+# Определение фильтра форматирования времени (из кэша fastapi-cache дата приходит строкой ISO)
 def format_time(value, format_date="%d-%m-%Y %H:%M:%S"):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
     return value.strftime(format_date)
 
 
@@ -44,14 +55,26 @@ def word_count(value, count=7):
     return ' '.join(words)
 
 
+# Определение фильтра для вывода фрагмента поиска: экранируется всё, кроме подсветки <mark>
+def highlight(value):
+    value = escape(value)
+    for tag in ("<mark>", "</mark>"):
+        value = value.replace(escape(tag), Markup(tag))
+    return value
+
+
 # Регистрация фильтра в экземпляре Environment
 env.filters["format_time"] = format_time
 env.filters["word_count"] = word_count
+env.filters["highlight"] = highlight
+# Имя статического файла с отпечатком: url_for('static', path=static_path(...))
+env.globals["static_path"] = static_path
 
 
 @router.get("/")
+@cache_page(POSTS_LIST)
 async def post_all(request: Request, all_categories=Depends(get_all_categories),
-                   posts=Depends(get_all_posts_handler),
+                   posts=Depends(get_all_posts),
                    page: int = PAGE, messages: str = None, current_user=Depends(get_current_user)):
     """Главная страница (вывод всех постов) + пагинация """
     return templates.TemplateResponse("index.html", {
@@ -61,6 +84,7 @@ async def post_all(request: Request, all_categories=Depends(get_all_categories),
 
 
 @router.get("/one_post/{post_id}")
+@cache_page(lambda post_id, **_: post_tag(post_id), POSTS_DETAIL, POSTS_LIST, params=())
 def one_post(request: Request, post=Depends(get_one_post), all_categories=Depends(get_all_categories),
              current_user=Depends(get_current_user)):
     """Страница детальной информации о записи"""
@@ -70,6 +94,7 @@ def one_post(request: Request, post=Depends(get_one_post), all_categories=Depend
 
 
 @router.get('/category_post_all/{category_id}')
+@cache_page(lambda category_id, **_: category_tag(category_id), POSTS_LIST)
 def category_post_all(request: Request, posts=Depends(category_post_all), all_categories=Depends(get_all_categories),
                       category_title=Depends(get_category), page: int = PAGE, current_user=Depends(get_current_user)):
     """Вывод всех записей у конкретной категории + пагинация"""
@@ -89,7 +114,7 @@ def registration(request: Request):
     return templates.TemplateResponse("user_auth.html", {"request": request, "msg": message, "logup": True})
 
 
-@router.post('/registration')
+@router.post('/registration', dependencies=[Depends(register_limit)])
 def registration(request: Request, user=Depends(user_create)):
     """Регистрация пользователя"""
     if "errors" in user:
@@ -108,7 +133,7 @@ def log_in(request: Request):
     return templates.TemplateResponse("user_auth.html", {"request": request, "msg": msg, "log_in": True})
 
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(login_limit)])
 def log_in(request: Request, user=Depends(login)):
     """Авторизация пользователя"""
     if "errors" in user:
@@ -306,7 +331,7 @@ def delete_category(request: Request, category=Depends(delete_category)):
     return responses.RedirectResponse(url=redirect_url, status_code=status.HTTP_302_FOUND)
 
 
-@router.post("/search/")
+@router.post("/search/", dependencies=[Depends(search_limit)])
 def post_search(request: Request, posts=Depends(search_post), all_categories=Depends(get_all_categories),
                 page: int = PAGE, current_user=Depends(get_current_user)):
     """Регистронезависимый поиск + пагинация результатов"""
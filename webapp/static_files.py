@@ -0,0 +1,149 @@
+"""
+Статические файлы с отпечатком содержимого в имени и заранее сжатыми вариантами.
+
+Сборка (при развёртывании, после любого изменения webapp/static) копирует файлы в BUILD_DIR
+под именами с хэшем содержимого (images/my_app.1a2b3c4d5e6f.png), рядом кладёт .gz и .br
+(для текстовых форматов, если это уменьшает размер; .br - если установлен brotli) и manifest.json.
+Шаблоны получают имя с отпечатком через static_path(), такие файлы отдаются с
+Cache-Control: immutable на год - браузер не запрашивает их повторно, а новая версия получает новое имя.
+Без сборки всё работает как раньше: файлы отдаются из webapp/static под исходными именами.
+
+    python -m webapp.static_files
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    # pip install brotli
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = "webapp/static"
+BUILD_DIR = "webapp/static_build"
+MANIFEST = "manifest.json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Форматы, которые имеет смысл сжимать (PNG, JPEG, WOFF2 уже сжаты)
+COMPRESSIBLE = {".css", ".js", ".mjs", ".map", ".json", ".svg", ".txt", ".html", ".xml", ".ico", ".ttf", ".otf"}
+MIN_SAVING = 0.1  # Вариант сохраняется, если он хотя бы на 10% меньше исходного файла
+ENCODINGS = {"br": ".br", "gzip": ".gz"}  # В порядке предпочтения
+
+
+def fingerprint(path: str, data: bytes) -> str:
+    """images/my_app.png -> images/my_app.<хэш>.png"""
+    stem, suffix = os.path.splitext(path)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{suffix}"
+
+
+def compress(data: bytes) -> dict:
+    """{кодировка: сжатые данные} - только варианты, которые заметно меньше"""
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    return {name: body for name, body in variants.items() if len(body) <= len(data) * (1 - MIN_SAVING)}
+
+
+def build(source: str = STATIC_DIR, target: str = BUILD_DIR) -> dict:
+    """Пересоздаёт target из source, возвращает манифест {исходный путь: {path, encodings}}"""
+    shutil.rmtree(target, ignore_errors=True)
+    manifest = {}
+    for root, _, files in os.walk(source):
+        for name in sorted(files):
+            path = os.path.relpath(os.path.join(root, name), source).replace(os.sep, "/")
+            with open(os.path.join(root, name), "rb") as file:
+                data = file.read()
+            built = fingerprint(path, data)
+            variants = compress(data) if os.path.splitext(name)[1].lower() in COMPRESSIBLE else {}
+            os.makedirs(os.path.dirname(os.path.join(target, built)), exist_ok=True)
+            for suffix, body in [("", data), *[(ENCODINGS[encoding], body) for encoding, body in variants.items()]]:
+                with open(os.path.join(target, built + suffix), "wb") as file:
+                    file.write(body)
+            manifest[path] = {"path": built, "encodings": sorted(variants)}
+    with open(os.path.join(target, MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(target: str = BUILD_DIR) -> dict:
+    try:
+        with open(os.path.join(target, MANIFEST)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+manifest = load_manifest()
+
+
+def static_path(path: str) -> str:
+    """Имя файла с отпечатком (для url_for('static', path=...)); без сборки - исходное имя"""
+    item = manifest.get(path)
+    return item["path"] if item is not None else path
+
+
+def accepted_encodings(header: str) -> set:
+    """Кодировки из Accept-Encoding, кроме явно запрещённых (q=0)"""
+    accepted = set()
+    for item in header.split(","):
+        name, *params = [part.strip() for part in item.split(";")]
+        quality = next((param[2:] for param in params if param.startswith("q=")), "1")
+        try:
+            if float(quality) > 0:
+                accepted.add(name.lower())
+        except ValueError:
+            continue
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles, который сначала ищет файл в сборке: файлы с отпечатком отдаются с immutable-кэшированием
+    и в сжатом варианте, если клиент его принимает. Остальные - из исходного каталога, как обычно
+    """
+
+    def __init__(self, directory: str = STATIC_DIR, build_directory: str = BUILD_DIR, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.build_directory = os.path.realpath(build_directory)
+        # Файл с отпечатком -> доступные сжатые варианты
+        self.built = {item["path"]: item["encodings"] for item in manifest.values()}
+        if self.built:
+            self.all_directories = [build_directory, *self.all_directories]
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        path = os.path.relpath(full_path, self.build_directory).replace(os.sep, "/")
+        encodings = self.built.get(path)
+        if encodings is None:
+            return super().file_response(full_path, stat_result, scope, status_code)
+        request_headers = Headers(scope=scope)
+        headers = {"Cache-Control": IMMUTABLE, "Vary": "Accept-Encoding"}
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        encoding = next((name for name in ENCODINGS if name in encodings and name in accepted), None)
+        if encoding is not None:
+            full_path = f"{full_path}{ENCODINGS[encoding]}"
+            stat_result = os.stat(full_path)
+            headers["Content-Encoding"] = encoding
+        response = FileResponse(
+            full_path, status_code=status_code, stat_result=stat_result, method=scope["method"], headers=headers,
+            media_type=mimetypes.guess_type(path)[0] or "application/octet-stream"
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=STATIC_DIR, help="каталог исходных файлов")
+    parser.add_argument("--target", default=BUILD_DIR, help="каталог сборки (пересоздаётся)")
+    args = parser.parse_args()
+    result = build(args.source, args.target)
+    print(json.dumps({"files": len(result), "compressed": sum(1 for item in result.values() if item["encodings"]),
+                      "brotli": brotli is not None}, indent=2))